@@ -1,4 +1,7 @@
-from typing import Dict, Mapping
+from itertools import chain
+from typing import Dict, Mapping, Tuple
+
+import numpy as np
 from app.layers.domain.tracks.track_detail import TrackDetailBase
 from app.layers.domain.utils.singleton import Singleton
 
@@ -137,3 +140,116 @@ class TrackCollection(metaclass=Singleton):
         # Recupera el track y aplica los cambios
         track = frames[track_id]
         track.update(**track_detail.__dict__)
+
+    def get_columns(
+            self,
+            entity_type: str,
+            field: str = "position_transformed",
+            dims: int = 2,
+            start_frame: int = 0
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Extrae en una sola pasada un atributo de todos los tracks como columnas.
+
+        Args:
+            entity_type (str): Tipo de entidad ("players" o "ball").
+            field (str): Atributo del track a extraer (p. ej. "position_transformed").
+            dims (int): Número de componentes del atributo; cada valor no nulo
+                debe tener exactamente `dims` componentes. Con 1 el atributo es
+                un escalar.
+            start_frame (int): Solo se extraen los frames a partir de este (útil
+                para reprocesar únicamente la cola del video).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Números de frame (n,),
+            track_ids (n,) y valores (n, dims) en float con NaN donde el atributo
+            es None, ordenados por track_id y luego por frame.
+
+        Raises:
+            ValueError: Si el tipo de entidad no es válido.
+        """
+        if entity_type not in self.tracks:
+            raise ValueError(f"Tipo de entidad '{entity_type}' no reconocido.")
+
+        missing = (np.nan,) * dims
+        frame_col: list = []
+        track_id_col: list = []
+        value_col: list = []
+        for frame_num, tracks_in_frame in self.tracks[entity_type].items():
+            if frame_num < start_frame:
+                continue
+            frame_col.extend([frame_num] * len(tracks_in_frame))
+            track_id_col.extend(tracks_in_frame.keys())
+            value_col.extend(
+                track_detail.__dict__.get(field) for track_detail in tracks_in_frame.values())
+
+        frame_nums = np.fromiter(frame_col, dtype=np.int64, count=len(frame_col))
+        track_ids = np.fromiter(track_id_col, dtype=np.int64, count=len(track_id_col))
+        if dims == 1:
+            # Atributos escalares (p. ej. "team")
+            values = np.fromiter(
+                (np.nan if value is None else value for value in value_col),
+                dtype=np.float64,
+                count=len(value_col)).reshape(-1, 1)
+        else:
+            values = np.fromiter(
+                chain.from_iterable(missing if value is None else value for value in value_col),
+                dtype=np.float64,
+                count=len(value_col) * dims).reshape(-1, dims)
+
+        order = np.lexsort((frame_nums, track_ids))
+        return frame_nums[order], track_ids[order], values[order]
+
+    def set_values(
+            self,
+            entity_type: str,
+            frame_nums: np.ndarray,
+            track_ids: np.ndarray,
+            **columns: np.ndarray) -> None:
+        """
+        Escribe en bloque columnas de valores sobre tracks existentes.
+
+        A diferencia de `update_track`, asigna los atributos directamente sin
+        reconstruir el modelo, por lo que está pensado para resultados vectorizados.
+        Los valores NaN se escriben como None y los (frame, track_id) que no
+        existen en la colección se ignoran.
+
+        Args:
+            entity_type (str): Tipo de entidad ("players" o "ball").
+            frame_nums (np.ndarray): Números de frame (n,).
+            track_ids (np.ndarray): Identificadores de track (n,).
+            **columns (np.ndarray): Atributo → valores (n,) o (n, d) alineados con los
+                anteriores; las filas 2D se escriben como listas.
+
+        Raises:
+            ValueError: Si el tipo de entidad no es válido.
+        """
+        if entity_type not in self.tracks:
+            raise ValueError(f"Tipo de entidad '{entity_type}' no reconocido.")
+
+        collection = self.tracks[entity_type]
+
+        # Recorrer en orden de frame mejora la localidad de memoria frente al orden por track
+        order = np.argsort(np.asarray(frame_nums), kind="stable")
+        empty: dict = {}
+        details = [
+            collection.get(frame_num, empty).get(track_id)
+            for frame_num, track_id in zip(
+                np.asarray(frame_nums)[order].tolist(), np.asarray(track_ids)[order].tolist())
+        ]
+        present = np.fromiter((detail is not None for detail in details), dtype=bool,
+                              count=len(details))
+        # Igual que `TrackDetailBase.update`, se escribe directamente sobre __dict__
+        track_dicts = [detail.__dict__ for detail in details if detail is not None]
+        if not track_dicts:
+            return
+
+        for field, values in columns.items():
+            values = np.asarray(values)[order][present]
+            value_list = values.tolist()
+            if values.dtype.kind == "f":
+                missing = np.isnan(values).reshape(len(values), -1).any(axis=1)
+                for index in np.flatnonzero(missing).tolist():
+                    value_list[index] = None
+            for track_dict, value in zip(track_dicts, value_list):
+                track_dict[field] = value
@@ -46,4 +46,4 @@ class TrackPlayerDetail(TrackDetailBase):
         arbitrary_types_allowed = True
 
 class TrackBallDetail(TrackDetailBase):
-    pass
+    interpolated: Optional[bool] = False  # True si el frame no tuvo detección real
@@ -1,3 +1,6 @@
-from .interpolation_validation import calculate_interpolation_error
+from .interpolation_validation import (benchmark_gap_fillers,
+                                       calculate_interpolation_error,
+                                       evaluate_interpolation,
+                                       select_gap_filler)
 from .system_usage_validation import start_memory_usage
 from .velocity_consistence import check_speed_consistency
@@ -1,54 +1,206 @@
-from typing import Dict
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
 import numpy as np
 from app.layers.domain.tracks.track_detail import TrackDetailBase
 from app.layers.infraestructure.video_analysis.trackers.entities.ball_tracker import \
-    BallTracker
+    GAP_FILL_METHODS, BallTracker
 
 
 def calculate_bbox_center(bbox):
     return np.array([(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2])
 
 
-def calculate_interpolation_error(
-        tracker: BallTracker, original_tracks: Dict[int, Dict[int, TrackDetailBase]]):
-    interpolated_tracks = tracker.interpolate_ball_positions(original_tracks)
-    errors = []
+def _get_detections(
+        tracker: BallTracker,
+        original_tracks: Dict[int, Dict[int, TrackDetailBase]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Máscara de frames con detección real del balón y sus bboxes (n, 4)."""
+    _, detected = tracker.interpolate_ball_positions(original_tracks)
+    frame_nums = np.flatnonzero(detected)
+    bboxes = np.array(
+        [original_tracks[frame_num][1].bbox for frame_num in frame_nums.tolist()],
+        dtype=np.float64).reshape(-1, 4)
+    return detected, bboxes
+
+
+def _holdout_mask(
+        detected: np.ndarray,
+        mask_ratio: Optional[float],
+        gap_lengths: Optional[Sequence[int]],
+        num_gaps: int,
+        rng: np.random.Generator) -> np.ndarray:
+    """
+    Elige los frames detectados que se ocultan: al azar con probabilidad
+    `mask_ratio` o como huecos sintéticos de las longitudes dadas, cada uno con un
+    frame detectado a cada lado y sin solaparse con otros.
+    """
+    if gap_lengths is None:
+        return detected & (rng.random(len(detected)) < (mask_ratio or 0.0))
 
-    for frame_num, track_content in sorted(original_tracks.items()):
-        if frame_num not in interpolated_tracks:
+    hidden = np.zeros(len(detected), dtype=bool)
+    for gap_length in gap_lengths:
+        window = gap_length + 2
+        available = detected & ~hidden
+        # Un frame oculto no puede servir de apoyo a otro hueco
+        available[1:] &= ~hidden[:-1]
+        available[:-1] &= ~hidden[1:]
+        fully_available = np.convolve(available, np.ones(window), mode="valid") == window
+        candidates = np.flatnonzero(fully_available) + 1
+        if len(candidates) == 0:
             continue
+        starts = np.sort(rng.choice(candidates, min(num_gaps, len(candidates)), replace=False))
+        starts = starts[np.diff(starts, prepend=-window) >= window]
+        hidden[(starts[:, None] + np.arange(gap_length)).ravel()] = True
+    return hidden
+
+
+def evaluate_interpolation(
+        tracker: BallTracker,
+        original_tracks: Dict[int, Dict[int, TrackDetailBase]],
+        methods: Sequence[str] = GAP_FILL_METHODS,
+        mask_ratio: Optional[float] = 0.1,
+        gap_lengths: Optional[Sequence[int]] = None,
+        num_gaps: int = 100,
+        seed: int = 0,
+        max_gap: Optional[int] = None,
+        cut_frames: Optional[Iterable[int]] = None) -> Dict[str, Dict]:
+    """
+    Evalúa métodos de interpolación del balón ocultando detecciones reales
+    (holdout), rellenándolas con cada método y comparando el centro estimado
+    con el detectado. Todos los métodos usan el mismo conjunto oculto y el mismo
+    `max_gap`/`cut_frames` que el relleno de producción; los frames ocultos que
+    el relleno deja en NaN no entran en el error y se cuentan como sin rellenar.
+
+    Args:
+        tracker (BallTracker): Tracker del balón.
+        original_tracks (Dict[int, Dict[int, TrackDetailBase]]): Tracks del balón;
+            los frames marcados como interpolados no cuentan como detecciones.
+        methods (Sequence[str]): Métodos de relleno a comparar.
+        mask_ratio (Optional[float]): Proporción de frames detectados que se ocultan
+            al azar (se ignora si se indican `gap_lengths`).
+        gap_lengths (Optional[Sequence[int]]): Longitudes de huecos sintéticos.
+        num_gaps (int): Huecos sintéticos por longitud.
+        seed (int): Semilla del generador aleatorio.
+        max_gap (Optional[int]): Hueco máximo que se rellena (ver
+            `BallTracker.fill_gaps`).
+        cut_frames (Optional[Iterable[int]]): Frames en los que empieza un nuevo
+            plano; los huecos que los contienen no se rellenan.
+
+    Returns:
+        Dict[str, Dict]: Por método, el error cuadrático medio del centro en los
+        frames rellenados ("error", px², NaN si no se rellenó ninguno), el número
+        de frames ocultos sin rellenar ("unfilled"), el tiempo de relleno
+        ("runtime", s) y, como arreglos alineados, las longitudes de hueco
+        evaluadas ("gap_lengths"), su error medio ("error_by_gap_length", NaN sin
+        frames rellenados), el número de frames ocultos ("samples") y cuántos
+        quedaron sin rellenar ("unfilled_by_gap_length"). Si el holdout ocultaría
+        todas las detecciones no queda ninguna para rellenar: no se evalúa ningún
+        frame (error 0.0 y arreglos vacíos), como sin balón.
+    """
+    detected, bboxes = _get_detections(tracker, original_tracks)
+    hidden = _holdout_mask(
+        detected, mask_ratio, gap_lengths, num_gaps, np.random.default_rng(seed))
+
+    frame_nums = np.flatnonzero(detected)
+    keep = ~hidden[frame_nums]
+    if not keep.any():
+        # Sin detecciones de apoyo el relleno sería todo NaN: no se oculta nada
+        keep[:] = True
+        hidden[:] = False
+    hidden_frames = frame_nums[~keep]
+    truth = calculate_bbox_center(bboxes[~keep].T)
+
+    # Longitud del hueco (natural + oculto) al que pertenece cada frame oculto
+    hidden_lengths = BallTracker.gap_lengths(detected & ~hidden)[hidden_frames]
+    samples = np.bincount(hidden_lengths)
+    evaluated = np.flatnonzero(samples)
+
+    report = {}
+    for method in methods:
+        start = time.perf_counter()
+        filled, _ = BallTracker.fill_gaps(
+            frame_nums[keep], bboxes[keep], len(detected), max_gap=max_gap,
+            method=method, cut_frames=cut_frames)
+        runtime = time.perf_counter() - start
+
+        errors = np.sum((calculate_bbox_center(filled[hidden_frames].T) - truth) ** 2, axis=0)
+        is_filled = ~np.isnan(errors)
+        filled_samples = np.bincount(
+            hidden_lengths[is_filled], minlength=len(samples))[evaluated]
+        error_sums = np.bincount(
+            hidden_lengths[is_filled], weights=errors[is_filled], minlength=len(samples))
+        if is_filled.any():
+            error = float(errors[is_filled].mean())
+        else:
+            error = np.nan if len(errors) else 0.0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            error_by_gap_length = error_sums[evaluated] / filled_samples
+        report[method] = {
+            'error': error,
+            'unfilled': int(np.count_nonzero(~is_filled)),
+            'runtime': runtime,
+            'gap_lengths': evaluated,
+            'error_by_gap_length': error_by_gap_length,
+            'samples': samples[evaluated],
+            'unfilled_by_gap_length': samples[evaluated] - filled_samples
+        }
+    return report
+
+
+def select_gap_filler(report: Dict[str, Dict], max_error: float) -> Optional[str]:
+    """
+    Elige el método más rápido cuyo error medio no supera `max_error`, o None si
+    ninguno lo cumple.
+    """
+    valid = [method for method, result in report.items() if result['error'] <= max_error]
+    return min(valid, key=lambda method: report[method]['runtime'], default=None)
+
+
+def calculate_interpolation_error(
+        tracker: BallTracker,
+        original_tracks: Dict[int, Dict[int, TrackDetailBase]],
+        method: str = "linear",
+        mask_ratio: float = 0.1,
+        seed: int = 0,
+        max_gap: Optional[int] = None,
+        cut_frames: Optional[Iterable[int]] = None) -> float:
+    """
+    Error cuadrático medio (px²) del centro del balón en frames detectados que se
+    ocultan al azar y se reconstruyen con `method`, con el mismo `max_gap` y
+    `cut_frames` que el relleno de producción (ver `evaluate_interpolation`).
+    """
+    report = evaluate_interpolation(
+        tracker, original_tracks, methods=(method,), mask_ratio=mask_ratio, seed=seed,
+        max_gap=max_gap, cut_frames=cut_frames)
+    return report[method]['error']
+
+
+def benchmark_gap_fillers(
+        tracker: BallTracker,
+        original_tracks: Dict[int, Dict[int, TrackDetailBase]],
+        gap_length: int = 12,
+        num_gaps: int = 100,
+        methods: Sequence[str] = GAP_FILL_METHODS,
+        seed: int = 0,
+        max_gap: Optional[int] = None,
+        cut_frames: Optional[Iterable[int]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Compara métodos de relleno de huecos del balón con huecos sintéticos de
+    `gap_length` frames.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Por método, el error medio ("error", px²), los
+        frames ocultos sin rellenar ("unfilled") y el tiempo de relleno
+        ("runtime", s).
+    """
+    report = evaluate_interpolation(
+        tracker, original_tracks, methods, gap_lengths=(gap_length,),
+        num_gaps=num_gaps, seed=seed, max_gap=max_gap, cut_frames=cut_frames)
+    return {
+        method: {
+            'error': result['error'],
+            'unfilled': result['unfilled'],
+            'runtime': result['runtime']
+        }
+        for method, result in report.items()
+    }
 
-        for track_id, track_detail in track_content.items():
-            if track_id == 1:  # solo bola
-                original_bbox = track_detail.bbox
-                interpolated_bbox = interpolated_tracks[frame_num][1]["bbox"]
-
-                if (
-                    original_bbox is None or interpolated_bbox is None
-                    or len(original_bbox) != 4 or len(interpolated_bbox) != 4
-                ):
-                    continue
-
-                error = np.sum(
-                    (calculate_bbox_center(original_bbox) -
-                     calculate_bbox_center(interpolated_bbox)) ** 2)
-                errors.append(error)
-
-    return float(np.mean(errors)) if errors else 0.0
-
-    # for orig_frame, interp_frame in zip(original_tracks, interpolated_tracks):
-    #     if 1 in orig_frame and 1 in interp_frame:
-    #         orig_bbox = orig_frame[1]["bbox"]
-    #         interp_bbox = interp_frame[1]["bbox"]
-    #         orig_center = np.array([
-    #             (orig_bbox[0] + orig_bbox[2]) / 2,
-    #             (orig_bbox[1] + orig_bbox[3]) / 2
-    #         ])
-    #         interp_center = np.array([
-    #             (interp_bbox[0] + interp_bbox[2]) / 2,
-    #             (interp_bbox[1] + interp_bbox[3]) / 2
-    #         ])
-    #         error = np.sum((orig_center - interp_center) ** 2)
-    #         errors.append(error)
-
-    # return np.mean(errors) if errors else 0.0
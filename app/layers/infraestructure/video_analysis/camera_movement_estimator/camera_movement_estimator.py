@@ -1,13 +1,15 @@
-import gc
 import logging
 import pathlib
 import pickle
+from typing import Iterable
 
 import cv2
 import numpy as np
 from cv2.typing import MatLike
 
 from app.layers.domain.collections.track_collection import TrackCollection
+from app.layers.infraestructure.video_analysis.rendering.annotation_renderer import \
+    draw_camera_movement
 
 
 class CameraMovementEstimator():
@@ -90,13 +92,22 @@ class CameraMovementEstimator():
             self,
             frames: list[MatLike],
             read_from_stub: bool = False,
-            stub_path: str = ""):
+            stub_path: str = "",
+            cut_frames: Iterable[int] | None = None):
+        """
+        Estima el movimiento de cámara entre frames consecutivos con flujo óptico.
+
+        En los frames de `cut_frames` (inicio de un nuevo plano) no se calcula
+        flujo: el movimiento queda en cero y las características se vuelven a
+        detectar sobre el nuevo plano.
+        """
         # Read the stub
         if read_from_stub and stub_path is not None and pathlib.Path(stub_path).exists():
             with pathlib.Path(stub_path).open('rb') as f:
                 return pickle.load(f)
 
         camera_movement = [[0, 0]] * len(frames)
+        cut_frames = set(cut_frames or ())
 
         old_gray = cv2.cvtColor(frames[0], cv2.COLOR_BGR2GRAY)
         old_features = cv2.goodFeaturesToTrack(
@@ -104,6 +115,14 @@ class CameraMovementEstimator():
 
         for frame_num in range(1, len(frames)):
             frame_gray = cv2.cvtColor(frames[frame_num], cv2.COLOR_BGR2GRAY)
+
+            if frame_num in cut_frames:
+                # El flujo óptico no tiene sentido a través de un corte de plano
+                old_features = cv2.goodFeaturesToTrack(
+                    frame_gray, **self.features)  # type: ignore
+                old_gray = frame_gray
+                continue
+
             new_features, _, _ = cv2.calcOpticalFlowPyrLK(
                 old_gray,
                 frame_gray,
@@ -175,29 +194,7 @@ class CameraMovementEstimator():
 
         for frame_num, frame in enumerate(frames):
             frame = np.copy(frame)
-
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (0, 0), (500, 100), (255, 255, 255), -1)
-            alpha = 0.6
-            cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
             x_movement, y_movement = camera_movement_per_frame[frame_num]
-            frame = cv2.putText(frame,
-                                f"Camera Movement X: {x_movement:.2f}",
-                                (10, 30),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                1,
-                                (0, 0, 0),
-                                3)
-            frame = cv2.putText(frame,
-                                f"Camera Movement Y: {y_movement:.2f}",
-                                (10, 60),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                1,
-                                (0, 0, 0),
-                                3)
-            output_frames.append(frame)
-
-            if frame_num % 50 == 0:
-                gc.collect()
+            output_frames.append(draw_camera_movement(frame, x_movement, y_movement))
 
         return output_frames
@@ -0,0 +1 @@
+from .event_detector import BallEvent, EventDetector
@@ -0,0 +1,343 @@
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from pydantic import BaseModel
+
+from app.layers.domain.collections.track_collection import TrackCollection
+from app.layers.infraestructure.video_analysis.player_ball_assigner.possession_decoder import \
+    PossessionSpan
+
+
+class BallEvent(BaseModel):
+    """
+    Evento de balón derivado de la secuencia de posesión.
+
+    Attributes:
+        event_type: "pass", "interception" o "shot".
+        start_frame (int): Último frame con el balón del jugador que lo suelta.
+        end_frame (int): Frame de recepción (pase/intercepción) o fin de la
+            ventana de disparo.
+        from_track_id (int): Jugador que suelta el balón.
+        to_track_id (int): Jugador que lo recibe (-1 en disparos sin receptor).
+        receiver_end_frame (int): Fin (exclusivo) de la posesión del receptor, o
+            `end_frame` si no hay receptor.
+        team (int): Equipo del jugador que suelta el balón.
+        peak_speed (float): Velocidad máxima del balón tras soltarlo (px/frame).
+    """
+    event_type: Literal["pass", "interception", "shot"]
+    start_frame: int
+    end_frame: int
+    from_track_id: int
+    to_track_id: int
+    receiver_end_frame: int
+    team: int
+    peak_speed: float
+
+
+class EventDetector:
+    """
+    Motor de eventos (pases, intercepciones y disparos) a partir de los tramos de
+    posesión y de la trayectoria del balón.
+
+    Para cada par de tramos consecutivos de jugadores distintos separados por
+    menos de `max_pass_gap` frames:
+        - mismo equipo y el balón recorre al menos `min_pass_distance` → pase;
+        - si no, un pico de velocidad del balón ≥ `shot_speed_threshold` en los
+          `shot_window` frames tras soltarlo y dirigido hacia la portería rival
+          → disparo (sin `goal_positions` no se clasifica ningún disparo, ver
+          `estimate_goal_positions`);
+        - si no, equipo distinto → intercepción.
+    Si alguno de los dos jugadores no tiene equipo asignado (equipo ≤ 0) el
+    cambio de posesión es desconocido: no genera pase ni intercepción. Un tramo
+    sin continuación cercana solo puede terminar en disparo.
+
+    La trayectoria del balón usa `position_adjusted` (píxeles compensados por el
+    movimiento de cámara), por lo que distancias y velocidades están en píxeles.
+
+    La detección es incremental: los eventos que empiezan antes de
+    `finalized_frame` ya no pueden cambiar y no se recalculan, y en cada llamada
+    solo se reescriben los tracks a partir de ese frame.
+    """
+
+    def __init__(
+            self,
+            max_pass_gap: int = 48,
+            min_pass_distance: float = 40.0,
+            shot_speed_threshold: float = 18.0,
+            shot_window: int = 12,
+            goal_positions: Optional[Dict[int, Tuple[float, float]]] = None,
+            min_goal_alignment: float = 0.7):
+        self.max_pass_gap = max_pass_gap
+        self.min_pass_distance = min_pass_distance
+        self.shot_speed_threshold = shot_speed_threshold
+        self.shot_window = shot_window
+        # Portería que ataca cada equipo, en las mismas coordenadas que el balón
+        self.goal_positions = goal_positions
+        self.min_goal_alignment = min_goal_alignment
+
+        self.events: List[BallEvent] = []
+        self.finalized_frame = 0
+
+    def reset(self) -> None:
+        """Olvida los eventos detectados (p. ej. al procesar otro partido)."""
+        self.events = []
+        self.finalized_frame = 0
+
+    @staticmethod
+    def estimate_goal_positions(
+            tracks_collection: TrackCollection) -> Optional[Dict[int, Tuple[float, float]]]:
+        """
+        Estima la portería que ataca cada equipo, en `position_adjusted`.
+
+        El lado de cada equipo se decide por la x media de sus jugadores en
+        coordenadas del campo (`position_transformed`, cuyo eje x va de portería
+        a portería): el equipo con la x media menor defiende la portería de ese
+        lado y ataca la contraria. Cada portería se sitúa en el extremo en x de
+        las posiciones de jugadores observadas, a la altura media del campo. Se
+        asume que los equipos no cambian de lado dentro del video.
+
+        Returns:
+            Optional[Dict[int, Tuple[float, float]]]: Portería atacada por los
+            equipos 1 y 2, o None si no hay dos equipos con posiciones en el campo.
+        """
+        _, _, teams = tracks_collection.get_columns("players", "team", dims=1)
+        _, _, transformed = tracks_collection.get_columns("players", "position_transformed")
+        _, _, adjusted = tracks_collection.get_columns("players", "position_adjusted")
+        teams = teams[:, 0]
+
+        mean_x = []
+        for team in (1, 2):
+            rows = (teams == team) & ~np.isnan(transformed[:, 0])
+            if not rows.any():
+                return None
+            mean_x.append(transformed[rows, 0].mean())
+        if mean_x[0] == mean_x[1]:
+            return None
+
+        valid = ~np.isnan(adjusted).any(axis=1)
+        if not valid.any():
+            return None
+        left_goal = (float(adjusted[valid, 0].min()), float(np.median(adjusted[valid, 1])))
+        right_goal = (float(adjusted[valid, 0].max()), left_goal[1])
+        # El equipo de la izquierda ataca la portería de la derecha
+        if mean_x[0] < mean_x[1]:
+            return {1: right_goal, 2: left_goal}
+        return {1: left_goal, 2: right_goal}
+
+    def get_ball_positions(
+            self,
+            tracks_collection: TrackCollection,
+            num_frames: int,
+            start_frame: int = 0) -> np.ndarray:
+        """
+        Posición del balón por frame (num_frames, 2), con NaN donde no se conoce.
+        """
+        positions = np.full((num_frames, 2), np.nan)
+        frame_nums, track_ids, values = tracks_collection.get_columns(
+            "ball", "position_adjusted", dims=2, start_frame=start_frame)
+        in_range = (track_ids == 1) & (frame_nums < num_frames)
+        positions[frame_nums[in_range]] = values[in_range]
+        return positions
+
+    def detect_events(
+            self,
+            tracks_collection: TrackCollection,
+            possession_spans: Sequence[PossessionSpan],
+            num_frames: int) -> List[BallEvent]:
+        """
+        Detecta los eventos desde `finalized_frame` y rellena en bloque los campos
+        `passing`, `shooting`, `pass_counter`, `shooting_counter`, `passed_to` y
+        `received_from` de los jugadores.
+
+        Args:
+            tracks_collection (TrackCollection): Colección con tracks de jugadores y balón.
+            possession_spans (Sequence[PossessionSpan]): Tramos de posesión ordenados.
+            num_frames (int): Número de frames disponibles del video.
+
+        Returns:
+            List[BallEvent]: Todos los eventos detectados hasta ahora, en orden.
+        """
+        start_frame = self.finalized_frame
+        self.events = [event for event in self.events if event.start_frame < start_frame]
+
+        spans = [span for span in possession_spans if span.end_frame - 1 >= start_frame]
+        if spans:
+            # Margen hacia atrás para la posición del balón al soltarlo
+            positions = self.get_ball_positions(
+                tracks_collection, num_frames, max(0, spans[0].end_frame - 2))
+            self.events.extend(self._classify_spans(spans, positions))
+
+        self.finalized_frame = max(
+            self.finalized_frame, num_frames - self.max_pass_gap - self.shot_window)
+        self._write_fields(tracks_collection, start_frame, num_frames)
+        return self.events
+
+    def _classify_spans(
+            self,
+            spans: Sequence[PossessionSpan],
+            positions: np.ndarray) -> List[BallEvent]:
+        """Clasifica de forma vectorizada el final de cada tramo de posesión."""
+        num_frames = len(positions)
+        track_ids = np.array([span.track_id for span in spans], dtype=np.int64)
+        teams = np.array([span.team for span in spans], dtype=np.int64)
+        releases = np.array([span.end_frame - 1 for span in spans], dtype=np.int64)
+        starts = np.array([span.start_frame for span in spans], dtype=np.int64)
+        ends = np.array([span.end_frame for span in spans], dtype=np.int64)
+
+        # Tramo siguiente (el último no tiene)
+        next_ids = np.append(track_ids[1:], -1)
+        next_teams = np.append(teams[1:], -1)
+        receptions = np.append(starts[1:], num_frames)
+        next_ends = np.append(ends[1:], num_frames)
+        has_next = (
+            (next_ids >= 0) & (next_ids != track_ids)
+            & (receptions - releases - 1 <= self.max_pass_gap))
+
+        release_positions = positions[releases]
+        reception_positions = positions[np.minimum(receptions, num_frames - 1)]
+        travel = np.linalg.norm(reception_positions - release_positions, axis=1)
+        # Sin posición del balón no se puede medir el recorrido: no descarta el pase
+        travelled = np.isnan(travel) | (travel >= self.min_pass_distance)
+
+        # Velocidad por frame y pico dentro de la ventana posterior a soltar el balón
+        speeds = np.full(num_frames + self.shot_window, -np.inf)
+        step = np.linalg.norm(np.diff(positions, axis=0), axis=1)
+        speeds[1:num_frames] = np.where(np.isnan(step), -np.inf, step)
+        windows = sliding_window_view(speeds, self.shot_window)[releases + 1]
+        peak_offsets = np.argmax(windows, axis=1)
+        peak_speeds = windows[np.arange(len(spans)), peak_offsets]
+        is_fast = peak_speeds >= self.shot_speed_threshold
+
+        # Sin porterías no hay dirección de ataque: no se clasifican disparos
+        if self.goal_positions is None:
+            is_fast[:] = False
+        else:
+            goals = np.array([
+                self.goal_positions.get(team, (np.nan, np.nan)) for team in teams.tolist()
+            ], dtype=np.float64)
+            peak_frames = np.minimum(releases + 1 + peak_offsets, num_frames - 1)
+            direction = positions[peak_frames] - release_positions
+            to_goal = goals - release_positions
+            with np.errstate(invalid="ignore", divide="ignore"):
+                alignment = np.einsum("nd,nd->n", direction, to_goal) / (
+                    np.linalg.norm(direction, axis=1) * np.linalg.norm(to_goal, axis=1))
+            is_fast &= alignment >= self.min_goal_alignment
+
+        # Con un equipo desconocido en cualquiera de los lados no se decide el tipo
+        known_teams = (teams > 0) & (next_teams > 0)
+        same_team = known_teams & (teams == next_teams)
+        is_pass = has_next & same_team & travelled
+        is_shot = ~is_pass & is_fast
+        is_interception = ~is_pass & ~is_shot & has_next & known_teams & ~same_team
+
+        event_types = np.full(len(spans), "", dtype=object)
+        event_types[is_pass] = "pass"
+        event_types[is_interception] = "interception"
+        event_types[is_shot] = "shot"
+        end_frames = np.where(
+            is_shot & ~has_next, releases + self.shot_window, receptions)
+        receiver_ends = np.where(has_next, next_ends, end_frames)
+
+        return [
+            BallEvent(
+                event_type=event_type,
+                start_frame=release,
+                end_frame=end_frame,
+                from_track_id=track_id,
+                to_track_id=next_id if connected else -1,
+                receiver_end_frame=receiver_end,
+                team=team,
+                peak_speed=max(0.0, peak_speed))
+            for (event_type, release, end_frame, track_id, next_id, connected, receiver_end,
+                 team, peak_speed)
+            in zip(
+                event_types.tolist(), releases.tolist(), end_frames.tolist(),
+                track_ids.tolist(), next_ids.tolist(), has_next.tolist(),
+                receiver_ends.tolist(), teams.tolist(), peak_speeds.tolist())
+            if event_type
+        ]
+
+    @staticmethod
+    def _interval_values(
+            row_keys: np.ndarray,
+            start_keys: np.ndarray,
+            end_keys: np.ndarray,
+            values: np.ndarray,
+            default) -> np.ndarray:
+        """
+        Valor del intervalo [start, end) que contiene cada fila, o `default`.
+        Los intervalos de un mismo track no se solapan.
+        """
+        result = np.full(len(row_keys), default, dtype=np.asarray(values).dtype)
+        if len(start_keys) == 0:
+            return result
+        order = np.argsort(start_keys, kind="stable")
+        start_keys, end_keys, values = start_keys[order], end_keys[order], values[order]
+        index = np.searchsorted(start_keys, row_keys, side="right") - 1
+        inside = (index >= 0) & (row_keys < end_keys[np.maximum(index, 0)])
+        result[inside] = values[index[inside]]
+        return result
+
+    def _write_fields(
+            self,
+            tracks_collection: TrackCollection,
+            start_frame: int,
+            num_frames: int) -> None:
+        """Escribe en bloque los campos de eventos de los jugadores desde `start_frame`."""
+        frame_nums, track_ids, _ = tracks_collection.get_columns(
+            "players", "bbox", dims=4, start_frame=start_frame)
+        if len(frame_nums) == 0:
+            return
+
+        # Clave (track, frame) ordenable: los intervalos de cada track quedan contiguos
+        stride = max(int(frame_nums.max()), num_frames + self.shot_window) + 2
+        row_keys = track_ids * stride + frame_nums
+
+        def event_columns(event_type: str):
+            events = [event for event in self.events if event.event_type == event_type]
+            return tuple(
+                np.array([getattr(event, field) for event in events], dtype=np.int64)
+                for field in (
+                    "from_track_id", "to_track_id", "start_frame", "end_frame",
+                    "receiver_end_frame"))
+
+        pass_from, pass_to, pass_starts, pass_ends, receiver_ends = event_columns("pass")
+        shot_from, _, shot_starts, shot_ends, _ = event_columns("shot")
+
+        # Contadores acumulados: eventos del track con inicio <= frame de la fila
+        pass_keys = np.sort(pass_from * stride + pass_starts)
+        shot_keys = np.sort(shot_from * stride + shot_starts)
+        track_keys = track_ids * stride
+        pass_counter = (
+            np.searchsorted(pass_keys, row_keys, side="right")
+            - np.searchsorted(pass_keys, track_keys, side="left"))
+        shooting_counter = (
+            np.searchsorted(shot_keys, row_keys, side="right")
+            - np.searchsorted(shot_keys, track_keys, side="left"))
+
+        # El pasador lleva `passing`/`passed_to` desde que suelta el balón hasta la
+        # recepción; el receptor lleva `received_from` mientras conserva el balón
+        pass_start_keys = pass_from * stride + pass_starts
+        pass_end_keys = pass_from * stride + pass_ends + 1
+        passed_to = self._interval_values(
+            row_keys, pass_start_keys, pass_end_keys, pass_to, -1)
+
+        received_from = self._interval_values(
+            row_keys, pass_to * stride + pass_ends, pass_to * stride + receiver_ends,
+            pass_from, -1)
+
+        shooting = self._interval_values(
+            row_keys, shot_from * stride + shot_starts, shot_from * stride + shot_ends,
+            np.ones(len(shot_from), dtype=bool), False)
+
+        tracks_collection.set_values(
+            "players",
+            frame_nums,
+            track_ids,
+            passing=passed_to >= 0,
+            passed_to=passed_to,
+            received_from=received_from,
+            shooting=shooting,
+            pass_counter=pass_counter,
+            shooting_counter=shooting_counter)
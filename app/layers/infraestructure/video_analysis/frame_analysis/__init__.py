@@ -0,0 +1,3 @@
+from .pitch_mask import PitchMasker
+from .shot_boundary_detector import ShotBoundaryDetector, ShotSegment
+from .static_frame_gate import StaticFrameGate
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+# Rango HSV del césped compartido por el análisis de frames
+GREEN_LOWER = np.array([35, 40, 40], dtype=np.uint8)
+GREEN_UPPER = np.array([85, 255, 255], dtype=np.uint8)
+
+
+class PitchMasker:
+    """
+    Máscara HSV del césped calculada sobre el frame reducido.
+
+    Permite descartar los píxeles de césped al extraer colores de camiseta y
+    rechazar detecciones cuyo bbox es casi todo césped, con operaciones
+    vectorizadas en lugar de un paso de clustering. Una misma instancia puede
+    compartirse entre el tracker y el `TeamAssigner` para calcular la máscara de
+    cada frame una sola vez (`cache_size=None` conserva todas las máscaras).
+    """
+
+    def __init__(self, scale: float = 0.25, cache_size: Optional[int] = 32):
+        self.scale = scale
+        self.cache_size = cache_size
+        self._cache: OrderedDict[int, np.ndarray] = OrderedDict()
+
+    def compute_mask(self, frame: MatLike) -> np.ndarray:
+        """
+        Calcula la máscara de césped del frame reducido.
+
+        Args:
+            frame (MatLike): Frame BGR original.
+
+        Returns:
+            np.ndarray: Máscara booleana (h * scale, w * scale), True en el césped.
+        """
+        small = cv2.resize(
+            frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        return cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER) > 0
+
+    def get_mask(self, frame_num: int, frame: MatLike) -> np.ndarray:
+        """
+        Devuelve la máscara del frame, reutilizándola si se calculó hace poco.
+        """
+        mask = self._cache.get(frame_num)
+        if mask is None:
+            mask = self.compute_mask(frame)
+            self._cache[frame_num] = mask
+            if self.cache_size is not None and len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(frame_num)
+        return mask
+
+    def _scale_boxes(self, mask: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+        """Lleva bboxes del frame original a índices enteros de la máscara reducida."""
+        height, width = mask.shape
+        scaled = np.round(np.asarray(boxes, dtype=np.float64).reshape(-1, 4) * self.scale)
+        scaled[:, [0, 2]] = np.clip(scaled[:, [0, 2]], 0, width)
+        scaled[:, [1, 3]] = np.clip(scaled[:, [1, 3]], 0, height)
+        return scaled.astype(np.int64)
+
+    def crop_mask(self, mask: np.ndarray, bbox: Sequence[float]) -> np.ndarray:
+        """
+        Recorta la máscara en la región de un bbox del frame original.
+        """
+        x1, y1, x2, y2 = self._scale_boxes(mask, np.asarray(bbox))[0]
+        return mask[y1:y2, x1:x2]
+
+    def grass_ratios(self, mask: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+        """
+        Calcula qué proporción de cada bbox es césped usando la imagen integral.
+
+        Args:
+            mask (np.ndarray): Máscara de césped del frame.
+            boxes (np.ndarray): Bboxes (n, 4) en coordenadas del frame original.
+
+        Returns:
+            np.ndarray: Proporción de césped de cada bbox (n,); 0 para bboxes vacíos.
+        """
+        if len(boxes) == 0:
+            return np.empty(0, dtype=np.float64)
+
+        integral = cv2.integral(mask.astype(np.uint8))
+        x1, y1, x2, y2 = self._scale_boxes(mask, boxes).T
+        grass = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        areas = (x2 - x1) * (y2 - y1)
+        return np.where(areas > 0, grass / np.maximum(areas, 1), 0.0)
@@ -0,0 +1,135 @@
+from typing import List, Set
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+from pydantic import BaseModel
+
+from app.layers.infraestructure.video_analysis.frame_analysis.pitch_mask import (
+    GREEN_LOWER, GREEN_UPPER)
+
+
+class ShotSegment(BaseModel):
+    """
+    Segmento continuo del video entre dos cortes de cámara.
+
+    Attributes:
+        start_frame (int): Primer frame del plano (inclusivo).
+        end_frame (int): Último frame del plano (exclusivo).
+        is_wide (bool): True si es un plano abierto del campo, False si es
+            un primer plano, repetición o gráfico.
+        green_ratio (float): Proporción media de píxeles de césped del plano.
+    """
+    start_frame: int
+    end_frame: int
+    is_wide: bool
+    green_ratio: float
+
+
+class ShotBoundaryDetector:
+    """
+    Detector barato de cortes de plano basado en la diferencia de histogramas
+    HSV de frames reducidos, que además clasifica cada plano como abierto
+    (campo visible) o primer plano/repetición según su proporción de césped.
+    """
+
+    def __init__(
+            self,
+            downscale_width: int = 160,
+            cut_threshold: float = 0.45,
+            min_shot_length: int = 12,
+            wide_green_ratio: float = 0.4):
+        self.downscale_width = downscale_width
+        self.cut_threshold = cut_threshold
+        self.min_shot_length = min_shot_length
+        self.wide_green_ratio = wide_green_ratio
+
+        self.hist_bins = [16, 8]
+        self.hist_ranges = [0, 180, 0, 256]
+
+    def _describe_frame(self, frame: MatLike) -> tuple[np.ndarray, float]:
+        """
+        Calcula el histograma H-S normalizado y la proporción de césped
+        de un frame reducido.
+
+        Args:
+            frame (MatLike): Frame BGR original.
+
+        Returns:
+            tuple[np.ndarray, float]: Histograma normalizado y proporción de
+            píxeles verdes en [0, 1].
+        """
+        height, width = frame.shape[:2]
+        scale = self.downscale_width / width
+        small = cv2.resize(
+            frame,
+            (self.downscale_width, max(1, int(height * scale))),
+            interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+
+        hist = cv2.calcHist([hsv], [0, 1], None, self.hist_bins, self.hist_ranges)
+        cv2.normalize(hist, hist, alpha=1.0, norm_type=cv2.NORM_L1)
+
+        green_mask = cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER)
+        green_ratio = float(np.count_nonzero(green_mask)) / green_mask.size
+        return hist, green_ratio
+
+    def detect_shots(self, frames: List[MatLike]) -> List[ShotSegment]:
+        """
+        Segmenta el video en planos y los clasifica como abiertos o no.
+
+        Args:
+            frames (List[MatLike]): Frames del video.
+
+        Returns:
+            List[ShotSegment]: Planos ordenados que cubren todo el video.
+        """
+        if not frames:
+            return []
+
+        histograms = []
+        green_ratios = np.empty(len(frames), dtype=np.float32)
+        for frame_num, frame in enumerate(frames):
+            hist, green_ratios[frame_num] = self._describe_frame(frame)
+            histograms.append(hist)
+
+        distances = np.array([
+            cv2.compareHist(histograms[i - 1], histograms[i], cv2.HISTCMP_BHATTACHARYYA)
+            for i in range(1, len(histograms))
+        ], dtype=np.float32)
+        candidate_cuts = np.flatnonzero(distances > self.cut_threshold) + 1
+
+        # Descarta cortes demasiado cercanos (destellos, transiciones graduales)
+        boundaries = [0]
+        for cut in candidate_cuts:
+            if cut - boundaries[-1] >= self.min_shot_length:
+                boundaries.append(int(cut))
+        boundaries.append(len(frames))
+
+        shots = []
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            green_ratio = float(np.median(green_ratios[start:end]))
+            shots.append(ShotSegment(
+                start_frame=start,
+                end_frame=end,
+                is_wide=green_ratio >= self.wide_green_ratio,
+                green_ratio=green_ratio))
+        return shots
+
+    @staticmethod
+    def get_cut_frames(shots: List[ShotSegment]) -> Set[int]:
+        """
+        Devuelve los frames en los que comienza un nuevo plano (sin incluir el 0).
+        """
+        return {shot.start_frame for shot in shots if shot.start_frame > 0}
+
+    @staticmethod
+    def get_wide_frames(shots: List[ShotSegment]) -> List[int]:
+        """
+        Devuelve los índices de frame que pertenecen a planos abiertos.
+        """
+        return [
+            frame_num
+            for shot in shots if shot.is_wide
+            for frame_num in range(shot.start_frame, shot.end_frame)
+        ]
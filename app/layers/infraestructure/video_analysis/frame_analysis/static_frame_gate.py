@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+
+class StaticFrameGate:
+    """
+    Compuerta de cambio entre frames: compara cada frame reducido y en escala
+    de grises con el último frame que pasó por el detector y decide si el
+    cambio es suficiente para volver a ejecutar la inferencia.
+
+    Pausas, interrupciones y gráficos congelados producen rachas de frames casi
+    idénticos cuyas detecciones pueden reutilizarse sin pasar por YOLO.
+    """
+
+    def __init__(
+            self,
+            downscale_width: int = 320,
+            pixel_threshold: int = 12,
+            changed_ratio_threshold: float = 0.002,
+            max_skipped_frames: int = 24):
+        self.downscale_width = downscale_width
+        self.pixel_threshold = pixel_threshold
+        self.changed_ratio_threshold = changed_ratio_threshold
+        self.max_skipped_frames = max_skipped_frames
+
+        self.reference: np.ndarray | None = None
+        self.skipped_in_row = 0
+
+    def reset(self) -> None:
+        """Olvida el frame de referencia (p. ej. al iniciar un nuevo video o plano)."""
+        self.reference = None
+        self.skipped_in_row = 0
+
+    def _prepare(self, frame: MatLike) -> np.ndarray:
+        height, width = frame.shape[:2]
+        scale = self.downscale_width / width
+        small = cv2.resize(
+            frame,
+            (self.downscale_width, max(1, int(height * scale))),
+            interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        # El desenfoque evita que el ruido de compresión cuente como cambio
+        return cv2.GaussianBlur(gray, (3, 3), 0)
+
+    def is_static(self, frame: MatLike) -> bool:
+        """
+        Indica si el frame puede reutilizar las detecciones del frame de referencia.
+
+        Si el frame no es estático pasa a ser la nueva referencia.
+
+        Args:
+            frame (MatLike): Frame BGR original.
+
+        Returns:
+            bool: True si no hubo un cambio significativo respecto a la referencia.
+        """
+        current = self._prepare(frame)
+
+        if self.reference is not None and self.skipped_in_row < self.max_skipped_frames:
+            diff = cv2.absdiff(current, self.reference)
+            changed_ratio = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+            if changed_ratio < self.changed_ratio_threshold:
+                self.skipped_in_row += 1
+                return True
+
+        self.reference = current
+        self.skipped_in_row = 0
+        return False
@@ -1 +1,2 @@
 from .player_ball_assigner import PlayerBallAssigner
+from .possession_decoder import PossessionDecoder, PossessionSpan
@@ -1,13 +1,20 @@
 
-from typing import Dict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from app.layers.domain.collections.track_collection import TrackCollection
 from app.layers.domain.tracks.track_detail import TrackDetailBase
+from app.layers.infraestructure.video_analysis.player_ball_assigner.possession_decoder import (
+    PossessionDecoder, PossessionSpan)
 from app.layers.infraestructure.video_analysis.services.bbox_processor_service import (
     get_center_of_bbox, measure_scalar_distance)
 
 
 class PlayerBallAssigner():
-    def __init__(self):
+    def __init__(self, possession_decoder: Optional[PossessionDecoder] = None):
         self.max_player_ball_distance = 70
+        self.possession_decoder = possession_decoder
+        self.possession_spans: List[PossessionSpan] = []
 
     def assign_ball_to_player(
             self,
@@ -51,3 +58,133 @@ class PlayerBallAssigner():
                     assigned_player = player_id
 
         return assigned_player
+
+    def compute_distance_tensor(
+            self,
+            tracks_collection: TrackCollection,
+            num_frames: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calcula de una vez la distancia del balón a cada jugador en todos los frames.
+
+        La distancia de un jugador es la mínima entre el centro del balón y las dos
+        esquinas inferiores (pies) de su bbox. Los jugadores de cada frame ocupan
+        columnas consecutivas de un tensor rellenado hasta el máximo de jugadores
+        por frame.
+
+        Args:
+            tracks_collection (TrackCollection): Colección con tracks de jugadores y balón.
+            num_frames (int): Número de frames del video.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Distancias (frames, slots) con inf donde
+            no hay jugador o balón y track_id de cada slot (-1 si está vacío).
+        """
+        ball_centers = np.full((num_frames, 2), np.nan)
+        ball_frames, ball_ids, ball_bboxes = tracks_collection.get_columns("ball", "bbox", dims=4)
+        in_range = (ball_ids == 1) & (ball_frames < num_frames)
+        ball_frames, ball_bboxes = ball_frames[in_range], ball_bboxes[in_range]
+        ball_centers[ball_frames] = np.trunc(
+            (ball_bboxes[:, :2] + ball_bboxes[:, 2:]) / 2)
+
+        frame_nums, track_ids, bboxes = tracks_collection.get_columns("players", "bbox", dims=4)
+        keep = (frame_nums < num_frames) & ~np.isnan(bboxes).any(axis=1)
+        order = np.argsort(frame_nums[keep], kind="stable")
+        frame_nums = frame_nums[keep][order]
+        track_ids = track_ids[keep][order]
+        bboxes = bboxes[keep][order]
+
+        # Posición de cada jugador dentro de su frame → columna del tensor
+        frame_starts = np.searchsorted(frame_nums, frame_nums, side="left")
+        slots = np.arange(len(frame_nums)) - frame_starts
+        num_slots = int(slots.max()) + 1 if len(slots) else 0
+
+        ball = ball_centers[frame_nums]
+        distance_left = np.hypot(bboxes[:, 0] - ball[:, 0], bboxes[:, 3] - ball[:, 1])
+        distance_right = np.hypot(bboxes[:, 2] - ball[:, 0], bboxes[:, 3] - ball[:, 1])
+        distances = np.fmin(distance_left, distance_right)
+
+        distance_tensor = np.full((num_frames, num_slots), np.inf)
+        candidate_ids = np.full((num_frames, num_slots), -1, dtype=np.int64)
+        distance_tensor[frame_nums, slots] = np.where(np.isnan(distances), np.inf, distances)
+        candidate_ids[frame_nums, slots] = track_ids
+        return distance_tensor, candidate_ids
+
+    def assign_ball_to_players(
+            self,
+            tracks_collection: TrackCollection,
+            num_frames: int,
+            cut_frames: Optional[Iterable[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Asigna el balón al jugador más cercano en todos los frames a la vez y
+        escribe en bloque `has_ball` en los tracks de jugadores.
+
+        Args:
+            tracks_collection (TrackCollection): Colección con tracks de jugadores y balón.
+            num_frames (int): Número de frames del video.
+            cut_frames (Optional[Iterable[int]]): Frames en los que empieza un nuevo
+                plano; la posesión decodificada no se arrastra a través de ellos.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Track_id del jugador con el balón por
+            frame (-1 si nadie) y equipo en control por frame, que mantiene el
+            último equipo conocido cuando no hay asignación (-1 al inicio).
+        """
+        distances, candidate_ids = self.compute_distance_tensor(tracks_collection, num_frames)
+
+        if self.possession_decoder is not None:
+            # Posesión suavizada: sin parpadeos entre jugadores cercanos
+            assigned_players = self.possession_decoder.decode(
+                distances, candidate_ids, self.max_player_ball_distance, cut_frames)
+        else:
+            assigned_players = np.full(num_frames, -1, dtype=np.int64)
+            if distances.shape[1] > 0:
+                nearest = np.argmin(distances, axis=1)
+                frame_index = np.arange(num_frames)
+                has_owner = distances[frame_index, nearest] < self.max_player_ball_distance
+                assigned_players[has_owner] = candidate_ids[frame_index, nearest][has_owner]
+
+        self._write_has_ball(tracks_collection, candidate_ids, assigned_players)
+        assigned_teams = self.get_player_teams(tracks_collection, assigned_players)
+        self.possession_spans = PossessionDecoder.get_spans(assigned_players, assigned_teams)
+        return assigned_players, self.forward_fill_teams(assigned_teams)
+
+    @staticmethod
+    def get_player_teams(
+            tracks_collection: TrackCollection,
+            assigned_players: np.ndarray) -> np.ndarray:
+        """
+        Obtiene el equipo del jugador asignado en cada frame (-1 si no hay
+        jugador asignado o el jugador no aparece en ese frame).
+        """
+        player_frames = tracks_collection.tracks["players"]
+        assigned_frames = np.flatnonzero(assigned_players >= 0)
+        empty: dict = {}
+        teams = np.full(len(assigned_players), -1, dtype=np.int64)
+        teams[assigned_frames] = [
+            getattr(player_frames.get(frame_num, empty).get(track_id), "team", None) or -1
+            for frame_num, track_id in zip(
+                assigned_frames.tolist(), assigned_players[assigned_frames].tolist())
+        ]
+        return teams
+
+    @staticmethod
+    def forward_fill_teams(teams: np.ndarray) -> np.ndarray:
+        """
+        Propaga hacia delante el último equipo conocido (> 0) sobre los frames sin
+        equipo (-1); antes de la primera posesión el valor es -1.
+        """
+        known = teams > 0
+        last_known = np.where(known, np.arange(len(teams)), -1)
+        np.maximum.accumulate(last_known, out=last_known)
+        return np.where(last_known >= 0, teams[np.maximum(last_known, 0)], -1)
+
+    def _write_has_ball(
+            self,
+            tracks_collection: TrackCollection,
+            candidate_ids: np.ndarray,
+            assigned_players: np.ndarray) -> None:
+        """Escribe en bloque `has_ball` en todos los jugadores del tensor de candidatos."""
+        frame_nums, slots = np.nonzero(candidate_ids >= 0)
+        track_ids = candidate_ids[frame_nums, slots]
+        has_ball = assigned_players[frame_nums] == track_ids
+        tracks_collection.set_values("players", frame_nums, track_ids, has_ball=has_ball)
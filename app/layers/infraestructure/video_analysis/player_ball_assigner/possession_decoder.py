@@ -0,0 +1,183 @@
+from typing import Iterable, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+
+class PossessionSpan(BaseModel):
+    """
+    Tramo continuo en el que un mismo jugador tiene el balón.
+
+    Attributes:
+        track_id (int): Jugador en posesión.
+        team (int): Equipo del jugador (-1 si se desconoce).
+        start_frame (int): Primer frame del tramo (inclusivo).
+        end_frame (int): Último frame del tramo (exclusivo).
+    """
+    track_id: int
+    team: int
+    start_frame: int
+    end_frame: int
+
+
+class PossessionDecoder:
+    """
+    Decodificador de posesión por Viterbi sobre toda la secuencia.
+
+    Los estados son los jugadores que alguna vez estuvieron a distancia de
+    posesión del balón más un estado "nadie". El coste de emisión de un jugador
+    es su distancia al balón normalizada por la distancia máxima (1 si está
+    lejos o no aparece) y el de "nadie" es constante. Cambiar de estado cuesta
+    `switch_penalty`, de modo que los cambios de un frame entre jugadores
+    cercanos desaparecen. Con penalización uniforme, el mejor predecesor de cada
+    estado es él mismo o el mínimo global, así que cada paso es O(S).
+
+    Los frames sin balón no aportan información y mantienen el estado anterior
+    durante como mucho `max_carry_frames` frames (None: sin límite). En cada corte
+    de plano la cadena se reinicia: la decodificación no cruza el corte y el
+    poseedor no se arrastra al plano siguiente.
+    """
+
+    def __init__(
+            self,
+            switch_penalty: float = 2.0,
+            none_cost: float = 0.5,
+            chunk_size: int = 4096,
+            max_carry_frames: Optional[int] = 24):
+        self.switch_penalty = switch_penalty
+        self.none_cost = none_cost
+        self.chunk_size = chunk_size
+        self.max_carry_frames = max_carry_frames
+
+    def decode(
+            self,
+            distances: np.ndarray,
+            candidate_ids: np.ndarray,
+            max_distance: float,
+            cut_frames: Optional[Iterable[int]] = None) -> np.ndarray:
+        """
+        Obtiene el poseedor más probable de cada frame.
+
+        Args:
+            distances (np.ndarray): Distancias balón-jugador (frames, slots), inf si
+                no hay jugador o balón.
+            candidate_ids (np.ndarray): track_id de cada slot (frames, slots), -1 si
+                el slot está vacío.
+            max_distance (float): Distancia a partir de la cual un jugador no puede
+                tener el balón.
+            cut_frames (Optional[Iterable[int]]): Frames en los que empieza un nuevo
+                plano.
+
+        Returns:
+            np.ndarray: track_id en posesión por frame (-1 si nadie).
+        """
+        num_frames = len(distances)
+        possession = np.full(num_frames, -1, dtype=np.int64)
+        if num_frames == 0 or distances.shape[1] == 0:
+            return possession
+
+        in_range = distances < max_distance
+        state_ids = np.unique(candidate_ids[in_range])
+        if len(state_ids) == 0:
+            return possession
+        none_state = len(state_ids)
+
+        # Frames con balón: los que tienen al menos una distancia finita
+        observed = np.flatnonzero(np.isfinite(distances).any(axis=1))
+        observed_in_range = in_range[observed]
+        rows, slots = np.nonzero(observed_in_range)
+        states = np.searchsorted(state_ids, candidate_ids[observed][rows, slots])
+        costs = (distances[observed][rows, slots] / max_distance).astype(np.float32)
+        row_starts = np.searchsorted(rows, np.arange(len(observed) + 1))
+
+        # Plano de cada frame; en el primer frame observado de cada plano se reinicia
+        shot_ids = np.zeros(num_frames + 1, dtype=np.int64)
+        cuts = np.array(sorted(cut_frames or ()), dtype=np.int64)
+        np.add.at(shot_ids, cuts[(cuts > 0) & (cuts < num_frames)], 1)
+        shot_ids = np.cumsum(shot_ids[:num_frames])
+        observed_shots = shot_ids[observed]
+        shot_starts = set((np.flatnonzero(np.diff(observed_shots)) + 1).tolist())
+
+        values = np.zeros(none_state + 1, dtype=np.float32)
+        switched = np.zeros((len(observed), none_state + 1), dtype=bool)
+        best_states = np.empty(len(observed), dtype=np.int64)
+        penalty = np.float32(self.switch_penalty)
+
+        for chunk_start in range(0, len(observed), self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size, len(observed))
+            emissions = np.ones((chunk_end - chunk_start, none_state + 1), dtype=np.float32)
+            emissions[:, none_state] = self.none_cost
+            first, last = row_starts[chunk_start], row_starts[chunk_end]
+            emissions[rows[first:last] - chunk_start, states[first:last]] = costs[first:last]
+
+            for offset, emission in enumerate(emissions):
+                step = chunk_start + offset
+                best = values.argmin()
+                best_states[step] = best
+                if step in shot_starts:
+                    # Nuevo plano: todos los estados parten del mejor final del anterior
+                    switched[step] = True
+                    values.fill(values[best])
+                else:
+                    threshold = values[best] + penalty
+                    np.less(threshold, values, out=switched[step])
+                    np.minimum(values, threshold, out=values)
+                values += emission
+
+        # Backtracking por tramos: en cada estado se salta al último cambio
+        decoded = np.empty(len(observed), dtype=np.int64)
+        state = int(values.argmin())
+        step = len(observed) - 1
+        switch_steps = {}
+        while step >= 0:
+            if state not in switch_steps:
+                switch_steps[state] = np.flatnonzero(switched[:, state])
+            state_switches = switch_steps[state]
+            index = np.searchsorted(state_switches, step, side="right") - 1
+            start = int(state_switches[index]) if index >= 0 else 0
+            decoded[start:step + 1] = state
+            if start == 0:
+                break
+            state = int(best_states[start])
+            step = start - 1
+
+        observed_ids = np.append(state_ids, -1)[decoded]
+        # Los frames sin balón mantienen el poseedor del último frame observado del
+        # mismo plano, como mucho durante `max_carry_frames` frames
+        frames = np.arange(num_frames)
+        last_observed = np.searchsorted(observed, frames, side="right") - 1
+        has_previous = last_observed >= 0
+        source = observed[np.maximum(last_observed, 0)]
+        has_previous &= shot_ids[source] == shot_ids
+        if self.max_carry_frames is not None:
+            has_previous &= frames - source <= self.max_carry_frames
+        possession[has_previous] = observed_ids[last_observed[has_previous]]
+        return possession
+
+    @staticmethod
+    def get_spans(possession: np.ndarray, teams: np.ndarray) -> List[PossessionSpan]:
+        """
+        Agrupa la posesión por frame en tramos continuos del mismo jugador.
+
+        Args:
+            possession (np.ndarray): track_id en posesión por frame (-1 si nadie).
+            teams (np.ndarray): Equipo del poseedor por frame (-1 si se desconoce).
+
+        Returns:
+            List[PossessionSpan]: Tramos ordenados, sin los frames sin poseedor.
+        """
+        if len(possession) == 0:
+            return []
+
+        boundaries = np.flatnonzero(np.diff(possession)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ends = np.concatenate((boundaries, [len(possession)]))
+        return [
+            PossessionSpan(
+                track_id=int(possession[start]),
+                team=int(teams[start]),
+                start_frame=int(start),
+                end_frame=int(end))
+            for start, end in zip(starts.tolist(), ends.tolist())
+            if possession[start] >= 0
+        ]
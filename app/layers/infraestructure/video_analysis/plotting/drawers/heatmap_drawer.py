@@ -1,18 +1,45 @@
 from pathlib import Path
-from typing import Dict, Set
+from typing import Dict, Tuple
 import numpy as np
 import matplotlib.pyplot as plt
-import pandas as pd
 from mplsoccer import Pitch
+from scipy.ndimage import gaussian_filter
 
 from app.layers.domain.tracks.track_detail import TrackDetailBase
 from app.layers.infraestructure.video_analysis.plotting.interfaces import Diagram
 from app.layers.infraestructure.video_analysis.plotting.services import DrawerService
 
+HEATMAP_METHODS = ("histogram", "kde")
+
 
 class HeatmapDrawer(Diagram):
-    def __init__(self, tracks: Dict[int, Dict[int, TrackDetailBase]]):
+    """
+    Heatmaps de equipo y de cada jugador sobre un campo StatsBomb.
+
+    Por defecto (`method="histogram"`) las posiciones se agrupan en un
+    histograma 2D (`pitch.bin_statistic`), se suavizan con un filtro gaussiano y
+    se dibujan con `pitch.heatmap`: el coste es lineal en el número de posiciones
+    y no depende de la rejilla de evaluación como el KDE. Con `method="kde"` se
+    mantiene el `pitch.kdeplot` original.
+    """
+
+    def __init__(
+            self,
+            tracks: Dict[int, Dict[int, TrackDetailBase]],
+            method: str = "histogram",
+            bins: Tuple[int, int] = (24, 16),
+            sigma: float = 1.0,
+            min_density: float = 0.05):
         super().__init__(tracks)
+        if method not in HEATMAP_METHODS:
+            raise ValueError(
+                f"Método de heatmap no soportado: {method}. Opciones: {HEATMAP_METHODS}")
+
+        self.method = method
+        self.bins = bins
+        self.sigma = sigma
+        # Densidad relativa por debajo de la cual la celda queda sin colorear
+        self.min_density = min_density
 
         base = Path("./app/res/output_videos/")
         self.save_path = base
@@ -27,32 +54,16 @@ class HeatmapDrawer(Diagram):
     # ---------------------------------------------------------
     # HELPERS
     # ---------------------------------------------------------
-    def _safe_concat(self, dfs: list) -> pd.DataFrame:
-        """Concatena listas de DataFrames con limpieza total."""
-        if not dfs:
-            return pd.DataFrame(columns=["x", "y"])
-
-        df = pd.concat(dfs, ignore_index=True)
-
-        df["x"] = pd.to_numeric(df["x"], errors="coerce")
-        df["y"] = pd.to_numeric(df["y"], errors="coerce")
-
-        df.replace([np.inf, -np.inf], np.nan, inplace=True)
-        df.dropna(subset=["x", "y"], inplace=True)
-
-        return df
+    def _is_valid(self, x: np.ndarray, y: np.ndarray) -> bool:
+        """Verifica si hay datos suficientes para el método elegido."""
+        if self.method == "histogram":
+            return len(x) > 0
 
-    def _is_valid_for_kde(self, df: pd.DataFrame) -> bool:
-        """Verifica si los datos son usables por KDE para evitar errores."""
-        if df.empty or df.shape[0] < 5:
+        # KDE: evita errores con pocos puntos o sin variación
+        if len(x) < 5:
             return False
-
-        # Debe existir variación
-        if df['x'].min() == df['x'].max():
-            return False
-        if df['y'].min() == df['y'].max():
+        if x.min() == x.max() or y.min() == y.max():
             return False
-
         return True
 
     def _draw_pitch(self):
@@ -70,61 +81,63 @@ class HeatmapDrawer(Diagram):
         pitch.draw(ax=ax)
         return fig, ax, pitch
 
+    def _draw_density(self, pitch: Pitch, ax, x: np.ndarray, y: np.ndarray, cmap: str):
+        """
+        Dibuja la densidad de posiciones.
+
+        Returns:
+            El QuadMesh del heatmap en modo histograma (para poder retirarlo y
+            reutilizar la figura) o None en modo KDE.
+        """
+        if self.method == "kde":
+            levels = min(60, max(10, len(x) // 2))
+            pitch.kdeplot(
+                x, y,
+                ax=ax,
+                cmap=cmap,
+                fill=True,
+                alpha=0.6,
+                levels=levels,
+                bw_adjust=0.3
+            )
+            return None
+
+        stats = pitch.bin_statistic(x, y, statistic="count", bins=self.bins, normalize=True)
+        density = gaussian_filter(stats["statistic"], self.sigma)
+        threshold = self.min_density * density.max()
+        stats["statistic"] = np.ma.masked_where(density <= threshold, density)
+        return pitch.heatmap(stats, ax=ax, cmap=cmap, alpha=0.6)
+
     # ---------------------------------------------------------
     # MAIN
     # ---------------------------------------------------------
     def draw_and_save(self) -> None:
-        self._draw_heatmap()
-        self._draw_individual_heatmaps()
+        # Una sola pasada por los tracks para todos los heatmaps
+        positions = self.drawer_service.collect_positions(self.tracks)
+        self._draw_heatmap(positions)
+        self._draw_individual_heatmaps(positions)
 
     # ---------------------------------------------------------
     # GLOBAL HEATMAP
     # ---------------------------------------------------------
-    def _draw_heatmap(self) -> None:
-        home_frames = []
-        rival_frames = []
-
-        for _, frame_content in self.tracks.items():
-            home, rival = self.drawer_service.process_frame(frame_content)
-            if not home.empty:
-                home_frames.append(home)
-            if not rival.empty:
-                rival_frames.append(rival)
-
-        home_df = self._safe_concat(home_frames)
-        rival_df = self._safe_concat(rival_frames)
+    def _draw_heatmap(self, positions: Dict[str, np.ndarray]) -> None:
+        is_home = positions["team"] == 1
+        home_x, home_y = positions["x"][is_home], positions["y"][is_home]
+        rival_x, rival_y = positions["x"][~is_home], positions["y"][~is_home]
 
-        if home_df.empty and rival_df.empty:
+        if len(home_x) == 0 and len(rival_x) == 0:
             return
 
         fig, ax, pitch = self._draw_pitch()
 
         # HOME TEAM
-        if self._is_valid_for_kde(home_df):
-            levels = min(60, max(10, home_df.shape[0] // 2))
-            pitch.kdeplot(
-                home_df["x"], home_df["y"],
-                ax=ax,
-                cmap="Blues",
-                fill=True,
-                alpha=0.6,
-                levels=levels,
-                bw_adjust=0.3
-            )
+        if self._is_valid(home_x, home_y):
+            self._draw_density(pitch, ax, home_x, home_y, "Blues")
             fig.savefig(self.save_path / "heatmap_home.png", dpi=300, bbox_inches="tight")
 
         # RIVAL TEAM
-        if self._is_valid_for_kde(rival_df):
-            levels = min(60, max(10, rival_df.shape[0] // 2))
-            pitch.kdeplot(
-                rival_df["x"], rival_df["y"],
-                ax=ax,
-                cmap="Reds",
-                fill=True,
-                alpha=0.6,
-                levels=levels,
-                bw_adjust=0.3
-            )
+        if self._is_valid(rival_x, rival_y):
+            self._draw_density(pitch, ax, rival_x, rival_y, "Reds")
             fig.savefig(self.save_path / "heatmap_rival.png", dpi=300, bbox_inches="tight")
 
         fig.savefig(self.save_path / "heatmap_both_teams.png", dpi=300, bbox_inches="tight")
@@ -133,67 +146,44 @@ class HeatmapDrawer(Diagram):
     # ---------------------------------------------------------
     # INDIVIDUAL HEATMAPS
     # ---------------------------------------------------------
-    def _draw_individual_heatmaps(self) -> None:
-        # Obtener IDs únicos
-        player_ids: Set[int] = {
-            track.track_id
-            for frame in self.tracks.values()
-            for track in frame.values()
-            if track.track_id is not None
-        }
-
-        for pid in player_ids:
-            home_frames = []
-            rival_frames = []
-
-            for frame_content in self.tracks.values():
-                if pid not in frame_content:
-                    continue
-
-                filtered = {pid: frame_content[pid]}
-                home, rival = self.drawer_service.process_frame(filtered)
-
-                if not home.empty:
-                    home_frames.append(home)
-                if not rival.empty:
-                    rival_frames.append(rival)
+    def _draw_individual_heatmaps(self, positions: Dict[str, np.ndarray]) -> None:
+        if len(positions["track_id"]) == 0:
+            return
 
-            home_df = self._safe_concat(home_frames)
-            rival_df = self._safe_concat(rival_frames)
+        # Agrupa las filas por jugador con un único ordenamiento
+        order = np.argsort(positions["track_id"], kind="stable")
+        track_ids = positions["track_id"][order]
+        is_home = positions["team"][order] == 1
+        xs, ys = positions["x"][order], positions["y"][order]
+        player_ids, starts = np.unique(track_ids, return_index=True)
+        ends = np.append(starts[1:], len(track_ids))
 
-            if home_df.empty and rival_df.empty:
-                continue
+        # En modo histograma se reutiliza una única figura: solo cambia el heatmap
+        shared = self._draw_pitch() if self.method == "histogram" else None
 
-            fig, ax, pitch = self._draw_pitch()
+        for pid, start, end in zip(player_ids.tolist(), starts.tolist(), ends.tolist()):
+            home = is_home[start:end]
+            x, y = xs[start:end], ys[start:end]
+            fig, ax, pitch = shared if shared is not None else self._draw_pitch()
 
             # HOME PLAYER
-            if self._is_valid_for_kde(home_df):
-                levels = min(60, max(10, home_df.shape[0] // 2))
-                pitch.kdeplot(
-                    home_df["x"], home_df["y"],
-                    ax=ax,
-                    cmap="viridis",
-                    fill=True,
-                    alpha=0.6,
-                    levels=levels,
-                    bw_adjust=0.3
-                )
+            if self._is_valid(x[home], y[home]):
+                mesh = self._draw_density(pitch, ax, x[home], y[home], "viridis")
                 fig.savefig(self.home_players_path / f"heatmap_player_home_{pid}.png",
                             dpi=300, bbox_inches="tight")
+                if shared is not None:
+                    mesh.remove()
 
             # RIVAL PLAYER
-            if self._is_valid_for_kde(rival_df):
-                levels = min(60, max(10, rival_df.shape[0] // 2))
-                pitch.kdeplot(
-                    rival_df["x"], rival_df["y"],
-                    ax=ax,
-                    cmap="viridis",
-                    fill=True,
-                    alpha=0.6,
-                    levels=levels,
-                    bw_adjust=0.3
-                )
+            if self._is_valid(x[~home], y[~home]):
+                mesh = self._draw_density(pitch, ax, x[~home], y[~home], "viridis")
                 fig.savefig(self.rival_players_path / f"heatmap_player_rival_{pid}.png",
                             dpi=300, bbox_inches="tight")
+                if shared is not None:
+                    mesh.remove()
+
+            if shared is None:
+                plt.close(fig)
 
-            plt.close(fig)
+        if shared is not None:
+            plt.close(shared[0])
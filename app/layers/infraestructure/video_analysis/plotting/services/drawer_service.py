@@ -61,3 +61,35 @@ class DrawerService:
                 rival_players.append(player_data)
 
         return pd.DataFrame(home_players), pd.DataFrame(rival_players)
+
+    def collect_positions(
+            self,
+            tracks: Dict[int, Dict[int, TrackDetailBase]]) -> Dict[str, np.ndarray]:
+        """
+        Recorre una sola vez los tracks y devuelve las posiciones válidas como
+        arreglos, ya escaladas al sistema StatsBomb.
+
+        Returns:
+            Dict[str, np.ndarray]: "track_id", "team", "x" e "y" con una fila por
+            (frame, jugador) con `position_transformed`.
+        """
+        track_ids, teams, positions = [], [], []
+        for frame_content in tracks.values():
+            for player_id, track in frame_content.items():
+                position = None if track is None else track.position_transformed
+                if position is None or len(position) < 2:
+                    continue
+                team = getattr(track, "team", -1)
+                track_ids.append(player_id)
+                teams.append(-1 if team is None else team)
+                positions.append(position[:2])
+
+        positions = np.array(positions, dtype=np.float64).reshape(-1, 2)
+        x, y = self._scale_coordinates(positions[:, 0], positions[:, 1])
+        valid = np.isfinite(x) & np.isfinite(y)
+        return {
+            "track_id": np.array(track_ids, dtype=np.int64)[valid],
+            "team": np.array(teams, dtype=np.int64)[valid],
+            "x": x[valid],
+            "y": y[valid],
+        }
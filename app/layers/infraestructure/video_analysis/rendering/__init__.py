@@ -0,0 +1,7 @@
+from .annotation_renderer import AnnotationRenderer, RenderConfig
+from .minimap import MinimapRenderer
+from .overlay_sidecar import (export_overlay_sidecar, iter_overlay_frames, read_overlay_sidecar,
+                              replay_overlay, write_overlay_sidecar)
+from .parallel_renderer import ParallelAnnotationRenderer, RenderSnapshot
+from .possession_hud import PossessionHud
+from .sprite_cache import SpriteCache
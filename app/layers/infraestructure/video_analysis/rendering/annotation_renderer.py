@@ -0,0 +1,376 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+from pydantic import BaseModel, Field
+
+from app.layers.domain.tracks.track_detail import TrackDetailBase
+from app.layers.infraestructure.video_analysis.rendering.minimap import (MinimapRenderer,
+                                                                        get_minimap_items)
+from app.layers.infraestructure.video_analysis.rendering.possession_hud import (
+    PossessionHud, blend_rectangle)
+from app.layers.infraestructure.video_analysis.rendering.sprite_cache import (
+    SpriteCache, draw_ellipse_arc, draw_label, scale_length, scale_thickness)
+from app.layers.infraestructure.video_analysis.services.bbox_processor_service import (
+    get_bbox_width, get_center_of_bbox)
+from app.layers.infraestructure.video_analysis.speed_and_distance_estimator import \
+    draw_speed_and_distance
+from app.layers.infraestructure.video_analysis.services.video_processing_service import \
+    open_video_writer
+
+DEFAULT_PLAYER_COLOR = (0, 0, 255)
+BALL_COLOR = (0, 255, 0)
+BALL_OWNER_COLOR = (0, 0, 255)
+
+
+def to_bgr_color(color) -> Tuple[int, int, int]:
+    """Normaliza un color de equipo (ndarray, lista o None) a una tupla BGR."""
+    if isinstance(color, np.ndarray):
+        color = color.tolist()
+    if not isinstance(color, (list, tuple)) or len(color) < 3:
+        return DEFAULT_PLAYER_COLOR
+    return tuple(int(channel) for channel in color[:3])
+
+
+def draw_ellipse(
+        frame: MatLike,
+        bbox,
+        color,
+        track_id: Optional[int] = None,
+        scale: float = 1.0) -> MatLike:
+    """
+    Dibuja la elipse bajo los pies del jugador y su etiqueta con el id. `scale`
+    reduce grosores, etiqueta y texto junto con el frame en los renders a baja
+    resolución.
+    """
+    y2 = int(bbox[3])
+    x_center, _ = get_center_of_bbox(bbox)
+    width = get_bbox_width(bbox)
+
+    draw_ellipse_arc(frame, (x_center, y2), (int(width), int(0.35 * width)), color, scale)
+
+    if track_id is not None:
+        draw_label(frame, x_center, y2, track_id, color, (0, 0, 0), scale)
+
+    return frame
+
+
+def draw_triangle(frame: MatLike, bbox, color, scale: float = 1.0) -> MatLike:
+    """Dibuja un triángulo indicador sobre el bbox (balón o poseedor)."""
+    y = int(bbox[1])
+    x, _ = get_center_of_bbox(bbox)
+    half_width, height = scale_length(10, scale), scale_length(20, scale)
+
+    triangle_points = np.array([
+        [x, y],
+        [x - half_width, y - height],
+        [x + half_width, y - height],
+    ])
+    cv2.drawContours(frame, [triangle_points], 0, color, cv2.FILLED)
+    cv2.drawContours(frame, [triangle_points], 0, (0, 0, 0), scale_thickness(2, scale))
+
+    return frame
+
+
+def draw_team_ball_control(frame: MatLike, frame_num: int, team_ball_control) -> MatLike:
+    """
+    Dibuja el porcentaje de control de balón de cada equipo hasta el frame.
+
+    Para renderizar un video completo es preferible crear un `PossessionHud` una
+    sola vez y llamar a `draw` en cada frame.
+    """
+    hud = PossessionHud(np.asarray(team_ball_control)[:frame_num + 1])
+    return hud.draw(frame, frame_num)
+
+
+def draw_camera_movement(
+        frame: MatLike,
+        x_movement: float,
+        y_movement: float,
+        scale: float = 1.0) -> MatLike:
+    """
+    Dibuja el panel con el desplazamiento de cámara del frame. `scale` reduce el
+    panel junto con el frame en los renders a baja resolución.
+    """
+    thickness = max(1, int(round(3 * scale)))
+    blend_rectangle(
+        frame, (0, 0), (int(500 * scale), int(100 * scale)), (255, 255, 255), 0.6)
+    cv2.putText(frame,
+                f"Camera Movement X: {x_movement:.2f}",
+                (int(10 * scale), int(30 * scale)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                scale,
+                (0, 0, 0),
+                thickness)
+    cv2.putText(frame,
+                f"Camera Movement Y: {y_movement:.2f}",
+                (int(10 * scale), int(60 * scale)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                scale,
+                (0, 0, 0),
+                thickness)
+    return frame
+
+
+class RenderConfig(BaseModel):
+    """
+    Configuración del renderizado de anotaciones.
+
+    Attributes:
+        draw_players (bool): Elipses e ids de los jugadores.
+        draw_ball (bool): Triángulo del balón y del jugador que lo tiene.
+        draw_possession_hud (bool): Panel de control de balón por equipo.
+        draw_camera_hud (bool): Panel de movimiento de cámara.
+        draw_speed_and_distance (bool): Velocidad y distancia de cada jugador.
+        use_sprite_cache (bool): Dibuja elipses y etiquetas desde sprites cacheados.
+        sprite_width_bucket (int): Redondeo en píxeles de la anchura de las elipses
+            cacheadas.
+        scale (float): Escala de los frames de salida; los frames se reducen antes
+            de anotarlos y los bboxes, etiquetas, textos y grosores se escalan en
+            consecuencia.
+        frame_step (int): Se renderiza uno de cada `frame_step` frames.
+        draw_minimap (bool): Minimapa cenital de las posiciones en la pista
+            insertado en la esquina superior derecha.
+        minimap_height_ratio (float): Altura del minimapa respecto al frame.
+        fps (float): Frames por segundo del video original; el de salida es
+            `fps / frame_step` para conservar la duración.
+        codec (str): FourCC del video de salida.
+    """
+    draw_players: bool = True
+    draw_ball: bool = True
+    draw_possession_hud: bool = True
+    draw_camera_hud: bool = True
+    draw_speed_and_distance: bool = True
+    use_sprite_cache: bool = True
+    sprite_width_bucket: int = 1
+    scale: float = Field(default=1.0, gt=0)
+    frame_step: int = Field(default=1, ge=1)
+    draw_minimap: bool = False
+    minimap_height_ratio: float = Field(default=0.35, gt=0, le=1)
+    fps: float = 24
+    codec: str = "XVID"
+
+    @classmethod
+    def proxy(
+            cls,
+            scale: float = 0.5,
+            frame_step: int = 2,
+            codec: str = "XVID",
+            **kwargs) -> "RenderConfig":
+        """
+        Configuración de render de revisión rápida: media resolución y la mitad
+        de frames. A esta resolución el coste lo domina la decodificación del
+        original, así que se mantiene XVID (un códec intra-frame como MJPG no es
+        más rápido y genera archivos varias veces mayores).
+        """
+        return cls(scale=scale, frame_step=frame_step, codec=codec, **kwargs)
+
+    @property
+    def output_fps(self) -> float:
+        """Frames por segundo del video de salida."""
+        return self.fps / self.frame_step
+
+    def output_size(self, width: int, height: int) -> Tuple[int, int]:
+        """(ancho, alto) de los frames de salida para un frame de origen."""
+        return max(1, int(round(width * self.scale))), max(1, int(round(height * self.scale)))
+
+
+class AnnotationRenderer:
+    """
+    Renderizador de anotaciones en una sola pasada.
+
+    Cada frame se copia en un único lienzo reutilizable, se le aplican todas
+    las capas habilitadas en el sitio y se escribe directamente en el video de
+    salida, por lo que en memoria solo vive un frame anotado a la vez.
+    """
+
+    def __init__(self, config: Optional[RenderConfig] = None):
+        self.config = config or RenderConfig()
+        self.sprite_cache = (
+            SpriteCache(self.config.sprite_width_bucket, scale=self.config.scale)
+            if self.config.use_sprite_cache else None)
+        self.minimaps: Dict[int, MinimapRenderer] = {}
+
+    def get_minimap(self, frame_height: int) -> MinimapRenderer:
+        """Minimapa dimensionado para la altura de los frames de salida."""
+        minimap = self.minimaps.get(frame_height)
+        if minimap is None:
+            minimap = MinimapRenderer.for_height(
+                int(frame_height * self.config.minimap_height_ratio))
+            self.minimaps[frame_height] = minimap
+        return minimap
+
+    @staticmethod
+    def get_frame_items(
+            tracks: Dict[str, Dict[int, Dict[int, TrackDetailBase]]],
+            frame_num: int) -> Tuple[List[tuple], List[tuple]]:
+        """
+        Extrae de los tracks lo necesario para dibujar un frame.
+
+        Returns:
+            Tuple[List[tuple], List[tuple]]: Jugadores como tuplas (track_id, bbox,
+            color, has_ball, velocidad, distancia, posición en la pista) y balones
+            como (bbox, posición en la pista).
+        """
+        players = [
+            (track_id,
+             player.bbox,
+             to_bgr_color(getattr(player, "team_color", None)),
+             bool(getattr(player, "has_ball", False)),
+             player.speed_km_per_hour,
+             player.covered_distance,
+             player.position_transformed)
+            for track_id, player in tracks.get("players", {}).get(frame_num, {}).items()
+            if player.bbox is not None
+        ]
+        balls = [
+            (ball.bbox, ball.position_transformed)
+            for ball in tracks.get("ball", {}).get(frame_num, {}).values()
+            if ball.bbox is not None
+        ]
+        return players, balls
+
+    def draw_layers(
+            self,
+            canvas: MatLike,
+            frame_num: int,
+            players: Sequence[tuple],
+            balls: Sequence[tuple],
+            possession_hud: Optional[PossessionHud] = None,
+            camera_movement: Optional[Tuple[float, float]] = None) -> MatLike:
+        """
+        Aplica en el sitio todas las capas habilitadas sobre `canvas`.
+
+        Args:
+            canvas (MatLike): Frame a anotar.
+            frame_num (int): Índice del frame.
+            players (Sequence[tuple]): (track_id, bbox, color, has_ball, velocidad,
+                distancia, posición en la pista) de cada jugador.
+            balls (Sequence[tuple]): (bbox, posición en la pista) de cada balón.
+            possession_hud (Optional[PossessionHud]): Panel de control de balón.
+            camera_movement (Optional[Tuple[float, float]]): (dx, dy) de la cámara.
+
+        Returns:
+            MatLike: El mismo `canvas`, anotado.
+        """
+        config = self.config
+        scale = config.scale
+        if scale != 1.0:
+            players = [
+                (player[0], [coord * scale for coord in player[1]], *player[2:])
+                for player in players
+            ]
+            balls = [([coord * scale for coord in bbox], position) for bbox, position in balls]
+
+        if config.draw_players or config.draw_ball:
+            for track_id, bbox, color, has_ball, *_ in players:
+                if config.draw_players:
+                    if self.sprite_cache is not None:
+                        self.sprite_cache.draw_player(canvas, bbox, color, track_id)
+                    else:
+                        draw_ellipse(canvas, bbox, color, track_id, scale)
+                if config.draw_ball and has_ball:
+                    draw_triangle(canvas, bbox, BALL_OWNER_COLOR, scale)
+
+        if config.draw_ball:
+            for bbox, _ in balls:
+                draw_triangle(canvas, bbox, BALL_COLOR, scale)
+
+        if config.draw_possession_hud and possession_hud is not None:
+            possession_hud.draw(canvas, frame_num)
+
+        if config.draw_camera_hud and camera_movement is not None:
+            draw_camera_movement(canvas, *camera_movement, scale=scale)
+
+        if config.draw_speed_and_distance:
+            for _, bbox, _, _, speed, distance, _ in players:
+                if speed is None or distance is None:
+                    continue
+                draw_speed_and_distance(canvas, bbox, speed, distance, scale)
+
+        if config.draw_minimap:
+            minimap = self.get_minimap(canvas.shape[0])
+            minimap.draw_inset(canvas, minimap.draw(*get_minimap_items(players, balls)))
+
+        return canvas
+
+    def render_frame(
+            self,
+            canvas: MatLike,
+            frame_num: int,
+            tracks: Dict[str, Dict[int, Dict[int, TrackDetailBase]]],
+            possession_hud: Optional[PossessionHud] = None,
+            camera_movement_per_frame: Optional[Sequence] = None) -> MatLike:
+        """
+        Aplica en el sitio todas las capas habilitadas sobre `canvas` a partir de
+        los tracks.
+
+        Returns:
+            MatLike: El mismo `canvas`, anotado.
+        """
+        players, balls = self.get_frame_items(tracks, frame_num)
+        camera_movement = (
+            camera_movement_per_frame[frame_num]
+            if camera_movement_per_frame is not None else None)
+        return self.draw_layers(
+            canvas, frame_num, players, balls, possession_hud, camera_movement)
+
+    def prepare_frame(self, frame: MatLike, out: Optional[MatLike] = None) -> MatLike:
+        """
+        Copia (o reduce, con `scale` < 1) el frame original al lienzo de salida.
+        Sin `out` y a escala 1 devuelve el mismo frame para anotarlo en el sitio.
+        """
+        if self.config.scale == 1.0:
+            if out is None:
+                return frame
+            np.copyto(out, frame)
+            return out
+        size = self.config.output_size(frame.shape[1], frame.shape[0])
+        return cv2.resize(frame, size, dst=out, interpolation=cv2.INTER_AREA)
+
+    def render(
+            self,
+            frames: Sequence[MatLike],
+            tracks: Dict[str, Dict[int, Dict[int, TrackDetailBase]]],
+            output_video_path: str,
+            team_ball_control: Optional[np.ndarray] = None,
+            camera_movement_per_frame: Optional[Sequence] = None) -> int:
+        """
+        Anota y escribe todos los frames (uno de cada `frame_step`) en una sola
+        pasada.
+
+        Args:
+            frames (Sequence[MatLike]): Frames originales (no se modifican).
+            tracks (Dict): Tracks por entidad y frame.
+            output_video_path (str): Ruta del video de salida.
+            team_ball_control (Optional[np.ndarray]): Equipo en control por frame.
+            camera_movement_per_frame (Optional[Sequence]): (dx, dy) por frame.
+
+        Returns:
+            int: Número de frames escritos.
+        """
+        if not frames:
+            return 0
+
+        possession_hud = None
+        if team_ball_control is not None and self.config.draw_possession_hud:
+            possession_hud = PossessionHud(team_ball_control)
+
+        config = self.config
+        height, width = frames[0].shape[:2]
+        output_size = config.output_size(width, height)
+        canvas = np.empty((output_size[1], output_size[0], 3), dtype=frames[0].dtype)
+        writer = open_video_writer(
+            output_video_path, output_size, config.output_fps, config.codec)
+        written = 0
+        try:
+            for frame_num in range(0, len(frames), config.frame_step):
+                self.prepare_frame(frames[frame_num], canvas)
+                self.render_frame(
+                    canvas, frame_num, tracks, possession_hud, camera_movement_per_frame)
+                writer.write(canvas)
+                written += 1
+        finally:
+            writer.release()
+        return written
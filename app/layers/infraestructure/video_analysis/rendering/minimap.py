@@ -0,0 +1,181 @@
+from typing import Sequence, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from app.layers.infraestructure.video_analysis.services.video_processing_service import \
+    open_video_writer
+from app.layers.infraestructure.video_analysis.view_transformer.view_transformer import (
+    COURT_LENGTH, COURT_WIDTH)
+
+GRASS_COLORS = ((58, 125, 45), (66, 140, 52))
+LINE_COLOR = (255, 255, 255)
+MINIMAP_BALL_COLOR = (255, 255, 255)
+MINIMAP_OWNER_COLOR = (0, 0, 255)
+
+
+class MinimapRenderer:
+    """
+    Minimapa cenital de la zona del campo cubierta por `ViewTransformer`.
+
+    El fondo (césped a franjas y contorno de la zona) se dibuja una sola vez; en cada frame se
+    copia a un lienzo reutilizable y se dibujan con OpenCV los jugadores (color
+    de equipo, con anillo si tienen el balón) y el balón a partir de
+    `position_transformed` (metros). El eje x de la pista es horizontal y el y
+    vertical, como en la vista de la cámara.
+    """
+
+    def __init__(
+            self,
+            pixels_per_meter: float = 8.0,
+            margin: int = 6,
+            court_length: float = COURT_LENGTH,
+            court_width: float = COURT_WIDTH,
+            num_stripes: int = 4):
+        self.pixels_per_meter = pixels_per_meter
+        self.margin = margin
+        self.court_length = court_length
+        self.court_width = court_width
+        self.num_stripes = num_stripes
+
+        self.width = int(round(court_length * pixels_per_meter)) + 2 * margin
+        self.height = int(round(court_width * pixels_per_meter)) + 2 * margin
+        self.radius = max(2, int(round(0.8 * pixels_per_meter)))
+        self.ball_radius = max(1, int(round(0.4 * pixels_per_meter)))
+
+        self.background = self.render_background()
+        self.canvas = np.empty_like(self.background)
+
+    @classmethod
+    def for_height(cls, height: int, **kwargs) -> "MinimapRenderer":
+        """Minimapa cuya altura total en píxeles es `height`."""
+        margin = kwargs.get("margin", 6)
+        court_width = kwargs.get("court_width", COURT_WIDTH)
+        pixels_per_meter = max(1.0, (height - 2 * margin) / court_width)
+        return cls(pixels_per_meter=pixels_per_meter, **kwargs)
+
+    def render_background(self) -> np.ndarray:
+        """
+        Dibuja el césped a franjas y el contorno de la zona. La zona es solo una
+        parte del campo sin marcas conocidas, así que no se dibujan otras líneas.
+        """
+        background = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        background[:] = GRASS_COLORS[0]
+        stripe_edges = np.linspace(
+            self.margin, self.width - self.margin, self.num_stripes + 1).astype(int)
+        for index, (x1, x2) in enumerate(zip(stripe_edges[:-1], stripe_edges[1:])):
+            background[:, x1:x2] = GRASS_COLORS[index % 2]
+
+        top_left = (self.margin, self.margin)
+        bottom_right = (self.width - self.margin - 1, self.height - self.margin - 1)
+        cv2.rectangle(background, top_left, bottom_right, LINE_COLOR, 1)
+        return background
+
+    def to_pixels(self, positions: np.ndarray) -> np.ndarray:
+        """Convierte posiciones (n, 2) en metros a píxeles enteros del minimapa."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        return np.rint(positions * self.pixels_per_meter + self.margin).astype(np.int32)
+
+    def draw(
+            self,
+            player_positions: np.ndarray,
+            player_colors: Sequence[Tuple[int, int, int]],
+            player_has_ball: Sequence[bool],
+            ball_positions: np.ndarray) -> MatLike:
+        """
+        Dibuja un frame del minimapa en el lienzo reutilizable.
+
+        Args:
+            player_positions (np.ndarray): (n, 2) en metros; filas NaN se ignoran.
+            player_colors (Sequence): Color BGR de cada jugador.
+            player_has_ball (Sequence[bool]): Si cada jugador tiene el balón.
+            ball_positions (np.ndarray): (m, 2) en metros; filas NaN se ignoran.
+
+        Returns:
+            MatLike: El lienzo del minimapa (se sobrescribe en la siguiente llamada).
+        """
+        canvas = self.canvas
+        np.copyto(canvas, self.background)
+
+        player_positions = np.asarray(player_positions, dtype=np.float64).reshape(-1, 2)
+        valid = np.isfinite(player_positions).all(axis=1)
+        for (x, y), color, has_ball, is_valid in zip(
+                self.to_pixels(np.where(valid[:, None], player_positions, 0)).tolist(),
+                player_colors, player_has_ball, valid.tolist()):
+            if not is_valid:
+                continue
+            cv2.circle(canvas, (x, y), self.radius, color, cv2.FILLED)
+            cv2.circle(
+                canvas, (x, y), self.radius,
+                MINIMAP_OWNER_COLOR if has_ball else (0, 0, 0), 2 if has_ball else 1)
+
+        ball_positions = np.asarray(ball_positions, dtype=np.float64).reshape(-1, 2)
+        ball_positions = ball_positions[np.isfinite(ball_positions).all(axis=1)]
+        for x, y in self.to_pixels(ball_positions).tolist():
+            cv2.circle(canvas, (x, y), self.ball_radius, MINIMAP_BALL_COLOR, cv2.FILLED)
+            cv2.circle(canvas, (x, y), self.ball_radius, (0, 0, 0), 1)
+        return canvas
+
+    def draw_inset(
+            self,
+            frame: MatLike,
+            minimap: MatLike,
+            corner: str = "top_right",
+            offset: int = 10) -> MatLike:
+        """Copia el minimapa en una esquina del frame (recortado si no cabe)."""
+        frame_h, frame_w = frame.shape[:2]
+        height, width = minimap.shape[:2]
+        x = frame_w - width - offset if corner.endswith("right") else offset
+        y = frame_h - height - offset if corner.startswith("bottom") else offset
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(frame_w, x + width), min(frame_h, y + height)
+        if x2 > x1 and y2 > y1:
+            frame[y1:y2, x1:x2] = minimap[y1 - y:y2 - y, x1 - x:x2 - x]
+        return frame
+
+    def render_video(
+            self,
+            snapshot,
+            output_video_path: str,
+            fps: float = 24,
+            codec: str = "XVID",
+            frame_step: int = 1) -> int:
+        """
+        Escribe el minimapa de todos los frames de una `RenderSnapshot` como un
+        video independiente.
+
+        Returns:
+            int: Número de frames escritos.
+        """
+        writer = open_video_writer(
+            output_video_path, (self.width, self.height), fps / frame_step, codec)
+        written = 0
+        try:
+            for frame_num in range(0, snapshot.num_frames, frame_step):
+                writer.write(self.draw(*snapshot.minimap_items(frame_num)))
+                written += 1
+        finally:
+            writer.release()
+        return written
+
+
+def get_minimap_items(
+        players: Sequence[tuple],
+        balls: Sequence[tuple]) -> Tuple[np.ndarray, list, list, np.ndarray]:
+    """
+    Adapta los elementos de `AnnotationRenderer.draw_layers` a los argumentos de
+    `MinimapRenderer.draw`.
+    """
+    positions = np.array([
+        (np.nan, np.nan) if player[6] is None else player[6][:2] for player in players
+    ], dtype=np.float64).reshape(-1, 2)
+    ball_positions = np.array([
+        (np.nan, np.nan) if ball[1] is None else ball[1][:2] for ball in balls
+    ], dtype=np.float64).reshape(-1, 2)
+    return (
+        positions,
+        [player[2] for player in players],
+        [player[3] for player in players],
+        ball_positions)
+
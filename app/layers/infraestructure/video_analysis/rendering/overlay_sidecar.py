@@ -0,0 +1,242 @@
+import gzip
+import json
+import pathlib
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+from cv2.typing import MatLike
+
+from app.layers.domain.tracks.track_detail import TrackDetailBase
+from app.layers.infraestructure.video_analysis.rendering.annotation_renderer import (
+    AnnotationRenderer, RenderConfig)
+from app.layers.infraestructure.video_analysis.rendering.parallel_renderer import (
+    ParallelAnnotationRenderer, RenderSnapshot, open_capture_at)
+from app.layers.infraestructure.video_analysis.rendering.possession_hud import PossessionHud
+
+SIDECAR_FORMAT = "overlay-sidecar"
+SIDECAR_VERSION = 2
+PLAYER_FIELDS = (
+    "track_id", "x1", "y1", "x2", "y2", "team", "b", "g", "r", "has_ball", "speed", "distance",
+    "court_x", "court_y")
+BALL_FIELDS = ("x1", "y1", "x2", "y2", "court_x", "court_y")
+
+
+def _open_text(path: str, mode: str):
+    """Abre el sidecar como texto, comprimido con gzip si termina en `.gz`."""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _round_or_none(value: float, digits: int) -> Optional[float]:
+    return None if np.isnan(value) else round(value, digits)
+
+
+def write_overlay_sidecar(
+        sidecar_path: str,
+        snapshot: RenderSnapshot) -> int:
+    """
+    Escribe las anotaciones de cada frame en un sidecar JSON-lines.
+
+    La primera línea es una cabecera con el formato y los campos; después hay una
+    línea por frame con los jugadores (`p`, en el orden de `PLAYER_FIELDS`), el
+    balón (`b`, en el orden de `BALL_FIELDS`), el equipo en control (`c`) y el
+    movimiento de cámara (`m`). Las coordenadas de imagen se redondean a 0.1
+    píxeles y las de la pista a centímetros.
+
+    Returns:
+        int: Número de frames escritos.
+    """
+    columns = snapshot.columns
+    team_ball_control = columns.get("team_ball_control")
+    camera_movement = columns.get("camera_movement")
+
+    player_offsets = columns["player_offsets"].tolist()
+    ball_offsets = columns["ball_offsets"].tolist()
+    player_ids = columns["player_track_ids"].tolist()
+    player_bboxes = np.round(columns["player_bboxes"], 1).tolist()
+    player_teams = columns["player_teams"].tolist()
+    player_colors = columns["player_colors"].tolist()
+    player_has_ball = columns["player_has_ball"].tolist()
+    player_speeds = columns["player_speeds"].tolist()
+    player_distances = columns["player_distances"].tolist()
+    player_positions = np.round(columns["player_positions"], 2).tolist()
+    ball_rows = np.hstack((
+        np.round(columns["ball_bboxes"], 1), np.round(columns["ball_positions"], 2))).tolist()
+
+    folder = pathlib.Path(sidecar_path).parent
+    folder.mkdir(parents=True, exist_ok=True)
+    separators = (",", ":")
+    with _open_text(sidecar_path, "w") as sidecar:
+        header = {
+            "format": SIDECAR_FORMAT,
+            "version": SIDECAR_VERSION,
+            "num_frames": snapshot.num_frames,
+            "player_fields": PLAYER_FIELDS,
+            "ball_fields": BALL_FIELDS,
+        }
+        sidecar.write(json.dumps(header, separators=separators) + "\n")
+
+        for frame_num in range(snapshot.num_frames):
+            start, end = player_offsets[frame_num], player_offsets[frame_num + 1]
+            record = {
+                "f": frame_num,
+                "p": [
+                    [player_ids[row], *player_bboxes[row], player_teams[row],
+                     *player_colors[row], int(player_has_ball[row]),
+                     _round_or_none(player_speeds[row], 2),
+                     _round_or_none(player_distances[row], 2),
+                     *(_round_or_none(value, 2) for value in player_positions[row])]
+                    for row in range(start, end)
+                ],
+                "b": [
+                    [None if np.isnan(value) else value for value in row]
+                    for row in ball_rows[ball_offsets[frame_num]:ball_offsets[frame_num + 1]]
+                ],
+            }
+            if team_ball_control is not None and frame_num < len(team_ball_control):
+                record["c"] = int(team_ball_control[frame_num])
+            if camera_movement is not None and frame_num < len(camera_movement):
+                record["m"] = np.round(camera_movement[frame_num], 3).tolist()
+            sidecar.write(json.dumps(record, separators=separators) + "\n")
+
+    return snapshot.num_frames
+
+
+def export_overlay_sidecar(
+        sidecar_path: str,
+        tracks: Dict[str, Dict[int, Dict[int, TrackDetailBase]]],
+        num_frames: int,
+        team_ball_control: Optional[np.ndarray] = None,
+        camera_movement_per_frame: Optional[Sequence] = None) -> int:
+    """
+    Exporta las anotaciones a un sidecar en lugar de dibujarlas en el video.
+
+    Returns:
+        int: Número de frames escritos.
+    """
+    snapshot = RenderSnapshot.from_tracks(
+        tracks, num_frames, team_ball_control, camera_movement_per_frame)
+    return write_overlay_sidecar(sidecar_path, snapshot)
+
+
+def read_overlay_sidecar(sidecar_path: str) -> RenderSnapshot:
+    """
+    Lee un sidecar de anotaciones como instantánea columnar, lista para
+    renderizarse con `AnnotationRenderer` o `ParallelAnnotationRenderer`.
+    """
+    with _open_text(sidecar_path, "r") as sidecar:
+        header = json.loads(sidecar.readline())
+        if header.get("format") != SIDECAR_FORMAT:
+            raise ValueError(f"El archivo no es un sidecar de anotaciones: {sidecar_path}")
+        if header.get("version") != SIDECAR_VERSION:
+            raise ValueError(
+                f"Versión de sidecar no soportada: {header.get('version')}")
+
+        num_frames = header["num_frames"]
+        player_counts = np.zeros(num_frames, dtype=np.int64)
+        ball_counts = np.zeros(num_frames, dtype=np.int64)
+        team_ball_control = np.full(num_frames, -1, dtype=np.int64)
+        camera_movement = np.zeros((num_frames, 2), dtype=np.float64)
+        has_control = has_camera = False
+        player_rows, ball_rows = [], []
+
+        for line in sidecar:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            frame_num = record["f"]
+            player_counts[frame_num] = len(record["p"])
+            player_rows.extend(record["p"])
+            ball_counts[frame_num] = len(record["b"])
+            ball_rows.extend(record["b"])
+            if "c" in record:
+                team_ball_control[frame_num] = record["c"]
+                has_control = True
+            if "m" in record:
+                camera_movement[frame_num] = record["m"]
+                has_camera = True
+
+    players = np.array(
+        [[np.nan if value is None else value for value in row] for row in player_rows],
+        dtype=np.float64).reshape(-1, len(PLAYER_FIELDS))
+    balls = np.array(
+        [[np.nan if value is None else value for value in row] for row in ball_rows],
+        dtype=np.float64).reshape(-1, len(BALL_FIELDS))
+    columns = {
+        "player_offsets": np.concatenate(([0], np.cumsum(player_counts))),
+        "player_track_ids": players[:, 0].astype(np.int64),
+        "player_bboxes": players[:, 1:5],
+        "player_colors": players[:, 6:9].astype(np.int32),
+        "player_teams": players[:, 5].astype(np.int64),
+        "player_has_ball": players[:, 9].astype(bool),
+        "player_speeds": players[:, 10],
+        "player_distances": players[:, 11],
+        "player_positions": players[:, 12:14],
+        "ball_offsets": np.concatenate(([0], np.cumsum(ball_counts))),
+        "ball_bboxes": balls[:, :4],
+        "ball_positions": balls[:, 4:6],
+    }
+    if has_control:
+        columns["team_ball_control"] = team_ball_control
+    if has_camera:
+        columns["camera_movement"] = camera_movement
+    return RenderSnapshot(columns)
+
+
+def iter_overlay_frames(
+        video_path: str,
+        snapshot: RenderSnapshot,
+        config: Optional[RenderConfig] = None,
+        start_frame: int = 0,
+        end_frame: Optional[int] = None) -> Iterator[Tuple[int, MatLike]]:
+    """
+    Reproduce bajo demanda el video original con las anotaciones del sidecar,
+    frame a frame, sin escribir ningún archivo.
+
+    Yields:
+        Tuple[int, MatLike]: (frame_num, frame anotado).
+    """
+    config = config or RenderConfig()
+    renderer = AnnotationRenderer(config)
+    team_ball_control = snapshot.columns.get("team_ball_control")
+    possession_hud = (
+        PossessionHud(team_ball_control)
+        if team_ball_control is not None and config.draw_possession_hud else None)
+    end_frame = snapshot.num_frames if end_frame is None else min(end_frame, snapshot.num_frames)
+
+    cap = open_capture_at(video_path, start_frame)
+    try:
+        for frame_num in range(start_frame, end_frame):
+            if frame_num % config.frame_step:
+                if not cap.grab():
+                    break
+                continue
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                break
+            frame = renderer.prepare_frame(frame)
+            players, balls = snapshot.frame_items(frame_num)
+            renderer.draw_layers(
+                frame, frame_num, players, balls, possession_hud,
+                snapshot.camera_movement(frame_num))
+            yield frame_num, frame
+    finally:
+        cap.release()
+
+
+def replay_overlay(
+        video_path: str,
+        sidecar_path: str,
+        output_video_path: str,
+        config: Optional[RenderConfig] = None,
+        num_workers: Optional[int] = None) -> int:
+    """
+    Dibuja un sidecar sobre el video original y guarda el video anotado.
+
+    Returns:
+        int: Número de frames escritos.
+    """
+    snapshot = read_overlay_sidecar(sidecar_path)
+    renderer = ParallelAnnotationRenderer(config, num_workers=num_workers)
+    return renderer.render_snapshot(video_path, snapshot, output_video_path)
@@ -0,0 +1,430 @@
+import multiprocessing
+import os
+import pathlib
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from app.layers.domain.tracks.track_detail import TrackDetailBase
+from app.layers.infraestructure.video_analysis.rendering.annotation_renderer import (
+    AnnotationRenderer, RenderConfig, to_bgr_color)
+from app.layers.infraestructure.video_analysis.rendering.possession_hud import PossessionHud
+from app.layers.infraestructure.video_analysis.services.video_processing_service import \
+    open_video_writer
+
+# (nombre, dtype, forma, offset en bytes) de cada columna dentro del bloque compartido
+ColumnSpec = List[Tuple[str, str, Tuple[int, ...], int]]
+
+
+class RenderSnapshot:
+    """
+    Instantánea columnar de todo lo necesario para dibujar las anotaciones.
+
+    Los jugadores y el balón se guardan como columnas contiguas ordenadas por
+    frame, con `*_offsets` (frames + 1) indicando el rango de filas de cada
+    frame. Las columnas se pueden copiar a un único bloque de memoria compartida
+    para que los procesos de renderizado las lean sin serializar los tracks.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+        self.num_frames = len(columns["player_offsets"]) - 1
+
+    @classmethod
+    def from_tracks(
+            cls,
+            tracks: Dict[str, Dict[int, Dict[int, TrackDetailBase]]],
+            num_frames: int,
+            team_ball_control: Optional[np.ndarray] = None,
+            camera_movement_per_frame: Optional[Sequence] = None) -> "RenderSnapshot":
+        """Construye la instantánea recorriendo una sola vez los tracks."""
+        player_counts = np.zeros(num_frames, dtype=np.int64)
+        track_ids, bboxes, colors, teams, has_ball, speeds, distances, positions = (
+            [], [], [], [], [], [], [], [])
+        for frame_num in range(num_frames):
+            for track_id, player in tracks.get("players", {}).get(frame_num, {}).items():
+                if player.bbox is None:
+                    continue
+                player_counts[frame_num] += 1
+                track_ids.append(track_id)
+                bboxes.append(player.bbox)
+                colors.append(to_bgr_color(getattr(player, "team_color", None)))
+                team = getattr(player, "team", None)
+                teams.append(-1 if team is None else team)
+                has_ball.append(bool(getattr(player, "has_ball", False)))
+                speeds.append(
+                    np.nan if player.speed_km_per_hour is None else player.speed_km_per_hour)
+                distances.append(
+                    np.nan if player.covered_distance is None else player.covered_distance)
+                positions.append(cls._court_position(player.position_transformed))
+
+        ball_counts = np.zeros(num_frames, dtype=np.int64)
+        ball_bboxes, ball_positions = [], []
+        for frame_num in range(num_frames):
+            for ball in tracks.get("ball", {}).get(frame_num, {}).values():
+                if ball.bbox is None:
+                    continue
+                ball_counts[frame_num] += 1
+                ball_bboxes.append(ball.bbox)
+                ball_positions.append(cls._court_position(ball.position_transformed))
+
+        columns = {
+            "player_offsets": np.concatenate(([0], np.cumsum(player_counts))),
+            "player_track_ids": np.array(track_ids, dtype=np.int64),
+            "player_bboxes": np.array(bboxes, dtype=np.float64).reshape(-1, 4),
+            "player_colors": np.array(colors, dtype=np.int32).reshape(-1, 3),
+            "player_teams": np.array(teams, dtype=np.int64),
+            "player_has_ball": np.array(has_ball, dtype=bool),
+            "player_speeds": np.array(speeds, dtype=np.float64),
+            "player_distances": np.array(distances, dtype=np.float64),
+            "player_positions": np.array(positions, dtype=np.float64).reshape(-1, 2),
+            "ball_offsets": np.concatenate(([0], np.cumsum(ball_counts))),
+            "ball_bboxes": np.array(ball_bboxes, dtype=np.float64).reshape(-1, 4),
+            "ball_positions": np.array(ball_positions, dtype=np.float64).reshape(-1, 2),
+        }
+        if team_ball_control is not None:
+            columns["team_ball_control"] = np.asarray(team_ball_control, dtype=np.int64)
+        if camera_movement_per_frame is not None:
+            columns["camera_movement"] = np.asarray(
+                camera_movement_per_frame, dtype=np.float64).reshape(-1, 2)
+        return cls(columns)
+
+    @staticmethod
+    def _court_position(position) -> Tuple[float, float]:
+        if position is None or len(position) < 2:
+            return np.nan, np.nan
+        return position[0], position[1]
+
+    @staticmethod
+    def _optional_position(position: List[float]) -> Optional[List[float]]:
+        return None if np.isnan(position[0]) else position
+
+    def frame_items(self, frame_num: int) -> Tuple[List[tuple], List[tuple]]:
+        """Jugadores y balones de un frame, en el formato de `AnnotationRenderer.draw_layers`."""
+        columns = self.columns
+        start, end = columns["player_offsets"][frame_num:frame_num + 2].tolist()
+        players = [
+            (track_id,
+             bbox,
+             tuple(color),
+             has_ball,
+             None if np.isnan(speed) else speed,
+             None if np.isnan(distance) else distance,
+             self._optional_position(position))
+            for track_id, bbox, color, has_ball, speed, distance, position in zip(
+                columns["player_track_ids"][start:end].tolist(),
+                columns["player_bboxes"][start:end],
+                columns["player_colors"][start:end].tolist(),
+                columns["player_has_ball"][start:end].tolist(),
+                columns["player_speeds"][start:end].tolist(),
+                columns["player_distances"][start:end].tolist(),
+                columns["player_positions"][start:end].tolist())
+        ]
+        ball_start, ball_end = columns["ball_offsets"][frame_num:frame_num + 2].tolist()
+        balls = [
+            (bbox, self._optional_position(position))
+            for bbox, position in zip(
+                columns["ball_bboxes"][ball_start:ball_end],
+                columns["ball_positions"][ball_start:ball_end].tolist())
+        ]
+        return players, balls
+
+    def minimap_items(self, frame_num: int) -> Tuple[np.ndarray, list, list, np.ndarray]:
+        """Argumentos de `MinimapRenderer.draw` para un frame, sin crear tuplas."""
+        columns = self.columns
+        start, end = columns["player_offsets"][frame_num:frame_num + 2].tolist()
+        ball_start, ball_end = columns["ball_offsets"][frame_num:frame_num + 2].tolist()
+        return (
+            columns["player_positions"][start:end],
+            [tuple(color) for color in columns["player_colors"][start:end].tolist()],
+            columns["player_has_ball"][start:end].tolist(),
+            columns["ball_positions"][ball_start:ball_end])
+
+    def camera_movement(self, frame_num: int) -> Optional[Tuple[float, float]]:
+        """(dx, dy) de la cámara en el frame, o None si no se conoce."""
+        camera_movement = self.columns.get("camera_movement")
+        if camera_movement is None or frame_num >= len(camera_movement):
+            return None
+        return tuple(camera_movement[frame_num].tolist())
+
+    def to_shared_memory(self) -> Tuple[SharedMemory, ColumnSpec]:
+        """
+        Copia las columnas a un bloque de memoria compartida.
+
+        Returns:
+            Tuple[SharedMemory, ColumnSpec]: El bloque (el llamador debe cerrarlo y
+            liberarlo con `unlink`) y la descripción de sus columnas.
+        """
+        spec: ColumnSpec = []
+        offset = 0
+        for name, column in self.columns.items():
+            spec.append((name, column.dtype.str, column.shape, offset))
+            # Alinea cada columna a 8 bytes
+            offset += (column.nbytes + 7) // 8 * 8
+
+        shm = SharedMemory(create=True, size=max(offset, 1))
+        for name, dtype, shape, column_offset in spec:
+            target = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=column_offset)
+            target[...] = self.columns[name]
+            del target
+        return shm, spec
+
+    @classmethod
+    def from_shared_memory(cls, shm: SharedMemory, spec: ColumnSpec) -> "RenderSnapshot":
+        """Instantánea con vistas (sin copia) sobre un bloque de memoria compartida."""
+        return cls({
+            name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            for name, dtype, shape, offset in spec
+        })
+
+
+def open_capture_at(video_path: str, start_frame: int) -> cv2.VideoCapture:
+    """
+    Abre el video posicionado en `start_frame`. Si el contenedor no permite
+    posicionarse con exactitud, se decodifica desde el inicio hasta el frame.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"No se pudo abrir el video: {video_path}")
+    if start_frame == 0:
+        return cap
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != start_frame:
+        cap.release()
+        cap = cv2.VideoCapture(video_path)
+        for _ in range(start_frame):
+            if not cap.grab():
+                break
+    return cap
+
+
+def _draw_segment(
+        video_path: str,
+        snapshot: RenderSnapshot,
+        config: RenderConfig,
+        start_frame: int,
+        end_frame: int,
+        segment_path: str) -> int:
+    renderer = AnnotationRenderer(config)
+    team_ball_control = snapshot.columns.get("team_ball_control")
+    possession_hud = (
+        PossessionHud(team_ball_control)
+        if team_ball_control is not None and config.draw_possession_hud else None)
+
+    cap = open_capture_at(video_path, start_frame)
+    writer = None
+    written = 0
+    try:
+        for frame_num in range(start_frame, end_frame):
+            # Los frames descartados por `frame_step` se saltan sin convertirlos
+            if frame_num % config.frame_step:
+                if not cap.grab():
+                    break
+                continue
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                break
+            frame = renderer.prepare_frame(frame)
+            if writer is None:
+                writer = open_video_writer(
+                    segment_path, (frame.shape[1], frame.shape[0]), config.output_fps,
+                    config.codec)
+            players, balls = snapshot.frame_items(frame_num)
+            # El frame recién decodificado se anota en el sitio: no hace falta copia
+            renderer.draw_layers(
+                frame, frame_num, players, balls, possession_hud,
+                snapshot.camera_movement(frame_num))
+            writer.write(frame)
+            written += 1
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+    return written
+
+
+def render_segment(
+        video_path: str,
+        shm_name: str,
+        spec: ColumnSpec,
+        config: RenderConfig,
+        start_frame: int,
+        end_frame: int,
+        segment_path: str) -> int:
+    """
+    Renderiza en un proceso los frames [start_frame, end_frame) del video en un
+    archivo de segmento, leyendo los tracks de la memoria compartida.
+
+    Returns:
+        int: Número de frames escritos.
+    """
+    # track=False: el bloque pertenece al proceso principal, que lo libera
+    shm = SharedMemory(name=shm_name, track=False)
+    try:
+        return _draw_segment(
+            video_path, RenderSnapshot.from_shared_memory(shm, spec), config,
+            start_frame, end_frame, segment_path)
+    finally:
+        shm.close()
+
+
+def concatenate_segments(
+        segment_paths: Sequence[str],
+        output_video_path: str,
+        fps: float = 24,
+        codec: str = "XVID") -> None:
+    """
+    Une los segmentos en orden. Con ffmpeg disponible se concatenan sin
+    recodificar (`-c copy`); si no, se releen y reescriben con OpenCV.
+    """
+    folder = pathlib.Path(output_video_path).parent
+    folder.mkdir(parents=True, exist_ok=True)
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is not None:
+        list_path = pathlib.Path(segment_paths[0]).with_name("segments.txt")
+        list_path.write_text("".join(
+            f"file '{pathlib.Path(path).resolve().as_posix()}'\n" for path in segment_paths))
+        subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", str(list_path), "-c", "copy", output_video_path],
+            check=True)
+        return
+
+    writer = None
+    try:
+        for path in segment_paths:
+            cap = cv2.VideoCapture(path)
+            while True:
+                ret, frame = cap.read()
+                if not ret or frame is None:
+                    break
+                if writer is None:
+                    writer = open_video_writer(
+                        output_video_path, (frame.shape[1], frame.shape[0]), fps, codec)
+                writer.write(frame)
+            cap.release()
+    finally:
+        if writer is not None:
+            writer.release()
+
+
+class ParallelAnnotationRenderer:
+    """
+    Renderizado de anotaciones en paralelo por tramos contiguos de frames.
+
+    Los tracks se convierten una vez en una instantánea columnar en memoria
+    compartida. Cada proceso decodifica su tramo directamente del video original,
+    lo anota con `AnnotationRenderer` y lo codifica en su propio segmento; al
+    final los segmentos se concatenan en orden.
+    """
+
+    def __init__(
+            self,
+            config: Optional[RenderConfig] = None,
+            num_workers: Optional[int] = None,
+            segment_dir: Optional[str] = None):
+        self.config = config or RenderConfig()
+        self.num_workers = max(1, num_workers or os.cpu_count() or 1)
+        self.segment_dir = segment_dir
+
+    @staticmethod
+    def split_frames(num_frames: int, num_chunks: int) -> List[Tuple[int, int]]:
+        """Divide [0, num_frames) en `num_chunks` tramos contiguos de tamaño similar."""
+        bounds = np.linspace(0, num_frames, max(1, min(num_chunks, num_frames)) + 1)
+        bounds = bounds.astype(np.int64).tolist()
+        return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+    def render(
+            self,
+            video_path: str,
+            tracks: Dict[str, Dict[int, Dict[int, TrackDetailBase]]],
+            output_video_path: str,
+            team_ball_control: Optional[np.ndarray] = None,
+            camera_movement_per_frame: Optional[Sequence] = None,
+            num_frames: Optional[int] = None) -> int:
+        """
+        Anota el video en paralelo y escribe el resultado en `output_video_path`.
+
+        Args:
+            video_path (str): Video original (debe ser el mismo que generó los tracks).
+            tracks (Dict): Tracks por entidad y frame.
+            output_video_path (str): Ruta del video de salida.
+            team_ball_control (Optional[np.ndarray]): Equipo en control por frame.
+            camera_movement_per_frame (Optional[Sequence]): (dx, dy) por frame.
+            num_frames (Optional[int]): Frames a renderizar; por defecto los del video.
+
+        Returns:
+            int: Número de frames escritos.
+        """
+        if num_frames is None:
+            cap = cv2.VideoCapture(video_path)
+            num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+        if num_frames <= 0:
+            return 0
+
+        snapshot = RenderSnapshot.from_tracks(
+            tracks, num_frames, team_ball_control, camera_movement_per_frame)
+        return self.render_snapshot(video_path, snapshot, output_video_path)
+
+    def render_snapshot(
+            self,
+            video_path: str,
+            snapshot: RenderSnapshot,
+            output_video_path: str) -> int:
+        """
+        Anota el video a partir de una instantánea ya construida (p. ej. leída de
+        un sidecar de anotaciones).
+
+        Returns:
+            int: Número de frames escritos.
+        """
+        num_frames = snapshot.num_frames
+        if num_frames <= 0:
+            return 0
+
+        chunks = self.split_frames(num_frames, self.num_workers)
+        if len(chunks) == 1:
+            return _draw_segment(
+                video_path, snapshot, self.config, 0, num_frames, output_video_path)
+
+        suffix = pathlib.Path(output_video_path).suffix or ".avi"
+        segment_root = self.segment_dir or str(pathlib.Path(output_video_path).parent)
+        pathlib.Path(segment_root).mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=segment_root) as segment_dir:
+            segment_paths = [
+                os.path.join(segment_dir, f"segment_{index:04d}{suffix}")
+                for index in range(len(chunks))
+            ]
+
+            shm, spec = snapshot.to_shared_memory()
+            try:
+                with ProcessPoolExecutor(
+                        max_workers=len(chunks),
+                        mp_context=multiprocessing.get_context("spawn")) as executor:
+                    futures = [
+                        executor.submit(
+                            render_segment, video_path, shm.name, spec, self.config,
+                            start, end, segment_path)
+                        for (start, end), segment_path in zip(chunks, segment_paths)
+                    ]
+                    written = [future.result() for future in futures]
+            finally:
+                shm.close()
+                shm.unlink()
+
+            segment_paths = [
+                path for path, count in zip(segment_paths, written) if count > 0]
+            if segment_paths:
+                concatenate_segments(
+                    segment_paths, output_video_path, self.config.output_fps,
+                    self.config.codec)
+        return sum(written)
@@ -0,0 +1,123 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+# Dimensiones de referencia (1920x1080) del panel original, como fracción del frame
+REFERENCE_HEIGHT = 1080
+BOX_WIDTH_RATIO = 550 / 1920
+BOX_HEIGHT_RATIO = 120 / 1080
+BOX_MARGIN_RIGHT_RATIO = 20 / 1920
+BOX_MARGIN_BOTTOM_RATIO = 110 / 1080
+
+
+def blend_rectangle(
+        frame: MatLike,
+        top_left: Tuple[int, int],
+        bottom_right: Tuple[int, int],
+        color: Tuple[int, int, int],
+        alpha: float) -> MatLike:
+    """
+    Dibuja un rectángulo semitransparente mezclando solo la región del
+    rectángulo (ROI), sin copiar el frame completo.
+    """
+    height, width = frame.shape[:2]
+    x1, y1 = max(0, top_left[0]), max(0, top_left[1])
+    x2, y2 = min(width, bottom_right[0]), min(height, bottom_right[1])
+    if x2 <= x1 or y2 <= y1:
+        return frame
+
+    roi = frame[y1:y2, x1:x2]
+    fill = np.empty_like(roi)
+    fill[:] = color
+    cv2.addWeighted(fill, alpha, roi, 1 - alpha, 0, roi)
+    return frame
+
+
+class PossessionHud:
+    """
+    Panel de control de balón por equipo.
+
+    Los porcentajes acumulados de cada frame se calculan una sola vez con
+    `np.cumsum`, de modo que dibujar un frame es O(1). Antes de que ningún equipo
+    tenga el balón ambos porcentajes son 0. El panel se coloca en la esquina
+    inferior derecha con un tamaño proporcional al frame y solo se mezcla su
+    región.
+    """
+
+    def __init__(
+            self,
+            team_ball_control: np.ndarray,
+            alpha: float = 0.4,
+            background_color: Tuple[int, int, int] = (255, 255, 255),
+            text_color: Tuple[int, int, int] = (0, 0, 0)):
+        self.alpha = alpha
+        self.background_color = background_color
+        self.text_color = text_color
+        self.percentages = self.compute_percentages(team_ball_control)
+        self._layout_cache: dict = {}
+
+    @staticmethod
+    def compute_percentages(team_ball_control: np.ndarray) -> np.ndarray:
+        """
+        Porcentaje acumulado de control de balón de cada equipo por frame.
+
+        Args:
+            team_ball_control (np.ndarray): Equipo en control por frame (1, 2 u
+                otro valor si nadie).
+
+        Returns:
+            np.ndarray: (frames, 2) con los porcentajes del equipo 1 y 2.
+        """
+        team_ball_control = np.asarray(team_ball_control)
+        counts = np.stack((
+            np.cumsum(team_ball_control == 1),
+            np.cumsum(team_ball_control == 2)), axis=1).astype(np.float64)
+        totals = counts.sum(axis=1, keepdims=True)
+        percentages = np.zeros_like(counts)
+        np.divide(counts * 100, totals, out=percentages, where=totals > 0)
+        return percentages
+
+    def get_layout(self, frame_shape: Tuple[int, ...]) -> dict:
+        """Geometría del panel para un tamaño de frame (se cachea por tamaño)."""
+        height, width = frame_shape[:2]
+        layout = self._layout_cache.get((height, width))
+        if layout is not None:
+            return layout
+
+        scale = height / REFERENCE_HEIGHT
+        x2 = width - int(width * BOX_MARGIN_RIGHT_RATIO)
+        y2 = height - int(height * BOX_MARGIN_BOTTOM_RATIO)
+        x1 = x2 - int(width * BOX_WIDTH_RATIO)
+        y1 = y2 - int(height * BOX_HEIGHT_RATIO)
+        text_x = x1 + int(50 * scale)
+        layout = {
+            "top_left": (x1, y1),
+            "bottom_right": (x2, y2),
+            "lines": ((text_x, y1 + int(50 * scale)), (text_x, y1 + int(100 * scale))),
+            "font_scale": scale,
+            "thickness": max(1, int(round(3 * scale))),
+        }
+        self._layout_cache[(height, width)] = layout
+        return layout
+
+    def draw(self, frame: MatLike, frame_num: int, layout: Optional[dict] = None) -> MatLike:
+        """Dibuja en el sitio el panel del frame `frame_num`."""
+        if frame_num >= len(self.percentages):
+            return frame
+        layout = layout or self.get_layout(frame.shape)
+        blend_rectangle(
+            frame, layout["top_left"], layout["bottom_right"],
+            self.background_color, self.alpha)
+
+        for team, origin in enumerate(layout["lines"]):
+            cv2.putText(
+                frame,
+                f"Team {team + 1} Ball Control: {self.percentages[frame_num, team]:.2f}%",
+                origin,
+                cv2.FONT_HERSHEY_SIMPLEX,
+                layout["font_scale"],
+                self.text_color,
+                layout["thickness"])
+        return frame
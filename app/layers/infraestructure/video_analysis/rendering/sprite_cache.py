@@ -0,0 +1,272 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+from app.layers.infraestructure.video_analysis.services.bbox_processor_service import (
+    get_bbox_width, get_center_of_bbox)
+
+LABEL_WIDTH = 40
+LABEL_HEIGHT = 20
+LABEL_OFFSET_Y = 15
+LABEL_TEXT_X = 12
+LABEL_TEXT_SHIFT = 10
+LABEL_FONT_SCALE = 0.6
+LABEL_PADDING = 4
+
+
+def scale_length(length: float, scale: float = 1.0) -> int:
+    """Longitud en píxeles de una anotación para la escala del render."""
+    return int(round(length * scale))
+
+
+def scale_thickness(thickness: int, scale: float = 1.0) -> int:
+    """Grosor de línea o texto para la escala del render (al menos 1 píxel)."""
+    return max(1, scale_length(thickness, scale))
+
+
+def get_label_layout(
+        x_center: int,
+        y2: int,
+        track_id: int,
+        scale: float = 1.0) -> Tuple[Tuple[int, int], Tuple[int, int], Tuple[int, int]]:
+    """
+    Geometría de la etiqueta con el id bajo los pies del jugador.
+
+    Returns:
+        Tuple: Esquinas superior izquierda e inferior derecha del rectángulo y
+        origen del texto.
+    """
+    half_width = scale_length(LABEL_WIDTH // 2, scale)
+    half_height = scale_length(LABEL_HEIGHT // 2, scale)
+    offset_y = scale_length(LABEL_OFFSET_Y, scale)
+    x1, y1 = x_center - half_width, y2 - half_height + offset_y
+    x2, y2_rect = x_center + half_width, y2 + half_height + offset_y
+    text_x = x1 + scale_length(LABEL_TEXT_X, scale)
+    if track_id > 99:
+        text_x -= scale_length(LABEL_TEXT_SHIFT, scale)
+    return (x1, y1), (x2, y2_rect), (text_x, y1 + offset_y)
+
+
+def draw_ellipse_arc(
+        frame: MatLike,
+        center: Tuple[int, int],
+        axes: Tuple[int, int],
+        color,
+        scale: float = 1.0) -> MatLike:
+    """Arco de elipse de los jugadores, con los mismos parámetros que `draw_ellipse`."""
+    cv2.ellipse(
+        frame,
+        center=center,
+        axes=axes,
+        angle=0.0,
+        startAngle=-45,
+        endAngle=235,
+        color=color,
+        thickness=scale_thickness(2, scale),
+        lineType=cv2.LINE_4
+    )
+    return frame
+
+
+def draw_label(
+        frame: MatLike,
+        x_center: int,
+        y2: int,
+        track_id: int,
+        color,
+        text_color=(0, 0, 0),
+        scale: float = 1.0) -> MatLike:
+    """Rectángulo relleno con el id del track, con los parámetros de `draw_ellipse`."""
+    top_left, bottom_right, text_origin = get_label_layout(x_center, y2, track_id, scale)
+    cv2.rectangle(frame, top_left, bottom_right, color, cv2.FILLED)
+    cv2.putText(
+        frame,
+        f"{track_id}",
+        text_origin,
+        cv2.FONT_HERSHEY_SIMPLEX,
+        LABEL_FONT_SCALE * scale,
+        text_color,
+        scale_thickness(2, scale)
+    )
+    return frame
+
+
+def blit_sprite(
+        frame: MatLike,
+        image: np.ndarray,
+        mask: np.ndarray,
+        x: int,
+        y: int) -> MatLike:
+    """
+    Copia en el frame los píxeles del sprite donde la máscara no es cero, con la
+    esquina superior izquierda en (x, y). Recorta el sprite a los límites del
+    frame y escribe directamente en la región (ROI) del frame.
+    """
+    height, width = frame.shape[:2]
+    mask_h, mask_w = mask.shape[:2]
+    x1, y1 = max(0, x), max(0, y)
+    x2, y2 = min(width, x + mask_w), min(height, y + mask_h)
+    if x2 <= x1 or y2 <= y1:
+        return frame
+
+    cv2.copyTo(
+        image[y1 - y:y2 - y, x1 - x:x2 - x],
+        mask[y1 - y:y2 - y, x1 - x:x2 - x],
+        frame[y1:y2, x1:x2])
+    return frame
+
+
+class SpriteCache:
+    """
+    Caché de sprites para las anotaciones de jugadores.
+
+    Las etiquetas con el id (rectángulo relleno + texto) se pre-renderizan una
+    vez por (track_id, color) y las elipses una vez por (ejes, color), con la
+    anchura redondeada a `width_bucket` píxeles. En cada frame el sprite se copia
+    con su máscara en la región del jugador (`cv2.copyTo`), evitando
+    `cv2.ellipse`, `cv2.rectangle` y `cv2.putText` por jugador y frame.
+
+    Con `width_bucket=1` el resultado es idéntico al de `draw_ellipse` con la
+    misma `scale` (grosores, etiqueta y texto se escalan igual); valores
+    mayores reducen el número de sprites a cambio de redondear los ejes. Las
+    elipses que tocan el borde del frame se dibujan con `cv2.ellipse`, porque
+    OpenCV recorta el arco contra el borde de forma distinta a recortar el sprite.
+    """
+
+    def __init__(self, width_bucket: int = 1, max_sprites: int = 1024, scale: float = 1.0):
+        self.width_bucket = max(1, width_bucket)
+        self.max_sprites = max_sprites
+        self.scale = scale
+
+        self.labels: OrderedDict = OrderedDict()
+        self.ellipses: OrderedDict = OrderedDict()
+        self.ellipse_masks: Dict[Tuple[int, int], Tuple[np.ndarray, int, int]] = {}
+
+    def clear(self) -> None:
+        """Vacía la caché."""
+        self.labels.clear()
+        self.ellipses.clear()
+        self.ellipse_masks.clear()
+
+    def _remember(self, cache: OrderedDict, key, sprite):
+        cache[key] = sprite
+        while len(cache) > self.max_sprites:
+            cache.popitem(last=False)
+        return sprite
+
+    def get_ellipse_axes(self, width: float) -> Tuple[int, int]:
+        """Ejes de la elipse para una anchura de bbox, redondeados a `width_bucket`."""
+        axes = (int(width), int(0.35 * width))
+        if self.width_bucket == 1:
+            return axes
+        return tuple(
+            int(round(axis / self.width_bucket)) * self.width_bucket for axis in axes)
+
+    def get_ellipse_mask(self, axes: Tuple[int, int]) -> Tuple[np.ndarray, int, int]:
+        """
+        Máscara del arco de elipse para unos ejes.
+
+        Returns:
+            Tuple[np.ndarray, int, int]: (máscara uint8, x, y) del centro de la
+            elipse dentro de la máscara.
+        """
+        ellipse_mask = self.ellipse_masks.get(axes)
+        if ellipse_mask is not None:
+            return ellipse_mask
+
+        axes = (max(0, axes[0]), max(0, axes[1]))
+        # Margen para el grosor de la línea
+        margin = scale_thickness(2, self.scale)
+        center = (axes[0] + margin, axes[1] + margin)
+        mask = np.zeros((2 * center[1] + 1, 2 * center[0] + 1), dtype=np.uint8)
+        draw_ellipse_arc(mask, center, axes, 255, self.scale)
+        ellipse_mask = (mask, center[0], center[1])
+        self.ellipse_masks[axes] = ellipse_mask
+        return ellipse_mask
+
+    def get_ellipse(
+            self,
+            width: float,
+            color: Tuple[int, int, int]) -> Tuple[np.ndarray, np.ndarray, int, int]:
+        """
+        Sprite de la elipse bajo los pies del jugador.
+
+        Returns:
+            Tuple: (imagen BGR, máscara, x, y) del centro de la elipse dentro del
+            sprite.
+        """
+        axes = self.get_ellipse_axes(width)
+        key = (axes, color)
+        ellipse = self.ellipses.get(key)
+        if ellipse is not None:
+            self.ellipses.move_to_end(key)
+            return ellipse
+
+        mask, center_x, center_y = self.get_ellipse_mask(axes)
+        image = np.empty(mask.shape + (3,), dtype=np.uint8)
+        image[:] = color
+        return self._remember(self.ellipses, key, (image, mask, center_x, center_y))
+
+    def get_label(
+            self,
+            track_id: int,
+            color: Tuple[int, int, int]) -> Tuple[np.ndarray, np.ndarray, int, int]:
+        """
+        Sprite de la etiqueta con el id del track.
+
+        Returns:
+            Tuple: (imagen BGR, máscara, x, y) del punto de anclaje (centro del
+            jugador a la altura de sus pies) dentro del sprite.
+        """
+        key = (track_id, color)
+        label = self.labels.get(key)
+        if label is not None:
+            self.labels.move_to_end(key)
+            return label
+
+        (x1, y1), (x2, y2), (text_x, text_y) = get_label_layout(0, 0, track_id, self.scale)
+        (text_w, text_h), baseline = cv2.getTextSize(
+            f"{track_id}", cv2.FONT_HERSHEY_SIMPLEX, LABEL_FONT_SCALE * self.scale,
+            scale_thickness(2, self.scale))
+        # El texto de ids largos puede salirse del rectángulo: el sprite lo incluye
+        left = min(x1, text_x) - LABEL_PADDING
+        top = min(y1, text_y - text_h) - LABEL_PADDING
+        right = max(x2, text_x + text_w) + LABEL_PADDING
+        bottom = max(y2, text_y + baseline) + LABEL_PADDING
+
+        image = np.zeros((bottom - top + 1, right - left + 1, 3), dtype=np.uint8)
+        mask = np.zeros(image.shape[:2], dtype=np.uint8)
+        # El sprite se dibuja con el centro del jugador en (-left, -top)
+        draw_label(image, -left, -top, track_id, color, (0, 0, 0), self.scale)
+        draw_label(mask, -left, -top, track_id, 255, 255, self.scale)
+
+        return self._remember(self.labels, key, (image, mask, -left, -top))
+
+    def draw_player(
+            self,
+            frame: MatLike,
+            bbox,
+            color: Tuple[int, int, int],
+            track_id: Optional[int] = None) -> MatLike:
+        """Dibuja la elipse y la etiqueta del jugador a partir de los sprites."""
+        y2 = int(bbox[3])
+        x_center, _ = get_center_of_bbox(bbox)
+
+        width = get_bbox_width(bbox)
+        image, mask, center_x, center_y = self.get_ellipse(width, color)
+        x, y = x_center - center_x, y2 - center_y
+        frame_h, frame_w = frame.shape[:2]
+        if x >= 0 and y >= 0 and x + mask.shape[1] <= frame_w and y + mask.shape[0] <= frame_h:
+            blit_sprite(frame, image, mask, x, y)
+        else:
+            draw_ellipse_arc(
+                frame, (x_center, y2), self.get_ellipse_axes(width), color, self.scale)
+
+        if track_id is not None:
+            image, mask, anchor_x, anchor_y = self.get_label(track_id, color)
+            blit_sprite(frame, image, mask, x_center - anchor_x, y2 - anchor_y)
+
+        return frame
@@ -1,7 +1,9 @@
-from .bbox_processor_service import (get_bbox_width, get_center_of_bbox,
+from .bbox_processor_service import (bbox_iou_matrix, get_bbox_width,
+                                     get_center_of_bbox,
                                      get_foot_position,
                                      measure_scalar_distance,
                                      measure_vectorial_distance,
                                      rectangle_coords)
+from .crop_service import CropService
 from .video_processing_service import read_video, save_video
 from .utils import read_stub, save_stub
\ No newline at end of file
@@ -48,6 +48,30 @@ def get_foot_position(bbox) -> tuple[int, int]:
     return int((x1 + x2) / 2), int(y2)
 
 
+def bbox_iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Calcula la intersección sobre unión (IoU) entre dos conjuntos de bboxes.
+
+    Args:
+        boxes_a: Array (n, 4) de bboxes [x1, y1, x2, y2]
+        boxes_b: Array (m, 4) de bboxes [x1, y1, x2, y2]
+
+    Returns:
+        Matriz (n, m) con el IoU de cada par
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+
+    area_a = (boxes_a[:, 2:] - boxes_a[:, :2]).prod(axis=1)
+    area_b = (boxes_b[:, 2:] - boxes_b[:, :2]).prod(axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
 def rectangle_coords(width: int, height: int, center: int,
                      y2: int) -> tuple[int, int, int, int]:
     x1_rect = center - width // 2
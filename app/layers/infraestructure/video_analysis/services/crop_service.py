@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+
+class CropService:
+    """
+    Servicio compartido de recortes de jugadores.
+
+    Recibe peticiones (frame_num, bbox), las agrupa por frame para leer cada
+    frame una sola vez y recorta/redimensiona en un pool de hilos (OpenCV libera
+    el GIL durante el resize). Opcionalmente guarda los recortes por track para
+    que otros consumidores (colores de equipo, imágenes de jugadores, re-ID) no
+    vuelvan a leer los frames.
+    """
+
+    def __init__(
+            self,
+            frames: Sequence[MatLike],
+            max_workers: int = 4,
+            max_crops_per_track: int = 8):
+        self.frames = frames
+        self.max_workers = max_workers
+        self.max_crops_per_track = max_crops_per_track
+
+        self.track_cache: Dict[int, OrderedDict] = {}
+        self._cache_lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    def close(self) -> None:
+        """Libera el pool de hilos."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def clip_bbox(
+            frame_shape: Tuple[int, ...],
+            bbox: Sequence[float]) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Recorta un bbox a los límites del frame.
+
+        Returns:
+            Optional[Tuple[int, int, int, int]]: (x1, y1, x2, y2) enteros, o None
+            si el bbox queda vacío.
+        """
+        if bbox is None or len(bbox) != 4:
+            return None
+        frame_h, frame_w = frame_shape[:2]
+        x1, y1 = max(0, int(bbox[0])), max(0, int(bbox[1]))
+        x2, y2 = min(frame_w, int(bbox[2])), min(frame_h, int(bbox[3]))
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def _get_cached(self, track_id: int, frame_num: int) -> Optional[MatLike]:
+        with self._cache_lock:
+            track_crops = self.track_cache.get(track_id)
+            if track_crops is None or frame_num not in track_crops:
+                return None
+            return track_crops[frame_num]
+
+    def _put_cached(self, track_id: int, frame_num: int, crop: MatLike) -> None:
+        with self._cache_lock:
+            track_crops = self.track_cache.setdefault(track_id, OrderedDict())
+            track_crops[frame_num] = crop
+            track_crops.move_to_end(frame_num)
+            while len(track_crops) > self.max_crops_per_track:
+                track_crops.popitem(last=False)
+
+    def get_track_crop(self, track_id: int) -> Optional[Tuple[int, MatLike]]:
+        """
+        Devuelve el recorte cacheado más reciente de un track.
+
+        Returns:
+            Optional[Tuple[int, MatLike]]: (frame_num, recorte del bbox completo) o
+            None si el track no tiene recortes en caché.
+        """
+        with self._cache_lock:
+            track_crops = self.track_cache.get(track_id)
+            if not track_crops:
+                return None
+            frame_num = next(reversed(track_crops))
+            return frame_num, track_crops[frame_num]
+
+    def get_crops(
+            self,
+            requests: Sequence[Tuple[int, Sequence[float]]],
+            size: Optional[Tuple[int, int]] = None,
+            top_fraction: float = 1.0,
+            track_ids: Optional[Sequence[int]] = None
+    ) -> Tuple[np.ndarray | List[Optional[MatLike]], np.ndarray]:
+        """
+        Obtiene los recortes de varias peticiones (frame_num, bbox).
+
+        Args:
+            requests (Sequence[Tuple[int, Sequence[float]]]): Peticiones de recorte.
+            size (Optional[Tuple[int, int]]): (ancho, alto) al que se redimensiona cada
+                recorte. Si es None se devuelven los recortes con su tamaño original.
+            top_fraction (float): Fracción superior del bbox a conservar (0.5 para
+                la camiseta).
+            track_ids (Optional[Sequence[int]]): Track de cada petición; si se indica,
+                los recortes se leen de/guardan en la caché por track.
+
+        Returns:
+            Tuple: Con `size`, un arreglo contiguo (n, alto, ancho, 3) uint8 (ceros en
+            las peticiones inválidas); sin `size`, una lista de recortes o None. En
+            ambos casos también una máscara booleana (n,) de peticiones válidas.
+        """
+        num_requests = len(requests)
+        valid = np.zeros(num_requests, dtype=bool)
+        if size is not None:
+            crops = np.zeros((num_requests, size[1], size[0], 3), dtype=np.uint8)
+        else:
+            crops = [None] * num_requests
+
+        def store(index: int, crop: MatLike) -> None:
+            rows = int(crop.shape[0] * top_fraction)
+            if rows == 0:
+                return
+            crop = crop[:rows]
+            crops[index] = (
+                crop if size is None
+                else cv2.resize(crop, size, interpolation=cv2.INTER_AREA))
+            valid[index] = True
+
+        frame_groups = defaultdict(list)
+        for index, (frame_num, _) in enumerate(requests):
+            if track_ids is not None:
+                cached = self._get_cached(track_ids[index], frame_num)
+                if cached is not None:
+                    store(index, cached)
+                    continue
+            frame_groups[frame_num].append(index)
+
+        def process_frame(frame_num: int) -> None:
+            frame = self.frames[frame_num]
+            for index in frame_groups[frame_num]:
+                coords = self.clip_bbox(frame.shape, requests[index][1])
+                if coords is None:
+                    continue
+                x1, y1, x2, y2 = coords
+                crop = frame[y1:y2, x1:x2]
+                if track_ids is not None:
+                    crop = crop.copy()
+                    self._put_cached(track_ids[index], frame_num, crop)
+                store(index, crop)
+
+        if len(frame_groups) > 1 and self.max_workers > 1:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            # list() propaga las excepciones de los hilos
+            list(self._executor.map(process_frame, frame_groups))
+        else:
+            for frame_num in frame_groups:
+                process_frame(frame_num)
+
+        return crops, valid
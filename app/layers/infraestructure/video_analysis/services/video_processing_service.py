@@ -1,9 +1,11 @@
 import pathlib
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import cv2
 from cv2.typing import MatLike
 
+from app.layers.infraestructure.video_analysis.services.crop_service import CropService
+
 
 def read_video(video_path: str) -> list[MatLike]:
     cap = cv2.VideoCapture(video_path)
@@ -22,57 +24,103 @@ def read_video(video_path: str) -> list[MatLike]:
     return frames
 
 
-def save_video(ouput_video_frames, output_video_path: str):
+def open_video_writer(
+        output_video_path: str,
+        frame_size: Tuple[int, int],
+        fps: float = 24,
+        codec: str = 'XVID') -> cv2.VideoWriter:
+    """
+    Abre un escritor de video para escribir frames a medida que se generan, sin
+    acumularlos en memoria.
+
+    Args:
+        output_video_path (str): Ruta del video de salida (se crea la carpeta).
+        frame_size (Tuple[int, int]): (ancho, alto) de los frames.
+        fps (float): Frames por segundo.
+        codec (str): FourCC del códec.
+    """
     folder = pathlib.Path(output_video_path).parent
     if not folder.exists():
         folder.mkdir(parents=True, exist_ok=True)
 
-    fourcc = cv2.VideoWriter.fourcc(*'XVID')
-    out = cv2.VideoWriter(
+    fourcc = cv2.VideoWriter.fourcc(*codec)
+    return cv2.VideoWriter(output_video_path, fourcc, fps, frame_size)
+
+
+def save_video(ouput_video_frames, output_video_path: str):
+    out = open_video_writer(
         output_video_path,
-        fourcc,
-        24,
         (ouput_video_frames[0].shape[1],
          ouput_video_frames[0].shape[0]))
     for frame in ouput_video_frames:
         out.write(frame)
     out.release()
-    
+
+
 def extract_player_images(
     video_frames: List[MatLike],
     tracks_collection,
-    output_folder: str
+    output_folder: str,
+    crop_service: Optional[CropService] = None,
+    max_attempts: int = 3
 ):
+    """
+    Guarda un recorte por jugador en `output_folder`.
+
+    Se reutiliza el recorte que ya esté en la caché del servicio (p. ej. el usado
+    para el color de equipo); si no, se pide el de su primer frame y, si ese
+    recorte no es válido (bbox fuera del frame o vacío), el de los siguientes
+    frames del track, hasta `max_attempts` intentos por jugador.
+
+    Args:
+        crop_service (Optional[CropService]): Servicio compartido; si no se indica
+            o corresponde a otros frames, se crea uno propio que se cierra al final.
+        max_attempts (int): Frames candidatos como máximo por jugador.
+    """
     folder = pathlib.Path(output_folder)
     folder.mkdir(parents=True, exist_ok=True)
 
-    saved_ids = set() 
-
-    for frame_num, player_track in tracks_collection.tracks["players"].items():
-        for player_id, track in player_track.items():
-            if player_id in saved_ids:
-                continue
-
-            bbox = track.bbox
-            if bbox is None or len(bbox) != 4:
-                continue  # Evita errores si el bbox no es válido
-
-            x1, y1, x2, y2 = map(int, bbox)
-
-            # Validación de límites dentro del frame
-            frame = video_frames[int(frame_num)]
-            h, w = frame.shape[:2]
-            x1, y1 = max(0, x1), max(0, y1)
-            x2, y2 = min(w, x2), min(h, y2)
-            if x2 <= x1 or y2 <= y1:
-                continue  # Bounding box inválido
-
-            # Recorte del jugador
-            player_image = frame[y1:y2, x1:x2]
-
-            # Guardar imagen
-            player_image_path = folder / f"player_{player_id}_frame_{frame_num}.png"
-            cv2.imwrite(str(player_image_path), player_image)
-
-            # Marcar este track_id como ya guardado
-            saved_ids.add(player_id)
+    owns_service = crop_service is None or crop_service.frames is not video_frames
+    if owns_service:
+        crop_service = CropService(video_frames)
+
+    try:
+        saved_images = {}
+        candidates: Dict[int, List[Tuple[int, list]]] = {}
+        for frame_num, player_track in tracks_collection.tracks["players"].items():
+            for player_id, track in player_track.items():
+                if player_id in saved_images:
+                    continue
+                player_candidates = candidates.setdefault(player_id, [])
+                if not player_candidates:
+                    cached = crop_service.get_track_crop(player_id)
+                    if cached is not None:
+                        saved_images[player_id] = cached
+                        continue
+
+                bbox = track.bbox
+                if bbox is None or len(bbox) != 4:
+                    continue  # Evita errores si el bbox no es válido
+                if len(player_candidates) < max_attempts:
+                    player_candidates.append((int(frame_num), bbox))
+
+        # Cada ronda pide el siguiente candidato de los jugadores sin recorte válido
+        for attempt in range(max_attempts):
+            request_ids = [
+                player_id for player_id, player_candidates in candidates.items()
+                if player_id not in saved_images and attempt < len(player_candidates)]
+            if not request_ids:
+                break
+            requests = [candidates[player_id][attempt] for player_id in request_ids]
+            crops, valid = crop_service.get_crops(requests)
+            for (frame_num, _), player_id, crop, is_valid in zip(
+                    requests, request_ids, crops, valid):
+                if is_valid:
+                    saved_images[player_id] = (frame_num, crop)
+    finally:
+        if owns_service:
+            crop_service.close()
+
+    for player_id, (frame_num, player_image) in saved_images.items():
+        player_image_path = folder / f"player_{player_id}_frame_{frame_num}.png"
+        cv2.imwrite(str(player_image_path), player_image)
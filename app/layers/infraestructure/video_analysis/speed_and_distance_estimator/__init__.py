@@ -1 +1,3 @@
-from .speed_and_distance_estimator import SpeedAndDistanceEstimator
+from .speed_and_distance_estimator import (SpeedAndDistanceEstimator,
+                                           draw_speed_and_distance)
+from .streaming_speed_estimator import StreamingSpeedEstimator
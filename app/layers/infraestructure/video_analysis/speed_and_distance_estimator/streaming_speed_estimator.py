@@ -0,0 +1,124 @@
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+
+class _TrackBuffer:
+    """
+    Buffer circular de las últimas posiciones de un track, indexado por frame.
+    """
+
+    def __init__(self, size: int, first_frame: int):
+        self.frames = np.full(size, -1, dtype=np.int64)
+        self.positions = np.full((size, 2), np.nan)
+        self.window_start = first_frame
+        self.last_seen = first_frame
+        self.total_distance = 0.0
+
+    def put(self, frame_num: int, position: np.ndarray) -> None:
+        slot = frame_num % len(self.frames)
+        self.frames[slot] = frame_num
+        self.positions[slot] = position
+        self.last_seen = frame_num
+
+    def get(self, frame_num: int) -> np.ndarray | None:
+        slot = frame_num % len(self.frames)
+        if self.frames[slot] != frame_num:
+            return None
+        return self.positions[slot]
+
+
+class StreamingSpeedEstimator:
+    """
+    Versión incremental de `SpeedAndDistanceEstimator` para procesamiento casi
+    en vivo: recibe las posiciones frame a frame y emite velocidad y distancia
+    acumulada de un track en cuanto completa una ventana de `frame_window` frames.
+
+    Usa las mismas ventanas consecutivas que el estimador por lotes (ancladas al
+    primer frame del track) y descarta igual las ventanas cuyo frame inicial o
+    final no tiene posición. Cada track activo guarda solo un buffer circular de
+    `frame_window + 1` posiciones y los tracks que no aparecen durante
+    `eviction_timeout` frames se eliminan, así que la memoria no crece con la
+    duración del stream.
+    """
+
+    def __init__(
+            self,
+            frame_window: int = 5,
+            frame_rate: int = 24,
+            eviction_timeout: int = 48):
+        self.frame_window = frame_window
+        self.frame_rate = frame_rate
+        self.eviction_timeout = eviction_timeout
+        self.buffers: Dict[int, _TrackBuffer] = {}
+
+    def push(
+            self,
+            frame_num: int,
+            track_ids: Sequence[int],
+            positions: np.ndarray) -> Dict[int, Tuple[float, float]]:
+        """
+        Añade las posiciones de un frame y devuelve las ventanas completadas.
+
+        Args:
+            frame_num (int): Número de frame (creciente entre llamadas).
+            track_ids (Sequence[int]): Tracks presentes en el frame (n,).
+            positions (np.ndarray): Posiciones transformadas en metros (n, 2),
+                NaN si el track está fuera del campo visible.
+
+        Returns:
+            Dict[int, Tuple[float, float]]: Por cada track que completó una ventana
+            válida en este frame, su velocidad en km/h y su distancia acumulada en metros.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        completed = {}
+
+        for track_id, position in zip(track_ids, positions):
+            track_id = int(track_id)
+            buffer = self.buffers.get(track_id)
+            if buffer is None:
+                buffer = _TrackBuffer(self.frame_window + 1, frame_num)
+                self.buffers[track_id] = buffer
+            buffer.put(frame_num, position)
+
+            result = self._close_windows(buffer, frame_num)
+            if result is not None:
+                completed[track_id] = result
+
+        self._evict(frame_num)
+        return completed
+
+    def _close_windows(
+            self,
+            buffer: _TrackBuffer,
+            frame_num: int) -> Tuple[float, float] | None:
+        """
+        Cierra las ventanas del track que terminan en o antes de `frame_num`.
+        """
+        result = None
+        while buffer.window_start + self.frame_window <= frame_num:
+            window_end = buffer.window_start + self.frame_window
+            start_position = buffer.get(buffer.window_start)
+            end_position = buffer.get(window_end)
+            buffer.window_start = window_end
+
+            if start_position is None or end_position is None:
+                continue
+
+            displacement = float(np.linalg.norm(end_position - start_position))
+            if np.isnan(displacement):
+                continue
+
+            buffer.total_distance += displacement
+            time_elapsed = self.frame_window / self.frame_rate
+            result = (displacement / time_elapsed * 3.6, buffer.total_distance)
+        return result
+
+    def _evict(self, frame_num: int) -> None:
+        """Elimina los tracks que llevan más de `eviction_timeout` frames sin aparecer."""
+        expired = [
+            track_id for track_id, buffer in self.buffers.items()
+            if frame_num - buffer.last_seen > self.eviction_timeout
+        ]
+        for track_id in expired:
+            del self.buffers[track_id]
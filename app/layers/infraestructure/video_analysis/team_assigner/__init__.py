@@ -1 +1,2 @@
+from .color_extractor import JerseyColorExtractor
 from .team_assigner import TeamAssigner
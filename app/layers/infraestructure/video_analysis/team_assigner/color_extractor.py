@@ -0,0 +1,124 @@
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from cv2.typing import MatLike
+
+
+class JerseyColorExtractor:
+    """
+    Extrae en lote el color de camiseta de muchos recortes de jugador.
+
+    Cada recorte (mitad superior del bbox) se reduce a un tamaño fijo. Si se
+    dispone de la máscara de césped del recorte, el color es la media de los
+    píxeles que no son césped. Si no, sobre el tensor del lote se ejecuta un
+    2-means en numpy con un número fijo de iteraciones y, como en el enfoque
+    original, el cluster mayoritario en las cuatro esquinas se considera fondo.
+    """
+
+    def __init__(
+            self,
+            crop_size: Tuple[int, int] = (16, 16),
+            iterations: int = 8,
+            min_player_ratio: float = 0.1):
+        self.crop_size = crop_size
+        self.iterations = iterations
+        self.min_player_ratio = min_player_ratio
+
+        width, height = crop_size
+        self.corner_indices = np.array(
+            [0, width - 1, (height - 1) * width, height * width - 1])
+
+    def extract(
+            self,
+            crops: Sequence[MatLike],
+            grass_masks: Optional[Sequence[Optional[np.ndarray]]] = None) -> np.ndarray:
+        """
+        Obtiene el color del jugador de cada recorte.
+
+        Args:
+            crops (Sequence[MatLike]): Recortes BGR no vacíos, o un arreglo
+                (n, alto, ancho, 3) ya redimensionado a `crop_size`.
+            grass_masks (Optional[Sequence[Optional[np.ndarray]]]): Máscara booleana
+                de césped de cada recorte (a cualquier resolución) o None. Los
+                recortes sin máscara, o con muy pocos píxeles que no son césped,
+                usan el 2-means.
+
+        Returns:
+            np.ndarray: Colores BGR (n, 3) en float.
+        """
+        if len(crops) == 0:
+            return np.empty((0, 3), dtype=np.float64)
+
+        if isinstance(crops, np.ndarray) and crops.shape[1:3] == self.crop_size[::-1]:
+            # Lote ya redimensionado (p. ej. por CropService)
+            resized = crops
+        else:
+            resized = np.stack([
+                cv2.resize(crop, self.crop_size, interpolation=cv2.INTER_AREA)
+                for crop in crops
+            ])
+        pixels = resized.reshape(len(crops), -1, 3).astype(np.float32)
+
+        colors = np.empty((len(crops), 3), dtype=np.float64)
+        use_clustering = np.ones(len(crops), dtype=bool)
+
+        if grass_masks is not None:
+            empty_mask = np.ones(self.crop_size[::-1], dtype=np.uint8)
+            player_pixels = np.stack([
+                empty_mask if mask is None or mask.size == 0
+                else cv2.resize(
+                    (~mask).astype(np.uint8), self.crop_size,
+                    interpolation=cv2.INTER_NEAREST)
+                for mask in grass_masks
+            ]).reshape(len(crops), -1).astype(np.float32)
+            has_mask = np.array(
+                [mask is not None and mask.size > 0 for mask in grass_masks])
+
+            counts = player_pixels.sum(axis=1)
+            masked_means = (
+                np.einsum("bn,bnd->bd", player_pixels, pixels) / np.maximum(counts, 1)[:, None])
+            use_mask = has_mask & (counts >= self.min_player_ratio * player_pixels.shape[1])
+            colors[use_mask] = masked_means[use_mask]
+            use_clustering = ~use_mask
+
+        if use_clustering.any():
+            colors[use_clustering] = self._two_means(pixels[use_clustering])
+        return colors
+
+    def _two_means(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        2-means por recorte sobre el tensor (b, n, 3) y elección del cluster del
+        jugador con la heurística de las esquinas.
+        """
+        batch_index = np.arange(len(pixels))
+
+        # Inicialización determinista: media de las esquinas (fondo probable) y el
+        # píxel más alejado de ella (jugador probable)
+        centers = np.empty((len(pixels), 2, 3), dtype=np.float32)
+        centers[:, 0] = pixels[:, self.corner_indices].mean(axis=1)
+        farthest = np.argmax(((pixels - centers[:, :1]) ** 2).sum(axis=2), axis=1)
+        centers[:, 1] = pixels[batch_index, farthest]
+
+        # Con dos clusters, la asignación se reduce a un discriminante lineal:
+        # x pertenece al cluster 1 si 2·x·(c1 - c0) > |c1|² - |c0|²
+        total_sums = pixels.sum(axis=1)
+        total_counts = pixels.shape[1]
+        for _ in range(self.iterations):
+            direction = 2 * (centers[:, 1] - centers[:, 0])
+            offset = (centers[:, 1] ** 2).sum(axis=1) - (centers[:, 0] ** 2).sum(axis=1)
+            labels = (np.einsum("bnd,bd->bn", pixels, direction) > offset[:, None])
+
+            counts_1 = labels.sum(axis=1, keepdims=True)
+            sums_1 = np.einsum("bn,bnd->bd", labels.astype(np.float32), pixels)
+            counts_0 = total_counts - counts_1
+            sums_0 = total_sums - sums_1
+            centers[:, 0] = np.where(counts_0 > 0, sums_0 / np.maximum(counts_0, 1), centers[:, 0])
+            centers[:, 1] = np.where(counts_1 > 0, sums_1 / np.maximum(counts_1, 1), centers[:, 1])
+
+        corner_labels = labels[:, self.corner_indices]
+        # Empate en las esquinas → el cluster 0 se toma como fondo, igual que antes
+        background_cluster = (corner_labels.sum(axis=1) > 2).astype(np.int64)
+        player_cluster = 1 - background_cluster
+
+        return centers[batch_index, player_cluster].astype(np.float64)
@@ -1,29 +1,48 @@
 import logging
-from typing import Dict, List
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
 from sklearn.cluster import KMeans
 from cv2.typing import MatLike
+from app.layers.domain.collections.track_collection import TrackCollection
 from app.layers.domain.tracks.track_detail import TrackDetailBase
+from app.layers.infraestructure.video_analysis.frame_analysis import PitchMasker
+from app.layers.infraestructure.video_analysis.services.bbox_processor_service import \
+    bbox_iou_matrix
+from app.layers.infraestructure.video_analysis.services.crop_service import CropService
+from app.layers.infraestructure.video_analysis.services.utils import read_stub, save_stub
+from app.layers.infraestructure.video_analysis.team_assigner.color_extractor import \
+    JerseyColorExtractor
 
 
 class TeamAssigner:
-    def __init__(self):
+    def __init__(
+            self,
+            use_pitch_mask: bool = True,
+            crop_service: CropService | None = None,
+            pitch_masker: PitchMasker | None = None):
         self.team_colors = {}
+        self.team_centers: np.ndarray | None = None
         self.player_team_dict = {}
+        self.fit_report = {}
+        self.assignment_report = {}
+        self.color_extractor = JerseyColorExtractor()
+        # Se puede compartir con el tracker para no recalcular la máscara por frame
+        self.pitch_masker = (pitch_masker or PitchMasker()) if use_pitch_mask else None
+        self.crop_service = crop_service
+        # Solo se cierra el servicio que crea el propio TeamAssigner
+        self._owns_crop_service = False
 
-    def get_clustering_model(self, image):
-        # Reshape the image to 2D array
-        print("Reshaping image to 2D array, actual image shape: ", image.shape)
-        image_2d = image.reshape(-1, 3)
-        print("Reshaped image shape: ", image_2d.shape)
-
-        # Preform K-means with 2 clusters
-        kmeans = KMeans(n_clusters=2, init="k-means++", n_init=1)
-        print("Fitting KMeans model")
-        kmeans.fit(image_2d)
-        print("KMeans model fitted")
+        # Votación multi-frame por track
+        self.min_votes = 3
+        self.max_votes = 7
+        self.vote_confidence = 0.8
+        self.max_overlap_iou = 0.05
+        self.min_area_ratio = 0.6
 
-        return kmeans
-    
     def get_coords_from_bbox(self, frame: MatLike, bbox: List):
         frame_h, frame_w = frame.shape[:2]
         
@@ -51,72 +70,496 @@ class TeamAssigner:
             return False
         return True
 
-    def get_player_color(
+    def get_top_half_crop(
             self,
             frame: MatLike,
-            bbox: List):
-        print("Getting player color")
-        validate = self.validate_frame(frame, bbox)
-        x1, y1, x2, y2 = self.get_coords_from_bbox(frame, bbox)
-        if not validate:
-            print("Invalid frame or bbox, returning default color.")
+            bbox: List) -> MatLike | None:
+        """
+        Recorta la mitad superior (camiseta) del bbox de un jugador.
+
+        Returns:
+            MatLike | None: El recorte, o None si el bbox no es válido.
+        """
+        if not self.validate_frame(frame, bbox):
             return None
-        
-        # image = frame[int(bbox[1]):int(bbox[3]), int(bbox[0]):int(bbox[2])]
+
+        x1, y1, x2, y2 = self.get_coords_from_bbox(frame, bbox)
         image = frame[y1:y2, x1:x2]
+        return image[:int(image.shape[0] / 2), :]
 
-        top_half_image = image[:int(image.shape[0] / 2), :]
+    def _get_crop_service(self, frames: List[MatLike]) -> CropService:
+        """
+        Reutiliza el servicio de recortes si corresponde a los mismos frames; si no,
+        crea uno propio y cierra el propio anterior (el inyectado lo cierra quien
+        lo creó).
+        """
+        if self.crop_service is None or self.crop_service.frames is not frames:
+            self.close()
+            self.crop_service = CropService(frames)
+            self._owns_crop_service = True
+        return self.crop_service
+
+    def close(self) -> None:
+        """Libera el servicio de recortes si lo creó el propio TeamAssigner."""
+        if self._owns_crop_service and self.crop_service is not None:
+            self.crop_service.close()
+            self.crop_service = None
+        self._owns_crop_service = False
 
-        # Get Clustering model
-        kmeans = self.get_clustering_model(top_half_image)
+    def get_frame_crops(
+            self,
+            frames: List[MatLike],
+            requests: List[Tuple[int, List]],
+            track_ids: Optional[List[int]] = None,
+            cache_masks: bool = True) -> Tuple[np.ndarray, Optional[List[np.ndarray]], List[int]]:
+        """
+        Recorta en lote la mitad superior (camiseta) de varios bboxes, ya
+        redimensionada al tamaño del extractor, junto con su máscara de césped
+        (si está habilitada).
+
+        Args:
+            frames (List[MatLike]): Frames del video.
+            requests (List[Tuple[int, List]]): Peticiones (frame_num, bbox).
+            track_ids (Optional[List[int]]): Track de cada petición, para usar la
+                caché de recortes por track del servicio.
+            cache_masks (bool): Si es True la máscara de cada frame se cachea por
+                número de frame.
 
-        # Get the cluster labels forr each pixel
-        print("Getting cluster labels")
-        labels = kmeans.labels_
+        Returns:
+            Tuple: Recortes válidos (n, alto, ancho, 3), sus máscaras de césped (o
+            None si no hay máscara) y el índice en `requests` de cada recorte.
+        """
+        crops, valid = self._get_crop_service(frames).get_crops(
+            requests,
+            size=self.color_extractor.crop_size,
+            top_fraction=0.5,
+            track_ids=track_ids)
+        indices = np.flatnonzero(valid).tolist()
 
-        # Reshape the labels to the image shape
-        print("Reshaping labels to image shape")
-        clustered_image = labels.reshape(
-            top_half_image.shape[0], top_half_image.shape[1])
+        pitch_masker = self.pitch_masker
+        if pitch_masker is None:
+            return crops[indices], None, indices
 
-        # Get the player cluster
-        print("Getting player cluster")
-        corner_clusters = [clustered_image[0, 0], clustered_image[0, -1],
-                           clustered_image[-1, 0], clustered_image[-1, -1]]
-        non_player_cluster = max(
-            set(corner_clusters),
-            key=corner_clusters.count)
-        player_cluster = 1 - non_player_cluster
+        frame_masks: Dict[int, np.ndarray] = {}
+        grass_masks = []
+        for index in indices:
+            frame_num, bbox = requests[index]
+            frame = frames[frame_num]
+            if frame_num not in frame_masks:
+                frame_masks[frame_num] = (
+                    pitch_masker.get_mask(frame_num, frame) if cache_masks
+                    else pitch_masker.compute_mask(frame))
 
-        player_color = kmeans.cluster_centers_[player_cluster]
-        print("Player color: ", player_color)
+            x1, y1, x2, y2 = CropService.clip_bbox(frame.shape, bbox)
+            grass_masks.append(pitch_masker.crop_mask(
+                frame_masks[frame_num], [x1, y1, x2, y1 + int((y2 - y1) * 0.5)]))
+        return crops[indices], grass_masks, indices
 
-        return player_color
+    def get_player_colors(
+            self,
+            crops: List[MatLike] | np.ndarray,
+            grass_masks: Optional[List[Optional[np.ndarray]]] = None) -> np.ndarray:
+        """
+        Obtiene en lote el color de camiseta de varios recortes (mitad superior),
+        descartando los píxeles de césped cuando se reciben sus máscaras.
+
+        Returns:
+            np.ndarray: Colores BGR (n, 3).
+        """
+        return self.color_extractor.extract(crops, grass_masks)
+
+    def get_player_color(
+            self,
+            frame: MatLike,
+            bbox: List):
+        crop = self.get_top_half_crop(frame, bbox)
+        if crop is None:
+            logging.debug(f"Invalid frame or bbox {bbox}, cannot get player color.")
+            return None
+
+        return self.get_player_colors([crop])[0]
 
     def assign_team_color(
             self,
             frame: MatLike,
             player_detections: Dict[int, TrackDetailBase]):
 
-        player_colors = []
-        for _, player_detection in player_detections.items():
-            bbox = player_detection.bbox
-            if bbox is None:
-                print("BBox is None, skipping player detection.")
-                continue
-            print("Trying to get player color with bbox: ", bbox)
-            player_color = self.get_player_color(frame, bbox)
-            print("Player color: ", player_color)
-            player_colors.append(player_color)
+        requests = [
+            (0, player_detection.bbox)
+            for player_detection in player_detections.values()
+            if player_detection.bbox is not None
+        ]
+        crops, grass_masks, _ = self.get_frame_crops([frame], requests, cache_masks=False)
+
+        self._fit_teams(self.get_player_colors(crops, grass_masks))
+
+    @property
+    def is_fitted(self) -> bool:
+        """Indica si ya hay un modelo de colores de equipo (ajustado o cargado)."""
+        return self.team_centers is not None
+
+    @staticmethod
+    def order_centers_by_hue(
+            centers: np.ndarray,
+            min_saturation: float = 0.25,
+            min_hue_gap: float = 8.0) -> np.ndarray:
+        """
+        Ordena los centros de color de forma estable para que dos ajustes
+        independientes del mismo partido asignen las mismas etiquetas.
+
+        Si ambos colores son cromáticos y sus tonos se distinguen, el equipo 1 es
+        el que precede al otro por el arco más corto del círculo de tono (así dos
+        rojos con H≈2 y H≈177 se consideran cercanos). La diferencia de tono se
+        pondera por la saturación menor; si un color es acromático (blanco, negro o
+        gris), si la diferencia ponderada es pequeña o si los tonos son casi
+        opuestos (donde el arco más corto es ambiguo), se ordena por brillo (V) de
+        menor a mayor.
+
+        Args:
+            centers (np.ndarray): Centros BGR (2, 3).
+            min_saturation (float): Saturación (0-1) por debajo de la cual el tono
+                se considera ruido.
+            min_hue_gap (float): Diferencia mínima de tono, en unidades de OpenCV
+                (0-180) ponderadas por saturación, para ordenar por tono.
+
+        Returns:
+            np.ndarray: Centros reordenados.
+        """
+        pixels = np.clip(centers, 0, 255).astype(np.uint8).reshape(1, -1, 3)
+        hsv = cv2.cvtColor(pixels, cv2.COLOR_BGR2HSV).reshape(-1, 3).astype(np.float64)
+        hue, saturation, value = hsv[:, 0], hsv[:, 1] / 255.0, hsv[:, 2]
+
+        # Diferencia circular con signo del tono del segundo centro respecto al primero
+        hue_delta = (hue[1] - hue[0] + 90.0) % 180.0 - 90.0
+        weighted_gap = abs(hue_delta) * saturation.min()
+        chromatic = (
+            saturation.min() >= min_saturation
+            and weighted_gap >= min_hue_gap
+            and abs(hue_delta) <= 90.0 - min_hue_gap)
 
+        if chromatic:
+            order = [0, 1] if hue_delta > 0 else [1, 0]
+        else:
+            order = np.lexsort((saturation, value))
+        return centers[order]
+
+    def _set_team_centers(self, centers: np.ndarray) -> None:
+        self.team_centers = self.order_centers_by_hue(np.asarray(centers, dtype=np.float64))
+        self.team_colors[1] = self.team_centers[0]
+        self.team_colors[2] = self.team_centers[1]
+
+    def _fit_teams(self, player_colors: np.ndarray) -> KMeans:
+        """
+        Ajusta el modelo de 2 equipos sobre colores de camiseta ya extraídos.
+        """
         kmeans = KMeans(n_clusters=2, init="k-means++", n_init=10)
-        print("Player colors: ", player_colors)
         kmeans.fit(player_colors)
 
         self.kmeans = kmeans
+        self._set_team_centers(kmeans.cluster_centers_)
+        return kmeans
+
+    def save_model(self, model_path: str, source: Optional[str] = None) -> None:
+        """
+        Guarda el modelo de equipos (centros de color ordenados, reporte del ajuste
+        y equipos ya asignados) junto al resto de stubs del partido.
+
+        Args:
+            model_path (str): Ruta del archivo del modelo.
+            source (Optional[str]): Identificador del video del que se ajustó el
+                modelo; `load_model` rechaza el modelo para otro video.
+        """
+        if not self.is_fitted:
+            raise ValueError("El modelo de equipos no está ajustado, no se puede guardar.")
+
+        Path(model_path).parent.mkdir(parents=True, exist_ok=True)
+        save_stub({
+            'source': source,
+            'team_centers': self.team_centers,
+            'fit_report': self.fit_report,
+            'player_team_dict': self.player_team_dict
+        }, model_path)
+
+    def load_model(
+            self,
+            model_path: str,
+            load_assignments: bool = True,
+            source: Optional[str] = None) -> bool:
+        """
+        Carga un modelo de equipos guardado con `save_model`.
+
+        Args:
+            model_path (str): Ruta del archivo del modelo.
+            load_assignments (bool): Si es True también se recuperan los equipos
+                asignados por track (solo válido si los ids de track coinciden,
+                p. ej. al reanudar el mismo video).
+            source (Optional[str]): Video actual; si se indica, el modelo solo se
+                carga si se guardó para ese mismo video.
+
+        Returns:
+            bool: True si el modelo existía, corresponde al video y se cargó.
+        """
+        model = read_stub(model_path)
+        if not model:
+            return False
+        if source is not None and model.get('source') != source:
+            logging.warning(
+                f"El modelo de equipos {model_path} es de otro video "
+                f"({model.get('source')}), se ignora.")
+            return False
+
+        self._set_team_centers(model['team_centers'])
+        self.fit_report = model.get('fit_report', {})
+        if load_assignments:
+            self.player_team_dict.update(model.get('player_team_dict', {}))
+        return True
+
+    def select_sample_frames(
+            self,
+            tracks_collection: TrackCollection,
+            num_frames: int = 10) -> List[int]:
+        """
+        Elige `num_frames` frames repartidos a lo largo del video, tomando en cada
+        tramo el frame con más jugadores visibles.
+
+        Args:
+            tracks_collection (TrackCollection): Colección con los tracks de jugadores.
+            num_frames (int): Número de frames a muestrear.
+
+        Returns:
+            List[int]: Números de frame seleccionados, en orden.
+        """
+        player_frames = tracks_collection.tracks["players"]
+        frame_nums = np.array(sorted(player_frames), dtype=np.int64)
+        if len(frame_nums) == 0:
+            return []
+
+        player_counts = np.array([
+            sum(1 for track in player_frames[frame_num].values() if track.bbox is not None)
+            for frame_num in frame_nums.tolist()
+        ])
+
+        selected = []
+        for frames_bin, counts_bin in zip(
+                np.array_split(frame_nums, num_frames), np.array_split(player_counts, num_frames)):
+            if len(counts_bin) == 0 or counts_bin.max() == 0:
+                continue
+            selected.append(int(frames_bin[np.argmax(counts_bin)]))
+        return selected
+
+    def fit_team_model(
+            self,
+            frames: List[MatLike],
+            tracks_collection: TrackCollection,
+            num_frames: int = 10,
+            refit: bool = False) -> Dict:
+        """
+        Ajusta una única vez el modelo de colores de equipo a partir de un conjunto
+        de frames muestreados, en lugar de reajustarlo por cada frame.
+
+        Args:
+            frames (List[MatLike]): Frames del video.
+            tracks_collection (TrackCollection): Colección con los tracks de jugadores.
+            num_frames (int): Número de frames a muestrear.
+            refit (bool): Si es False y ya existe un modelo, se reutiliza.
+
+        Returns:
+            Dict: Reporte del ajuste con el tiempo empleado, los frames usados, el
+            número de muestras y la separación entre clusters (distancia entre
+            centros dividida por la dispersión media dentro de los clusters).
+        """
+        if self.is_fitted and not refit:
+            return self.fit_report
+
+        start = time.perf_counter()
+        sample_frames = self.select_sample_frames(tracks_collection, num_frames)
+
+        requests, track_ids = [], []
+        for frame_num in sample_frames:
+            for track_id, track in tracks_collection.tracks["players"][frame_num].items():
+                if track.bbox is not None:
+                    requests.append((frame_num, track.bbox))
+                    track_ids.append(track_id)
+        crops, grass_masks, _ = self.get_frame_crops(frames, requests, track_ids)
+
+        player_colors = self.get_player_colors(crops, grass_masks)
+        if len(player_colors) < 2:
+            raise ValueError(
+                f"No hay suficientes jugadores para ajustar los equipos ({len(player_colors)}).")
+
+        kmeans = self._fit_teams(player_colors)
+
+        spread = np.linalg.norm(
+            player_colors - kmeans.cluster_centers_[kmeans.labels_], axis=1).mean()
+        center_distance = np.linalg.norm(self.team_colors[1] - self.team_colors[2])
+
+        self.fit_report = {
+            'fit_time': time.perf_counter() - start,
+            'sample_frames': sample_frames,
+            'samples': len(player_colors),
+            'separation': float(center_distance / spread) if spread > 0 else float('inf')
+        }
+        return self.fit_report
+
+    def _predict_teams(self, player_colors: np.ndarray) -> np.ndarray:
+        """Predice el equipo (1 o 2) de cada color de camiseta: el centro más cercano."""
+        distances = np.linalg.norm(
+            np.asarray(player_colors, dtype=np.float64)[:, None, :] - self.team_centers[None],
+            axis=2)
+        return np.argmin(distances, axis=1).astype(np.int64) + 1
+
+    def _select_voting_candidates(
+            self,
+            frame_tracks: Dict[int, TrackDetailBase],
+            pending: set) -> List[int]:
+        """
+        Elige los tracks pendientes cuyo recorte es fiable en este frame: bbox
+        grande respecto a la mediana del frame y sin solaparse con otros jugadores.
+        """
+        track_ids = [
+            track_id for track_id, track in frame_tracks.items() if track.bbox is not None
+        ]
+        if not pending.intersection(track_ids):
+            return []
+
+        boxes = np.array([frame_tracks[track_id].bbox for track_id in track_ids], dtype=np.float64)
+        overlaps = bbox_iou_matrix(boxes, boxes)
+        np.fill_diagonal(overlaps, 0.0)
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+        good = (
+            (overlaps.max(axis=1) <= self.max_overlap_iou)
+            & (areas >= self.min_area_ratio * np.median(areas)))
+        return [
+            track_id for track_id, is_good in zip(track_ids, good)
+            if is_good and track_id in pending
+        ]
+
+    def _register_votes(
+            self,
+            votes: Dict[int, np.ndarray],
+            track_ids: List[int],
+            teams: np.ndarray,
+            pending: set) -> None:
+        """
+        Suma los votos y cierra los tracks que ya tienen una mayoría confiable o
+        alcanzaron el máximo de votos.
+        """
+        for track_id, team in zip(track_ids, teams.tolist()):
+            track_votes = votes.setdefault(track_id, np.zeros(2, dtype=np.int64))
+            track_votes[team - 1] += 1
+
+            total = int(track_votes.sum())
+            confident = (
+                total >= self.min_votes
+                and track_votes.max() / total >= self.vote_confidence)
+            if confident or total >= self.max_votes:
+                self.player_team_dict[track_id] = int(np.argmax(track_votes)) + 1
+                pending.discard(track_id)
+
+    def assign_teams(
+            self,
+            frames: List[MatLike],
+            tracks_collection: TrackCollection) -> Dict:
+        """
+        Asigna el equipo de cada track por votación sobre varios frames de buena
+        calidad y lo escribe en bloque en la colección.
+
+        Los colores se extraen solo de recortes grandes y sin oclusión (IoU con el
+        resto de jugadores) y un track deja de muestrearse en cuanto su mayoría es
+        confiable. Los tracks que nunca tuvieron un recorte fiable usan el primer
+        recorte válido disponible; si no hay ninguno quedan con equipo -1.
+
+        Args:
+            frames (List[MatLike]): Frames del video.
+            tracks_collection (TrackCollection): Colección con los tracks de jugadores.
+
+        Returns:
+            Dict: Reporte con el número de recortes evaluados y de tracks asignados.
+        """
+        if not self.is_fitted:
+            raise ValueError(
+                "El modelo de equipos no está ajustado, usa fit_team_model o load_model primero.")
+
+        player_frames = tracks_collection.tracks["players"]
+        pending = {
+            track_id
+            for frame_tracks in player_frames.values()
+            for track_id in frame_tracks
+            if track_id not in self.player_team_dict
+        }
+        votes: Dict[int, np.ndarray] = {}
+        evaluated_crops = 0
+
+        for strict in (True, False):
+            for frame_num in sorted(player_frames):
+                if not pending:
+                    break
+                frame_tracks = player_frames[frame_num]
+                if strict:
+                    candidates = self._select_voting_candidates(frame_tracks, pending)
+                else:
+                    # Segunda pasada: cualquier recorte válido para los tracks sin votos
+                    candidates = [
+                        track_id for track_id, track in frame_tracks.items()
+                        if track_id in pending and track_id not in votes
+                        and track.bbox is not None
+                    ]
+
+                if not candidates:
+                    continue
+                crops, grass_masks, indices = self.get_frame_crops(
+                    frames,
+                    [(frame_num, frame_tracks[track_id].bbox) for track_id in candidates],
+                    candidates)
+                if not indices:
+                    continue
+
+                crop_ids = [candidates[index] for index in indices]
+                evaluated_crops += len(crops)
+                teams = self._predict_teams(self.get_player_colors(crops, grass_masks))
+                if strict:
+                    self._register_votes(votes, crop_ids, teams, pending)
+                else:
+                    for track_id, team in zip(crop_ids, teams.tolist()):
+                        self.player_team_dict[track_id] = team
+                        pending.discard(track_id)
+
+            # Tracks con votos insuficientes: se resuelven por mayoría simple
+            for track_id in list(pending):
+                if track_id in votes:
+                    self.player_team_dict[track_id] = int(np.argmax(votes[track_id])) + 1
+                    pending.discard(track_id)
+
+        self._write_teams(tracks_collection)
+
+        self.assignment_report = {
+            'evaluated_crops': evaluated_crops,
+            'assigned_tracks': len(self.player_team_dict),
+            'unassigned_tracks': len(pending)
+        }
+        return self.assignment_report
+
+    def _write_teams(self, tracks_collection: TrackCollection) -> None:
+        """Escribe en bloque `team` y `team_color` en todos los tracks de jugadores."""
+        frame_nums, track_ids, _ = tracks_collection.get_columns("players", "bbox", dims=4)
+        if len(frame_nums) == 0:
+            return
+
+        teams = np.array(
+            [self.player_team_dict.get(track_id, -1) for track_id in track_ids.tolist()],
+            dtype=np.int64)
+        tracks_collection.set_values("players", frame_nums, track_ids, team=teams)
 
-        self.team_colors[1] = kmeans.cluster_centers_[0]
-        self.team_colors[2] = kmeans.cluster_centers_[1]
+        # Arreglo de objetos indexado por equipo: cada track referencia el color de su equipo
+        palette = np.empty(3, dtype=object)
+        palette[1], palette[2] = self.team_colors[1], self.team_colors[2]
+        assigned = teams > 0
+        tracks_collection.set_values(
+            "players",
+            frame_nums[assigned],
+            track_ids[assigned],
+            team_color=palette[teams[assigned]])
 
     # def get_player_team(self, frame: MatLike, player_bbox, player_id):
     #     if player_id in self.player_team_dict:
@@ -143,8 +586,8 @@ class TeamAssigner:
             return self.player_team_dict[player_id]
 
         # Validar existencia del modelo
-        if not hasattr(self, "kmeans"):
-            logging.debug("KMeans model not found, cannot assign team.")
+        if not self.is_fitted:
+            logging.debug("Team model not found, cannot assign team.")
             return -1
 
         # Obtener color dominante del jugador
@@ -155,7 +598,7 @@ class TeamAssigner:
 
         # Predicción del equipo
         try:
-            team_id = int(self.kmeans.predict(player_color.reshape(1, -1))[0]) + 1
+            team_id = int(self._predict_teams(player_color.reshape(1, -1))[0])
         except Exception as e:
             logging.debug(f"⚠️ Error predicting team for player {player_id}: {e}")
             return -1
@@ -1,11 +1,15 @@
-from typing import Dict, Hashable
-import pandas as pd
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
 import supervision as sv
 from app.layers.domain.collections.track_collection import TrackCollection
 from app.layers.domain.tracks.track_detail import TrackBallDetail, TrackDetailBase
 from app.layers.infraestructure.video_analysis.trackers.interfaces import Tracker
 
 
+GAP_FILL_METHODS = ("linear", "parabolic")
+
+
 class BallTracker(Tracker):
     def __init__(self, model):
         super().__init__(model)
@@ -40,63 +44,254 @@ class BallTracker(Tracker):
         #     if cls_id == cls_names_inv['ball']:
         #         tracks["ball"][frame_num][1] = {"bbox": bbox}
 
+    @staticmethod
+    def fill_gaps(
+            frame_nums: np.ndarray,
+            values: np.ndarray,
+            num_frames: int,
+            max_gap: Optional[int] = None,
+            method: str = "linear",
+            anchors: int = 3,
+            cut_frames: Optional[Iterable[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rellena todos los frames del rango [0, num_frames) a partir de los frames
+        detectados, por interpolación lineal (`np.interp` por coordenada) o con un
+        arco parabólico por hueco. Un hueco que contiene un corte de plano nunca se
+        rellena: el balón de un plano no continúa en el siguiente.
+
+        Args:
+            frame_nums (np.ndarray): Frames con detección (n,), sin repetir.
+            values (np.ndarray): Valores detectados (n, d), p. ej. bboxes.
+            num_frames (int): Número total de frames.
+            max_gap (Optional[int]): Máximo número de frames consecutivos sin
+                detección que se rellenan; los huecos más largos (incluidos los del
+                inicio y el final) quedan en NaN. None rellena todos.
+            method (str): "linear" o "parabolic".
+            anchors (int): Detecciones a cada lado del hueco usadas para ajustar la
+                parábola.
+            cut_frames (Optional[Iterable[int]]): Frames en los que empieza un nuevo
+                plano (ver `ShotBoundaryDetector.get_cut_frames`).
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Valores (num_frames, d) con NaN donde no
+            se rellenó y máscara (num_frames,) de frames detectados.
+        """
+        if method not in GAP_FILL_METHODS:
+            raise ValueError(
+                f"Método de interpolación '{method}' no reconocido, "
+                f"usa uno de {GAP_FILL_METHODS}.")
+
+        values = np.asarray(values, dtype=np.float64).reshape(len(frame_nums), -1)
+        filled = np.full((num_frames, values.shape[1]), np.nan)
+        detected = np.zeros(num_frames, dtype=bool)
+        if len(frame_nums) == 0:
+            return filled, detected
+
+        order = np.argsort(frame_nums)
+        frame_nums, values = np.asarray(frame_nums)[order], values[order]
+        detected[frame_nums] = True
+
+        all_frames = np.arange(num_frames)
+        for dim in range(values.shape[1]):
+            # Fuera del rango detectado np.interp repite el extremo más cercano
+            filled[:, dim] = np.interp(all_frames, frame_nums, values[:, dim])
+
+        shot_ids = BallTracker.shot_ids(num_frames, cut_frames)
+        if method == "parabolic":
+            BallTracker._fill_parabolic_gaps(
+                filled, frame_nums, values, anchors, shot_ids[frame_nums])
+
+        if max_gap is not None:
+            filled[~detected & (BallTracker.gap_lengths(detected) > max_gap)] = np.nan
+        if cut_frames is not None:
+            # Huecos cuyos extremos están en planos distintos (incluye inicio y final)
+            previous, following = BallTracker.gap_bounds(detected)
+            crosses_cut = (
+                shot_ids[np.maximum(previous, 0)]
+                != shot_ids[np.minimum(following, num_frames - 1)])
+            filled[~detected & crosses_cut] = np.nan
+        return filled, detected
+
+    @staticmethod
+    def _fill_parabolic_gaps(
+            filled: np.ndarray,
+            frame_nums: np.ndarray,
+            values: np.ndarray,
+            anchors: int,
+            detection_shots: Optional[np.ndarray] = None) -> None:
+        """
+        Sustituye el relleno lineal de los huecos interiores por una parábola
+        ajustada por mínimos cuadrados a las `anchors` detecciones de cada lado.
+        Todos los huecos se resuelven a la vez como un sistema 3x3 por hueco.
+
+        En un pase aéreo la altura del balón describe un arco que, en el espacio
+        de imagen, se aproxima mejor con una parábola que con una recta. Los
+        huecos sin suficientes detecciones a algún lado, o cuyas detecciones de
+        apoyo no están todas en el mismo plano (`detection_shots`), conservan el
+        lineal.
+        """
+        gap_starts = np.flatnonzero(np.diff(frame_nums) > 1)
+        gap_starts = gap_starts[
+            (gap_starts >= anchors - 1) & (gap_starts + anchors < len(frame_nums))]
+        if len(gap_starts) == 0:
+            return
+
+        # Índices de las detecciones de apoyo de cada hueco (g, 2·anchors)
+        offsets = np.concatenate((np.arange(-anchors + 1, 1), np.arange(1, anchors + 1)))
+        support = gap_starts[:, None] + offsets[None, :]
+        if detection_shots is not None:
+            same_shot = (detection_shots[support] == detection_shots[support[:, :1]]).all(axis=1)
+            gap_starts, support = gap_starts[same_shot], support[same_shot]
+            if len(gap_starts) == 0:
+                return
+
+        # Tiempo normalizado por la duración del hueco para un sistema bien condicionado
+        origin = frame_nums[gap_starts].astype(np.float64)
+        duration = (frame_nums[gap_starts + 1] - frame_nums[gap_starts]).astype(np.float64)
+        times = (frame_nums[support] - origin[:, None]) / duration[:, None]
+        design = np.stack((np.ones_like(times), times, times ** 2), axis=2)
+
+        normal = np.einsum("gki,gkj->gij", design, design)
+        rhs = np.einsum("gki,gkd->gid", design, values[support])
+        coefficients = np.linalg.solve(normal, rhs)
+
+        # Frames de cada hueco: los no detectados entre sus dos extremos
+        lengths = (duration - 1).astype(np.int64)
+        gap_ids = np.repeat(np.arange(len(gap_starts)), lengths)
+        steps = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + 1
+        gap_frames = origin.astype(np.int64)[gap_ids] + steps
+        gap_times = steps / duration[gap_ids]
+
+        basis = np.stack((np.ones_like(gap_times), gap_times, gap_times ** 2), axis=1)
+        filled[gap_frames] = np.einsum("ni,nid->nd", basis, coefficients[gap_ids])
+
+    @staticmethod
+    def gap_bounds(detected: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Frame detectado anterior y siguiente de cada frame (él mismo si está
+        detectado), con -1 y `len(detected)` donde no existen.
+        """
+        num_frames = len(detected)
+        all_frames = np.arange(num_frames)
+        previous = np.maximum.accumulate(np.where(detected, all_frames, -1))
+        following = np.minimum.accumulate(
+            np.where(detected, all_frames, num_frames)[::-1])[::-1]
+        return previous, following
+
+    @staticmethod
+    def gap_lengths(detected: np.ndarray) -> np.ndarray:
+        """
+        Longitud del hueco sin detección al que pertenece cada frame (0 en los
+        frames detectados).
+        """
+        previous, following = BallTracker.gap_bounds(detected)
+        return np.where(detected, 0, following - previous - 1)
+
+    @staticmethod
+    def shot_ids(num_frames: int, cut_frames: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Índice del plano al que pertenece cada frame, según los cortes."""
+        starts = np.zeros(num_frames + 1, dtype=np.int64)
+        cuts = np.array(sorted(cut_frames or ()), dtype=np.int64)
+        cuts = cuts[(cuts > 0) & (cuts < num_frames)]
+        np.add.at(starts, cuts, 1)
+        return np.cumsum(starts[:num_frames])
+
     def interpolate_ball_positions(
             self,
-            ball_tracks: Dict[int, Dict[int, TrackDetailBase]]
-    ) -> Dict[Hashable, Dict[int, Dict[str, list]]]:
+            ball_tracks: Dict[int, Dict[int, TrackDetailBase]],
+            num_frames: Optional[int] = None,
+            max_gap: Optional[int] = None,
+            method: str = "linear",
+            cut_frames: Optional[Iterable[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Interpola posiciones del balón entre frames perdidos, sin cruzar cortes de
+        plano.
+
+        Args:
+            ball_tracks: dict con estructura {frame_num: {track_id: TrackBallDetail}}
+            num_frames: número total de frames del video (por defecto, hasta el
+                último frame con balón)
+            max_gap: máximo número de frames consecutivos sin detección que se interpolan
+            method: "linear" o "parabolic" (arco ajustado a cada hueco)
+            cut_frames: frames en los que empieza un nuevo plano
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: bboxes (num_frames, 4) con NaN donde no
+            hay balón y máscara (num_frames,) de frames detectados.
         """
-    Interpola posiciones del balón entre frames perdidos.
-
-    Args:
-        ball_tracks: dict con estructura {frame_num: {track_id: TrackBallDetail}}
-        max_gap: máximo número de frames consecutivos sin detección que se interpolan
-    """
-    #     positions = {
-    #     frame: track[1].bbox
-    #     for frame, track in ball_tracks.items()
-    #     if 1 in track and track[1].bbox is not None
-    # }
-        
-        ball_positions = {}
-        frame_indices = []
+        frame_nums, bboxes = [], []
         for frame_num, tracks_in_frame in ball_tracks.items():
-            for track_id, track in tracks_in_frame.items():
-                ball_positions[frame_num] = track.bbox
-                frame_indices.append(frame_num)
-
-        # DataFrame con índice de frames
-        df_ball = pd.DataFrame.from_dict(
-            ball_positions, orient="index", columns=["x1", "y1", "x2", "y2"]
-        ).sort_index()
-
-        # Interpolación
-        df_ball = df_ball.interpolate(limit_direction="both")
-
-        # Reconstruir como dict indexado por frame
-        interpolated_tracks = {
-            frame: {1: {"bbox": row.tolist()}}
-            for frame, row in df_ball.iterrows()
-        }
-        return interpolated_tracks
-
-        # ball_positions= []
-        # for frame_num, tracks_in_frame in ball_tracks.items():
-        #     for tracks in tracks_in_frame.values():
-        #         print("Bbox is of type: ", type(tracks.bbox))
-        #         ball_positions.append(tracks.bbox)
-
-        # # Create a DataFrame to handle missing values
-        # df_ball = pd.DataFrame(
-        #     ball_positions,
-        #     columns=['x1', 'y1', 'x2', 'y2']
-        # )
-
-        # # Interpolate middle gaps, then fill leading/trailing NaNs
-        # df_ball = df_ball.interpolate(limit_direction='both')
-
-        # ball_positions = [
-        #     {1: {"bbox": row}}
-        #     for row in df_ball.to_numpy().tolist()
-        # ]
-
-        # return ball_positions
+            track = tracks_in_frame.get(1)
+            # Solo las detecciones reales: las interpolaciones previas se recalculan
+            if track is None or track.bbox is None or getattr(track, "interpolated", False):
+                continue
+            frame_nums.append(frame_num)
+            bboxes.append(track.bbox)
+
+        if num_frames is None:
+            num_frames = max(frame_nums) + 1 if frame_nums else 0
+        return self.fill_gaps(
+            np.array(frame_nums, dtype=np.int64),
+            np.array(bboxes, dtype=np.float64).reshape(-1, 4),
+            num_frames,
+            max_gap,
+            method,
+            cut_frames=cut_frames)
+
+    def add_interpolated_ball_to_tracks(
+            self,
+            tracks_collection: TrackCollection,
+            num_frames: int,
+            max_gap: Optional[int] = None,
+            method: str = "linear",
+            cut_frames: Optional[Iterable[int]] = None) -> np.ndarray:
+        """
+        Interpola el balón sobre todo el rango de frames y escribe el resultado en
+        la colección, marcando como `interpolated` los frames sin detección. Los
+        huecos que contienen un corte de plano no se interpolan.
+
+        Args:
+            tracks_collection (TrackCollection): Colección con los tracks del balón.
+            num_frames (int): Número total de frames del video.
+            max_gap (Optional[int]): Máximo hueco (en frames) que se interpola.
+            method (str): "linear" o "parabolic".
+            cut_frames (Optional[Iterable[int]]): Frames en los que empieza un nuevo
+                plano.
+
+        Returns:
+            np.ndarray: Máscara (num_frames,) de frames con detección real.
+        """
+        ball_frames = tracks_collection.tracks["ball"]
+        bboxes, detected = self.interpolate_ball_positions(
+            ball_frames, num_frames, max_gap, method, cut_frames)
+        filled = ~np.isnan(bboxes).any(axis=1)
+        interpolated = np.flatnonzero(filled & ~detected)
+
+        existing = np.array(
+            [1 in ball_frames.get(frame_num, {}) for frame_num in interpolated.tolist()],
+            dtype=bool)
+        update_frames = interpolated[existing]
+        tracks_collection.set_values(
+            "ball",
+            update_frames,
+            np.ones(len(update_frames), dtype=np.int64),
+            bbox=bboxes[update_frames],
+            interpolated=np.ones(len(update_frames), dtype=bool))
+        for frame_num in interpolated[~existing].tolist():
+            tracks_collection.add_track(
+                "ball",
+                frame_num,
+                TrackBallDetail(
+                    track_id=1, bbox=bboxes[frame_num].tolist(), interpolated=True))
+
+        # Interpolaciones previas que ya no se rellenan (p. ej. con un max_gap menor)
+        for frame_num in np.flatnonzero(~filled).tolist():
+            track = ball_frames.get(frame_num, {}).get(1)
+            if track is not None and getattr(track, "interpolated", False):
+                del ball_frames[frame_num][1]
+
+        # Mantiene los frames ordenados tras insertar los interpolados
+        ordered = sorted(ball_frames.items())
+        ball_frames.clear()
+        ball_frames.update(ordered)
+        return detected
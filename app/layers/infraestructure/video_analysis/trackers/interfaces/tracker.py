@@ -1,15 +1,15 @@
 from abc import ABC, abstractmethod
 from typing import Dict
 
-import cv2
 import numpy as np
 import supervision as sv
 from cv2.typing import MatLike
 from app.layers.domain.collections.track_collection import TrackCollection
-from app.layers.domain.tracks.track_detail import TrackDetailBase, TrackPlayerDetail
-from app.layers.infraestructure.video_analysis.services import (get_bbox_width,
-                                                                get_center_of_bbox,
-                                                                read_stub, save_stub)
+from app.layers.domain.tracks.track_detail import TrackDetailBase
+from app.layers.infraestructure.video_analysis.rendering.annotation_renderer import (
+    draw_ellipse, draw_team_ball_control, draw_triangle, to_bgr_color)
+from app.layers.infraestructure.video_analysis.rendering.possession_hud import PossessionHud
+from app.layers.infraestructure.video_analysis.services import read_stub, save_stub
 from ultralytics import YOLO
 from ultralytics.engine.results import Results
 
@@ -53,108 +53,13 @@ class Tracker(ABC):
         return detections
 
     def draw_ellipse(self, frame, bbox, color, track_id=None):
-        y2 = int(bbox[3])
-        x_center, _ = get_center_of_bbox(bbox)
-        width = get_bbox_width(bbox)
-
-        cv2.ellipse(
-            frame,
-            center=(x_center, y2),
-            axes=(int(width), int(0.35 * width)),
-            angle=0.0,
-            startAngle=-45,
-            endAngle=235,
-            color=color,
-            thickness=2,
-            lineType=cv2.LINE_4
-        )
-
-        rectangle_width = 40
-        rectangle_height = 20
-        x1_rect = x_center - rectangle_width // 2
-        x2_rect = x_center + rectangle_width // 2
-        y1_rect = (y2 - rectangle_height // 2) + 15
-        y2_rect = (y2 + rectangle_height // 2) + 15
-
-        if track_id is not None:
-            cv2.rectangle(frame,
-                          (int(x1_rect), int(y1_rect)),
-                          (int(x2_rect), int(y2_rect)),
-                          color,
-                          cv2.FILLED)
-
-            x1_text = x1_rect + 12
-            if track_id > 99:
-                x1_text -= 10
-
-            cv2.putText(
-                frame,
-                f"{track_id}",
-                (int(x1_text), int(y1_rect + 15)),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.6,
-                (0, 0, 0),
-                2
-            )
-
-        return frame
+        return draw_ellipse(frame, bbox, color, track_id)
 
     def draw_triangle(self, frame, bbox, color):
-        y = int(bbox[1])
-        x, _ = get_center_of_bbox(bbox)
-
-        triangle_points = np.array([
-            [x, y],
-            [x - 10, y - 20],
-            [x + 10, y - 20],
-        ])
-        cv2.drawContours(frame, [triangle_points], 0, color, cv2.FILLED)
-        cv2.drawContours(frame, [triangle_points], 0, (0, 0, 0), 2)
-
-        return frame
+        return draw_triangle(frame, bbox, color)
 
     def draw_team_ball_control(self, frame, frame_num, team_ball_control):
-        # Draw a semi-transparent rectaggle
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (1350, 850), (1900, 970), (255, 255, 255), -1)
-        alpha = 0.4
-        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-
-        team_ball_control_till_frame = team_ball_control[:frame_num + 1]
-        # Get the number of time each team had ball control
-        team_1_num_frames = team_ball_control_till_frame[team_ball_control_till_frame == 1].shape[0]
-        team_2_num_frames = team_ball_control_till_frame[team_ball_control_till_frame == 2].shape[0]
-        print("Team 1 ball control, ", team_1_num_frames)
-        print("Team 2 ball control, ", team_2_num_frames)
-        team_1 = team_1_num_frames / (team_1_num_frames + team_2_num_frames)
-        team_2 = team_2_num_frames / (team_1_num_frames + team_2_num_frames)
-
-        cv2.putText(
-            frame,
-            f"Team 1 Ball Control: {
-                team_1 * 100:.2f}%",
-            (1400,
-             900),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (0,
-             0,
-             0),
-            3)
-        cv2.putText(
-            frame,
-            f"Team 2 Ball Control: {
-                team_2 * 100:.2f}%",
-            (1400,
-             950),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            1,
-            (0,
-             0,
-             0),
-            3)
-
-        return frame
+        return draw_team_ball_control(frame, frame_num, team_ball_control)
 
     def draw_annotations(
             self,
@@ -169,6 +74,8 @@ class Tracker(ABC):
         """
 
         output_video_frames = []
+        # Porcentajes acumulados calculados una sola vez para todo el video
+        possession_hud = PossessionHud(team_ball_control)
 
         for frame_num, frame in enumerate(video_frames):
             # Copia defensiva del frame
@@ -185,13 +92,7 @@ class Tracker(ABC):
                 if player.bbox is None:
                     continue
 
-                # Mejor: usar directamente player (ya es TrackDetailBase o subclase)
-                team_color = getattr(player, "team_color", None)
-                
-                if isinstance(team_color, np.ndarray):
-                    team_color = team_color.tolist()
-                if not isinstance(team_color, (list, tuple)) or len(team_color) < 3:
-                    team_color = (0, 0, 255)
+                team_color = to_bgr_color(getattr(player, "team_color", None))
 
                 frame = self.draw_ellipse(frame, player.bbox, team_color, track_id)
 
@@ -205,7 +106,7 @@ class Tracker(ABC):
                 frame = self.draw_triangle(frame, ball.bbox, (0, 255, 0))
 
             # --- Dibujar control de balón ---
-            frame = self.draw_team_ball_control(frame, frame_num, team_ball_control)
+            frame = possession_hud.draw(frame, frame_num)
 
             output_video_frames.append(frame)
 
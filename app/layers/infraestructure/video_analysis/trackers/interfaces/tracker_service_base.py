@@ -1,12 +1,16 @@
 import pickle
+import time
 from abc import abstractmethod
 from pathlib import Path
-from typing import List, Type
+from typing import Iterable, List, Optional, Type
 
+import numpy as np
 import supervision as sv
 from cv2.typing import MatLike
 from app.layers.domain.collections.track_collection import TrackCollection
 from app.layers.domain.utils.singleton import AbstractSingleton
+from app.layers.infraestructure.video_analysis.frame_analysis import (
+    PitchMasker, ShotSegment, StaticFrameGate)
 from app.layers.infraestructure.video_analysis.services import (get_center_of_bbox)
 from ultralytics import YOLO
 from ultralytics.engine.results import Results
@@ -15,7 +19,20 @@ from .tracker import Tracker
 
 
 class TrackerServiceBase(metaclass=AbstractSingleton):
-    def __init__(self, model_path: str):
+    def __init__(
+            self,
+            model_path: str,
+            pitch_masker: PitchMasker | None = None,
+            grass_rejection_threshold: float | None = None):
+        """
+        Args:
+            model_path (str): Ruta del modelo YOLO.
+            pitch_masker (PitchMasker | None): Máscara de césped compartida (p. ej.
+                con el `TeamAssigner`); si no se indica se crea una propia.
+            grass_rejection_threshold (float | None): Proporción de césped a partir
+                de la cual un bbox se descarta; None (por defecto) no descarta nada.
+                Un umbral alto puede eliminar jugadores con camiseta verde.
+        """
         # Import locally to avoid circular import
         from app.layers.infraestructure.video_analysis.trackers.services import \
             TrackerFactory
@@ -24,6 +41,15 @@ class TrackerServiceBase(metaclass=AbstractSingleton):
         self.tracker = sv.ByteTrack()
         self.tracker_factory = TrackerFactory(self.model)
         self.tracker_path = "bytetrack.yaml"
+        self.static_frame_gate = StaticFrameGate()
+        self.pitch_masker = pitch_masker or PitchMasker()
+        self.grass_rejection_threshold = grass_rejection_threshold
+        self.inference_stats = {
+            'inferred_frames': 0,
+            'skipped_frames': 0,
+            'inference_time': 0.0,
+            'time_saved': 0.0
+        }
 
     @abstractmethod
     def get_object_tracks(
@@ -31,7 +57,8 @@ class TrackerServiceBase(metaclass=AbstractSingleton):
         frames: list[MatLike],
         tracks_collection: TrackCollection,
         read_from_stub: bool = False,
-        stub_path: str = ""
+        stub_path: str = "",
+        shots: List[ShotSegment] | None = None
     ):
         raise NotImplementedError
 
@@ -87,16 +114,90 @@ class TrackerServiceBase(metaclass=AbstractSingleton):
             with open(stub_path, 'wb') as f:
                 pickle.dump(tracks, f)
 
+    def reject_grass_detections(
+            self,
+            frame: MatLike,
+            detections: sv.Detections,
+            keep_class_ids: List[int],
+            frame_num: Optional[int] = None) -> sv.Detections:
+        """
+        Descarta las detecciones cuyo bbox es casi todo césped (falsos positivos
+        sobre el campo), usando la máscara de césped del frame reducido.
+
+        Args:
+            frame (MatLike): Frame BGR original.
+            detections (sv.Detections): Detecciones del frame.
+            keep_class_ids (List[int]): Clases que nunca se descartan (p. ej. el
+                balón, cuyo bbox es casi todo césped por naturaleza).
+            frame_num (Optional[int]): Número de frame; si se indica, la máscara se
+                toma de la caché compartida del `PitchMasker`.
+
+        Returns:
+            sv.Detections: Detecciones filtradas.
+        """
+        if self.grass_rejection_threshold is None or len(detections) == 0:
+            return detections
+
+        mask = (
+            self.pitch_masker.compute_mask(frame) if frame_num is None
+            else self.pitch_masker.get_mask(frame_num, frame))
+        grass_ratios = self.pitch_masker.grass_ratios(mask, detections.xyxy)
+        keep = grass_ratios < self.grass_rejection_threshold
+        if detections.class_id is not None:
+            keep |= np.isin(detections.class_id, keep_class_ids)
+        return detections[keep]
+
     def detect_frames(
             self,
             frames: List[MatLike],
             batch_size: int = 20,
-            conf: float = 0.1) -> list[Results]:
-        """Divide los frames en lotes y obtiene detecciones con el modelo YOLO."""
+            conf: float = 0.1,
+            skip_static_frames: bool = True,
+            segment_starts: Optional[Iterable[int]] = None) -> list[Results]:
+        """
+        Divide los frames en lotes y obtiene detecciones con el modelo YOLO.
+
+        Con `skip_static_frames`, los frames sin cambios significativos respecto al
+        último frame inferido del mismo segmento reutilizan sus detecciones en lugar
+        de pasar por el modelo. El número de frames omitidos y el tiempo ahorrado
+        estimado quedan en `self.inference_stats`.
+
+        Args:
+            segment_starts (Optional[Iterable[int]]): Posiciones en `frames` donde
+                empieza un nuevo plano o tramo; ahí la compuerta se reinicia y el
+                frame siempre pasa por el modelo.
+
+        Returns:
+            list[Results]: Una detección por frame de entrada, en el mismo orden.
+        """
+        segment_starts = set(segment_starts or ())
+
+        # Para cada frame, índice (en `inferred`) del resultado que le corresponde
+        inferred: List[int] = []
+        result_index: List[int] = []
+        for frame_num, frame in enumerate(frames):
+            if frame_num == 0 or frame_num in segment_starts:
+                self.static_frame_gate.reset()
+            if not (skip_static_frames and self.static_frame_gate.is_static(frame)):
+                inferred.append(frame_num)
+            result_index.append(len(inferred) - 1)
+
         detections: list[Results] = []
-        for i in range(0, len(frames), batch_size):
-            batch = frames[i:i + batch_size]
+        start = time.perf_counter()
+        for i in range(0, len(inferred), batch_size):
+            batch = [frames[frame_num] for frame_num in inferred[i:i + batch_size]]
             detections_batch = self.model.predict(
                 batch, conf=conf)
             detections.extend(detections_batch)
-        return detections
+        inference_time = time.perf_counter() - start
+
+        skipped_frames = len(frames) - len(inferred)
+        time_per_frame = inference_time / len(inferred) if inferred else 0.0
+        self.inference_stats = {
+            'inferred_frames': len(inferred),
+            'skipped_frames': skipped_frames,
+            'inference_time': inference_time,
+            'time_saved': skipped_frames * time_per_frame
+        }
+
+        return [detections[i] for i in result_index]
@@ -1,17 +1,23 @@
 import pickle
-from typing import override
+from typing import List, override
 
 import supervision as sv
 from cv2.typing import MatLike
 from app.layers.domain.collections.track_collection import TrackCollection
+from app.layers.infraestructure.video_analysis.frame_analysis import (
+    PitchMasker, ShotBoundaryDetector, ShotSegment)
 from app.layers.infraestructure.video_analysis.trackers.interfaces import \
     TrackerServiceBase
 
 
 class TrackerService(TrackerServiceBase):
 
-    def __init__(self, model_path: str):
-        super().__init__(model_path)
+    def __init__(
+            self,
+            model_path: str,
+            pitch_masker: PitchMasker | None = None,
+            grass_rejection_threshold: float | None = None):
+        super().__init__(model_path, pitch_masker, grass_rejection_threshold)
         self.detection_frame: sv.Detections | None = None
 
     @override
@@ -20,22 +26,51 @@ class TrackerService(TrackerServiceBase):
         frames: list[MatLike],
         tracks_collection: TrackCollection,
         read_from_stub: bool = False,
-        stub_path: str = ""
+        stub_path: str = "",
+        shots: List[ShotSegment] | None = None
     ):
+        """
+        Detecta y sigue los objetos de los frames. Si se reciben los planos del
+        video, solo se procesan los planos abiertos y el estado de ByteTrack se
+        reinicia en cada corte para evitar arrastrar IDs entre planos.
+        """
         if read_from_stub and stub_path:
             tracks = self.read_tracks_from_stub(stub_path)
             print(f"Tracks loaded players from stub: {tracks.pop('players', None)}")
             print(f"Tracks loaded ball from stub: {tracks.pop('ball', None)}")
 
-        results = self.detect_frames(frames)
+        if shots is not None:
+            frame_indices = ShotBoundaryDetector.get_wide_frames(shots)
+            cut_frames = ShotBoundaryDetector.get_cut_frames(shots)
+        else:
+            frame_indices = list(range(len(frames)))
+            cut_frames = set()
+
+        # Cada corte o salto en los frames procesados empieza un segmento nuevo: la
+        # compuerta de frames estáticos no compara frames de planos distintos
+        segment_starts = [
+            index for index, frame_num in enumerate(frame_indices)
+            if index == 0 or frame_num in cut_frames
+            or frame_num != frame_indices[index - 1] + 1
+        ]
+        results = self.detect_frames(
+            [frames[i] for i in frame_indices], segment_starts=segment_starts)
 
         printed = False
-        for frame_num, detection in enumerate(results):
+        for frame_num, detection in zip(frame_indices, results):
+            if frame_num in cut_frames:
+                self.tracker.reset()
+
             cls_names = detection.names
             cls_names_inv = {v: k for k, v in cls_names.items()}
 
             # Covert to supervision Detection format
             detection_supervision = sv.Detections.from_ultralytics(detection)
+            detection_supervision = self.reject_grass_detections(
+                frames[frame_num],
+                detection_supervision,
+                keep_class_ids=[cls_names_inv['ball']] if 'ball' in cls_names_inv else [],
+                frame_num=frame_num)
 
             # Track Objects
             detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
@@ -0,0 +1 @@
+from .trajectory_smoother import TrajectorySmoother
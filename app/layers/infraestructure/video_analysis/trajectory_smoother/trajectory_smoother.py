@@ -0,0 +1,111 @@
+from typing import Iterable
+
+import numpy as np
+
+from app.layers.domain.collections.track_collection import TrackCollection
+
+
+class TrajectorySmoother:
+    """
+    Suavizado Savitzky-Golay de las trayectorias transformadas de los tracks.
+
+    Trabaja sobre las columnas de todos los tracks a la vez: cada tramo continuo
+    (mismo track, frames consecutivos y posiciones válidas) se suaviza con un
+    polinomio de grado `polyorder` ajustado en ventanas de `window_length`
+    frames. En los extremos del tramo se evalúa el ajuste de la primera/última
+    ventana completa; los tramos más cortos que la ventana se dejan sin cambios.
+    """
+
+    def __init__(
+            self,
+            window_length: int = 9,
+            polyorder: int = 2,
+            chunk_size: int = 200_000):
+        if window_length % 2 == 0 or window_length <= polyorder:
+            raise ValueError(
+                "window_length debe ser impar y mayor que polyorder "
+                f"(window_length={window_length}, polyorder={polyorder}).")
+
+        self.window_length = window_length
+        self.polyorder = polyorder
+        self.chunk_size = chunk_size
+
+        # Matriz "hat": la fila k evalúa en el offset k el polinomio ajustado a la ventana
+        offsets = np.arange(window_length) - window_length // 2
+        vandermonde = np.vander(offsets, polyorder + 1, increasing=True)
+        self.hat_matrix = vandermonde @ np.linalg.pinv(vandermonde)
+
+    def smooth(
+            self,
+            frame_nums: np.ndarray,
+            track_ids: np.ndarray,
+            positions: np.ndarray) -> np.ndarray:
+        """
+        Suaviza posiciones en formato columnar.
+
+        Args:
+            frame_nums (np.ndarray): Números de frame (n,).
+            track_ids (np.ndarray): Identificadores de track (n,).
+            positions (np.ndarray): Posiciones (n, d), NaN donde faltan.
+                Las filas deben estar ordenadas por track y luego por frame.
+
+        Returns:
+            np.ndarray: Posiciones suavizadas (n, d).
+        """
+        smoothed = positions.copy()
+        total = len(frame_nums)
+        window = self.window_length
+        if total < window:
+            return smoothed
+
+        valid = ~np.isnan(positions).any(axis=1)
+        breaks = np.ones(total, dtype=bool)
+        breaks[1:] = (
+            (track_ids[1:] != track_ids[:-1])
+            | (np.diff(frame_nums) != 1)
+            | (valid[1:] != valid[:-1]))
+
+        segment_id = np.cumsum(breaks) - 1
+        segment_start = np.flatnonzero(breaks)
+        segment_end = np.append(segment_start[1:], total)
+        row_start = segment_start[segment_id]
+        row_end = segment_end[segment_id]
+
+        rows = np.flatnonzero(valid & (row_end - row_start >= window))
+        window_start = np.clip(
+            rows - window // 2, row_start[rows], row_end[rows] - window)
+        offsets = rows - window_start
+        window_range = np.arange(window)
+
+        for chunk in range(0, len(rows), self.chunk_size):
+            chunk_slice = slice(chunk, chunk + self.chunk_size)
+            windows = positions[window_start[chunk_slice, None] + window_range]
+            coefficients = self.hat_matrix[offsets[chunk_slice]]
+            smoothed[rows[chunk_slice]] = np.einsum(
+                "mw,mwd->md", coefficients, windows)
+
+        return smoothed
+
+    def smooth_tracks(
+            self,
+            tracks_collection: TrackCollection,
+            entity_types: Iterable[str] = ("players",),
+            field: str = "position_transformed") -> None:
+        """
+        Suaviza en el sitio las posiciones de los tracks indicados.
+
+        Pensado para ejecutarse tras `ViewTransformer` y antes de
+        `SpeedAndDistanceEstimator`. El balón no se suaviza por defecto porque
+        sus cambios bruscos de dirección son reales.
+        """
+        for entity_type in entity_types:
+            frame_nums, track_ids, positions = tracks_collection.get_columns(
+                entity_type, field)
+            if len(frame_nums) == 0:
+                continue
+
+            tracks_collection.set_values(
+                entity_type,
+                frame_nums,
+                track_ids,
+                **{field: self.smooth(frame_nums, track_ids, positions)})
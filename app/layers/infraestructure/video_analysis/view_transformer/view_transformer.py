@@ -3,13 +3,13 @@ import numpy as np
 
 from app.layers.domain.collections.track_collection import TrackCollection
 
+# Court dimensions in meters (width and length)
+COURT_WIDTH = 68
+COURT_LENGTH = 23.32
+
 
 class ViewTransformer:
     def __init__(self):
-        # Court dimensions in meters (width and length)
-        COURT_WIDTH = 68
-        COURT_LENGTH = 23.32
-
         # Define source quadrilateral in image pixels
         self.pixel_vertices = np.array([
             [110, 1035],  # Bottom-left corner
@@ -1,18 +1,24 @@
 import time
 import tracemalloc
+from pathlib import Path
 
 import numpy as np
 from app.layers.domain.collections.track_collection import TrackCollection
-from app.layers.domain.tracks.track_detail import TrackDetailBase, TrackPlayerDetail
 from app.layers.infraestructure.validation import (calculate_interpolation_error,
                                                    check_speed_consistency)
 from app.layers.infraestructure.video_analysis.camera_movement_estimator import \
     CameraMovementEstimator
-from app.layers.infraestructure.video_analysis.player_ball_assigner import \
-    PlayerBallAssigner
+from app.layers.infraestructure.video_analysis.event_detector import EventDetector
+from app.layers.infraestructure.video_analysis.frame_analysis import (PitchMasker,
+                                                                      ShotBoundaryDetector)
+from app.layers.infraestructure.video_analysis.player_ball_assigner import (
+    PlayerBallAssigner, PossessionDecoder)
 from app.layers.infraestructure.video_analysis.plotting import generate_diagrams
-from app.layers.infraestructure.video_analysis.services import (read_video,
-                                                                save_video)
+from app.layers.infraestructure.video_analysis.rendering import (MinimapRenderer,
+                                                                 ParallelAnnotationRenderer,
+                                                                 RenderConfig, RenderSnapshot,
+                                                                 write_overlay_sidecar)
+from app.layers.infraestructure.video_analysis.services import CropService, read_video
 from app.layers.infraestructure.video_analysis.services.video_processing_service import extract_player_images
 from app.layers.infraestructure.video_analysis.speed_and_distance_estimator import \
     SpeedAndDistanceEstimator
@@ -21,6 +27,8 @@ from app.layers.infraestructure.video_analysis.trackers.entities import (
     BallTracker, PlayerTracker)
 from app.layers.infraestructure.video_analysis.trackers.services import \
     TrackerService
+from app.layers.infraestructure.video_analysis.trajectory_smoother import \
+    TrajectorySmoother
 from app.layers.infraestructure.video_analysis.view_transformer import \
     ViewTransformer
 
@@ -34,17 +42,34 @@ def main():
         'memory_usage': [],
         'ball_detection': {'detected': 0, 'interpolated': 0},
         'interpolation_error': 0.0,
-        'velocity_inconsistencies': {'players': 0, 'referees': 0}
+        'velocity_inconsistencies': {'players': 0, 'referees': 0},
+        'shots': {'total': 0, 'wide': 0, 'skipped_frames': 0},
+        'frame_skipping': {'inferred_frames': 0, 'skipped_frames': 0,
+                           'inference_time': 0.0, 'time_saved': 0.0}
     }
 
     # Lectura y extracción de frames del video
-    video_frames = read_video('./app/res/input_videos/08fd33_4.mp4')
+    input_video_path = './app/res/input_videos/08fd33_4.mp4'
+    # Con False solo se exporta el sidecar de anotaciones, sin recodificar el video
+    burn_annotations = True
+    # Render de revisión rápida: media resolución y la mitad de frames
+    proxy_render = False
+    # Suavizado Savitzky-Golay de las posiciones transformadas antes de la velocidad
+    smooth_trajectories = True
+    # Reutiliza el modelo de equipos guardado para este mismo video (como los stubs)
+    read_team_model = False
+    # Hueco máximo (frames) del balón que se interpola, también en la validación
+    ball_max_gap = 48
+    video_frames = read_video(input_video_path)
     if not video_frames:
         print("Error: No frames read from video")
         return
 
     # Inicializa los trackers para el reconocimiento de objetos
-    tracker = TrackerService("./app/res/models/best.torchscript")
+    # Máscara de césped compartida por el tracker y la asignación de equipos: cada
+    # frame se calcula una sola vez y se conserva para todo el video
+    pitch_masker = PitchMasker(cache_size=None)
+    tracker = TrackerService("./app/res/models/best.torchscript", pitch_masker=pitch_masker)
     tracker.create_tracker('players', PlayerTracker)
     tracker.create_tracker('ball', BallTracker)
     
@@ -53,9 +78,23 @@ def main():
     tracks_collection = TrackCollection()
     view_transformer = ViewTransformer()
     speed_and_distance_estimator = SpeedAndDistanceEstimator()
-    team_assigner = TeamAssigner()
-    player_assigner = PlayerBallAssigner()
+    trajectory_smoother = TrajectorySmoother(window_length=9, polyorder=2)
+    crop_service = CropService(video_frames)
+    team_assigner = TeamAssigner(crop_service=crop_service, pitch_masker=pitch_masker)
+    player_assigner = PlayerBallAssigner(possession_decoder=PossessionDecoder())
     camera_movement_estimator = CameraMovementEstimator(video_frames[0])
+    shot_detector = ShotBoundaryDetector()
+
+    # Segmenta el video en planos: los cortes reinician el estado de los trackers y
+    # del flujo óptico, y los primeros planos/repeticiones no pasan por el detector
+    shots = shot_detector.detect_shots(video_frames)
+    cut_frames = ShotBoundaryDetector.get_cut_frames(shots)
+    wide_frames = ShotBoundaryDetector.get_wide_frames(shots)
+    metrics['shots'] = {
+        'total': len(shots),
+        'wide': sum(1 for shot in shots if shot.is_wide),
+        'skipped_frames': len(video_frames) - len(wide_frames)
+    }
 
     # Obtiene los tracks de los objetos en el video, la opción de stubs utiliza datos preprocesados para acelerar las pruebas, solo usar
     # en pruebas 
@@ -63,8 +102,29 @@ def main():
         video_frames,
         read_from_stub=False,
         stub_path='./app/res/stubs/track_stubs.pkl',
-        tracks_collection=tracks_collection
+        tracks_collection=tracks_collection,
+        shots=shots
     )
+    metrics['frame_skipping'] = tracker.inference_stats
+
+    # Interpolate Ball Positions: sobre todo el rango de frames y antes de calcular las
+    # posiciones, para que los frames interpolados también tengan posición; los huecos
+    # que contienen un corte de plano no se rellenan
+    ball_tracker = tracker.get_tracker('ball')
+
+    if not isinstance(ball_tracker, BallTracker):
+        raise TypeError("Retrieved tracker is not an instance of BallTracker")
+
+    ball_detected = ball_tracker.add_interpolated_ball_to_tracks(
+        tracks_collection, len(video_frames), max_gap=ball_max_gap, cut_frames=cut_frames)
+    interpolated_frames = sum(
+        1 for frame_tracks in tracks_collection.tracks["ball"].values()
+        if 1 in frame_tracks and frame_tracks[1].interpolated)
+
+    metrics["ball_detection"] = {
+        "detected": int(np.count_nonzero(ball_detected)),
+        "interpolated": interpolated_frames,
+    }
 
     # Get object positions
     tracker.add_position_to_tracks(tracks_collection=tracks_collection)
@@ -73,7 +133,8 @@ def main():
     camera_movement_per_frame = camera_movement_estimator.get_camera_movement(
         video_frames,
         read_from_stub=False,
-        stub_path='./app/res/stubs/camera_movement_stub.pkl'
+        stub_path='./app/res/stubs/camera_movement_stub.pkl',
+        cut_frames=cut_frames
     )
     camera_movement_estimator.add_adjust_positions_to_tracks(
         camera_movement_per_frame, tracks_collection=tracks_collection)
@@ -81,122 +142,88 @@ def main():
     # View Transformation
     view_transformer.add_transformed_position_to_tracks(tracks_collection=tracks_collection)
 
-    # Interpolate Ball Positions
-    # tracks["ball"].copy()
-    ball_tracker = tracker.get_tracker('ball')
-
-    if not isinstance(ball_tracker, BallTracker):
-        raise TypeError("Retrieved tracker is not an instance of BallTracker")
-
-    detected_frames = sum(
-        1
-        for frame_tracks in tracks_collection.tracks["ball"].values()
-        if 1 in frame_tracks and getattr(frame_tracks[1], "bbox", None) is not None
-    )
-
-    total_frames = len(tracks_collection.tracks["ball"])
-
-    ball_tracker.interpolate_ball_positions(tracks_collection.tracks["ball"])
-
-    # Count ball detections (efficiently)
-    metrics["ball_detection"] = {
-        "detected": detected_frames,
-        "interpolated": max(0, total_frames - detected_frames),
-    }
+    # Suavizado de trayectorias (opcional, ver smooth_trajectories): elimina el
+    # temblor de las posiciones transformadas antes de estimar velocidad y distancia
+    if smooth_trajectories:
+        trajectory_smoother.smooth_tracks(tracks_collection)
 
     # Speed and distance estimation
     speed_and_distance_estimator.add_speed_and_distance_to_tracks(tracks_collection)
 
-    # Assign Player Teams
-    for frame_num, track_content in tracks_collection.tracks["players"].items():
-        print("Assigning player teams...", tracks_collection.tracks["players"][frame_num].values())
-        team_assigner.assign_team_color(
-            video_frames[0],
-            tracks_collection.tracks["players"][frame_num])
-        continue
-
-    for frame_num, player_track in tracks_collection.tracks["players"].items():
-        for player_id, track in player_track.items():
-            team = team_assigner.get_player_team(
-                video_frames[frame_num],
-                track.bbox,
-                player_id
-            )
-            player_tracker = TrackPlayerDetail(**track.model_dump())
-            player_tracker.update(team=team, team_color=team_assigner.team_colors[team])
-            # player_tracker.team = team
-            # player_tracker.team_color = team_assigner.team_colors[team]
-            tracks_collection.update_track(
-                entity_type="players",
-                frame_num=frame_num,
-                track_id=player_id,
-                track_detail=player_tracker
-            )
-
-    # Assign Ball Acquisition
-    team_ball_control = []
-    print("Assigning ball to players...")
-    print("Total frames to assign ball: ", len(tracks_collection.tracks["players"]))
-    for frame_num, player_track in tracks_collection.tracks["players"].items():
-        print("Processing frame number: ", frame_num)
-        print("Ball tracks length: ", tracks_collection.tracks['ball'].values())
-        ball_frame_tracks = tracks_collection.tracks.get('ball', {}).get(int(frame_num))
-        
-        if not ball_frame_tracks or 1 not in ball_frame_tracks:
-            print("No ball track for this frame, appending -1")
-            team_ball_control.append(team_ball_control[-1] if team_ball_control else -1)
-            continue
-        
-        ball_detail = next(iter(ball_frame_tracks.values()))
-        ball_bbox = ball_detail.bbox
-        assigned_player = player_assigner.assign_ball_to_player(
-            player_track, ball_bbox)
-        print("Assigned player: ", assigned_player)
-
-        if assigned_player != -1:
-            player_base: TrackDetailBase = player_track[assigned_player]
-            print("Actual player track: ", player_base)
-            dict_player = player_base.model_dump()
-            print("Updated player team: ", dict_player['team'])
-            print("Updated player team color: ", dict_player['team_color'])
-            print("Dict player: ", TrackPlayerDetail.model_validate(dict_player))
-            player: TrackPlayerDetail = TrackPlayerDetail(**dict_player)
-            player.update(has_ball=True)
-            # player.has_ball = True
-            team_ball_control.append(player.team)
-            tracks_collection.update_track(
-                entity_type="players",
-                frame_num=frame_num,
-                track_id=assigned_player,
-                track_detail=player
-            )
-        else:
-            # Handle first frame case
-            team_ball_control.append(
-                team_ball_control[-1] if team_ball_control else -1)
-
-    team_ball_control = np.array(team_ball_control)
+    # Assign Player Teams: el modelo de colores se ajusta una sola vez por partido y,
+    # con read_team_model, se reutiliza en ejecuciones posteriores del mismo video
+    team_model_path = f'./app/res/stubs/team_model_{Path(input_video_path).stem}.pkl'
+    if read_team_model and team_assigner.load_model(
+            team_model_path, load_assignments=False, source=input_video_path):
+        print(f"Modelo de equipos cargado desde {team_model_path}")
+    else:
+        team_fit_report = team_assigner.fit_team_model(video_frames, tracks_collection)
+        print(f"Modelo de equipos ajustado en {team_fit_report['fit_time']:.2f} s "
+              f"({team_fit_report['samples']} muestras, "
+              f"separación: {team_fit_report['separation']:.2f})")
+
+    team_assignment_report = team_assigner.assign_teams(video_frames, tracks_collection)
+    team_assigner.save_model(team_model_path, source=input_video_path)
+    print(f"Equipos asignados a {team_assignment_report['assigned_tracks']} tracks "
+          f"({team_assignment_report['evaluated_crops']} recortes evaluados)")
+
+    # Assign Ball Acquisition: asignación vectorizada sobre todo el partido, suavizada
+    # con Viterbi para obtener tramos de posesión estables
+    assigned_players, team_ball_control = player_assigner.assign_ball_to_players(
+        tracks_collection, len(video_frames), cut_frames=cut_frames)
+    metrics['possession'] = {
+        'assigned_frames': int(np.count_nonzero(assigned_players >= 0)),
+        'total_frames': len(video_frames),
+        'spans': len(player_assigner.possession_spans)
+    }
+
+    # Eventos de balón (pases, intercepciones y disparos) a partir de la posesión; la
+    # portería que ataca cada equipo se deduce de su lado del campo
+    event_detector = EventDetector(
+        goal_positions=EventDetector.estimate_goal_positions(tracks_collection))
+    events = event_detector.detect_events(
+        tracks_collection, player_assigner.possession_spans, len(video_frames))
+    metrics['events'] = {
+        event_type: sum(1 for event in events if event.event_type == event_type)
+        for event_type in ("pass", "interception", "shot")
+    }
 
     # Calculate metrics
     metrics['interpolation_error'] = calculate_interpolation_error(
         ball_tracker,  # Pass tracker instance
-        tracks_collection.tracks['ball']
+        tracks_collection.tracks['ball'],
+        max_gap=ball_max_gap,
+        cut_frames=cut_frames
     )
     metrics['velocity_inconsistencies'] = check_speed_consistency(tracks_collection)
 
     # Draw output
     print("Team ball control array: ", team_ball_control)
     print("Total players frames: ", tracks_collection.tracks)
-    output_video_frames = tracker.get_tracker('players').draw_annotations(
-        video_frames, tracks_collection.tracks, team_ball_control)
-    output_video_frames = camera_movement_estimator.draw_camera_movement(
-        output_video_frames, camera_movement_per_frame)
-    speed_and_distance_estimator.draw_speed_and_distance(
-        output_video_frames, tracks_collection.tracks)
-
-    # Almacena el video procesado y las imágenes de los jugadores
-    save_video(output_video_frames, './app/res/output_videos/output_video.avi')
-    extract_player_images(video_frames, tracks_collection, './app/res/output_images/')
+    # Instantánea columnar de las anotaciones, compartida por el sidecar y el render
+    render_snapshot = RenderSnapshot.from_tracks(
+        tracks_collection.tracks,
+        len(video_frames),
+        team_ball_control=team_ball_control,
+        camera_movement_per_frame=camera_movement_per_frame)
+    # Sidecar por frame: el video anotado se puede reproducir bajo demanda con
+    # replay_overlay/iter_overlay_frames sobre el video original
+    write_overlay_sidecar('./app/res/output_videos/output_overlay.jsonl.gz', render_snapshot)
+    # Minimapa cenital de las posiciones transformadas como video independiente
+    MinimapRenderer().render_video(render_snapshot, './app/res/output_videos/minimap.avi')
+
+    if burn_annotations:
+        # Renderizado en una sola pasada, repartido en tramos entre procesos que
+        # leen el video original y escriben segmentos que después se concatenan
+        render_config = RenderConfig.proxy() if proxy_render else RenderConfig()
+        renderer = ParallelAnnotationRenderer(render_config)
+        renderer.render_snapshot(
+            input_video_path, render_snapshot, './app/res/output_videos/output_video.avi')
+
+    # Almacena las imágenes de los jugadores
+    extract_player_images(
+        video_frames, tracks_collection, './app/res/output_images/', crop_service=crop_service)
+    crop_service.close()
 
     # Generate diagrams (will save each metric separately)
     generate_diagrams(tracks=tracks_collection.tracks, metrics=metrics)
@@ -221,9 +248,21 @@ def main():
     print(f"Uso máximo de memoria: {max(metrics['memory_usage']):.2f} MB")
     print(f"Detección de balón: {metrics['ball_detection']['detected']} frames "
           f"({metrics['ball_detection']['detected'] /
-          len(tracks_collection.tracks['ball']) * 100:.1f}%)")
+          len(video_frames) * 100:.1f}%, "
+          f"interpolados: {metrics['ball_detection']['interpolated']})")
     print(f"Inconsistencias de velocidad: Jugadores={metrics['velocity_inconsistencies']['players']}" )
     print(f"Error de interpolación: {metrics['interpolation_error']:.4f}")
+    print(f"Planos detectados: {metrics['shots']['total']} "
+          f"(abiertos: {metrics['shots']['wide']}, "
+          f"frames sin detección: {metrics['shots']['skipped_frames']})")
+    print(f"Frames con poseedor del balón: {metrics['possession']['assigned_frames']} "
+          f"de {metrics['possession']['total_frames']} "
+          f"({metrics['possession']['spans']} tramos de posesión)")
+    print(f"Eventos: {metrics['events']['pass']} pases, "
+          f"{metrics['events']['interception']} intercepciones, "
+          f"{metrics['events']['shot']} disparos")
+    print(f"Frames estáticos reutilizados: {metrics['frame_skipping']['skipped_frames']} "
+          f"(tiempo ahorrado estimado: {metrics['frame_skipping']['time_saved']:.2f} s)")
 
 
 if __name__ == '__main__':